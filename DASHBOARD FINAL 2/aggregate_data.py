@@ -2,14 +2,15 @@
 import pandas as pd
 import os
 import argparse
+from post_stats import comments_to_state, summarize_state, load_or_update_state, load_state, merge_states, select_posts, weighted_engagement_rate
+from post_store import open_post_store, replace_month, months_for_posts, upsert_lifetime, post_key
+import kpi_cube
 
 print("--- EXECUTING AGGREGATE SCRIPT VERSION: MONOLITH_V1 ---")
 
-def get_most_extreme_comment_row(group, sentiment_col='sentiment_score', find_min=True):
-    valid_group = group.dropna(subset=[sentiment_col])
-    if valid_group.empty: return None
-    idx = valid_group[sentiment_col].idxmin() if find_min else valid_group[sentiment_col].idxmax()
-    return group.loc[idx]
+def summarize_posts(df):
+    """One row per post_id for a frame of enriched comments, derived from its mergeable state (see post_stats.py)."""
+    return summarize_state(comments_to_state(df))
 
 def aggregate_for_month(month_str):
     INPUT_CSV = f"enriched_data/enriched_data_{month_str}.csv"
@@ -18,41 +19,58 @@ def aggregate_for_month(month_str):
     OUTPUT_SUMMARY_CSV = os.path.join(OUTPUT_DIR, f"post_summary_{month_str}.csv")
     
     print(f"--- [Step 4] Aggregating Data for {month_str} ---")
-    try:
-        df = pd.read_csv(INPUT_CSV)
-    except FileNotFoundError:
+    if not os.path.exists(INPUT_CSV):
         print(f"--> ERROR: Input file '{INPUT_CSV}' not found."); exit(1)
-    if df.empty: print("Input file is empty. Skipping."); return
+    # --- Steps 1-3: Per-post state, folded forward from the last run when the file only grew ---
+    state, folded = load_or_update_state(month_str, INPUT_CSV)
+    if state['rows'] == 0: print("Input file is empty. Skipping."); return
+    print(f"Post state: {folded} of {state['rows']} comments aggregated this run, {len(state['posts'])} posts.")
+    month_summary = write_summary(summarize_state(state), OUTPUT_SUMMARY_CSV)
+    update_post_store(month_str, month_summary)
+    update_kpi_cube(month_str, month_summary, state)
 
-    # --- Step 1: Aggregation ---
-    post_summary = df.groupby('post_id').agg(
-        post_caption=('post_caption', 'first'), content_type=('content_type', 'first'),
-        total_likes=('total_likes', 'first'), num_shares=('num_shares', 'first'),
-        comment_count=('original_comment_for_context', 'size'), avg_sentiment_score=('sentiment_score', 'mean'),
-        sentiment_variance=('sentiment_score', 'var'),
-        negative_comment_ratio=('sentiment_score', lambda s: (s < 0).sum() / s.count() if s.count() > 0 else 0),
-        main_topic=('topic', lambda x: x.mode()[0] if not x.mode().empty else 'N/A')
-    ).reset_index()
+def update_post_store(month_str, month_summary):
+    """
+    Upserts the month's slice into the post store and recomputes the lifetime row of every post in the old or new
+    slice by merging that post's state across all the months it appears in.
+    """
+    conn = open_post_store()
+    keys = replace_month(conn, month_str, month_summary)
+    months_by_post = months_for_posts(conn, keys)
+    lifetime = {'rows': 0}
+    for month in sorted({m for months in months_by_post.values() for m in months}):
+        month_state = load_state(month)
+        if month_state is None:
+            print(f"--> WARNING: No post state for {month}; lifetime rows leave out its comments until it is aggregated again."); continue
+        lifetime = merge_states(lifetime, select_posts(month_state, [p for p in month_state['posts'].index if post_key(p) in keys]))
+    summary = finalize_summary(summarize_state(lifetime)) if lifetime['rows'] else month_summary.iloc[:0]
+    upsert_lifetime(conn, summary, months_by_post, removed=keys - set(months_by_post))
+    conn.close()
+    print(f"[POST STORE] {len(month_summary)} posts upserted for {month_str}; {len(summary)} lifetime rows refreshed.")
 
-    # --- Step 2: Find Extreme Comments ---
-    all_posts_data = []
-    for post_id, group in df.groupby('post_id'):
-        post_data = {'post_id': post_id}
-        pos_row, neg_row = get_most_extreme_comment_row(group, find_min=False), get_most_extreme_comment_row(group, find_min=True)
-        post_data['most_positive_comment'] = pos_row['text_for_analysis'] if pos_row is not None else "No analyzable text comments"
-        post_data['original_positive_context'] = pos_row['original_comment_for_context'] if pos_row is not None else "N/A"
-        if neg_row is not None and (pos_row is None or neg_row.name != pos_row.name):
-            post_data['most_negative_comment'] = neg_row['text_for_analysis']
-            post_data['original_negative_context'] = neg_row['original_comment_for_context']
-        else:
-            post_data['most_negative_comment'] = "No distinct negative comment"
-            post_data['original_negative_context'] = "N/A"
-        all_posts_data.append(post_data)
+def update_kpi_cube(month_str, month_summary, state):
+    """Replaces the month's cells of the dashboards' KPI cube: post cells from the summary, comment cells and daily rollup from the state."""
+    posts, comments = kpi_cube.post_cube(month_summary, month_str), kpi_cube.comment_cube_from_state(state, month_str)
+    daily = kpi_cube.daily_rollup_from_state(state, month_str)
+    conn = kpi_cube.open_cube()
+    kpi_cube.replace_month(conn, month_str, posts, comments, daily)
+    conn.close()
+    print(f"[KPI CUBE] {len(posts)} post cells, {len(comments)} comment cells and {len(daily)} daily rollup rows "
+          f"({daily['day'].nunique()} days) written for {month_str}.")
 
-    # --- Step 3: Merge and Finalize ---
-    comments_df = pd.DataFrame(all_posts_data)
-    final_summary = pd.merge(post_summary, comments_df, on='post_id', how='left')
-    final_summary['weighted_engagement_rate'] = (final_summary['total_likes'] + final_summary['comment_count'] + 2 * final_summary['num_shares']) / 88000
+def aggregate_combined(months, output_csv):
+    """Post summary over several months from their saved states, so a post's metrics cover all its comments exactly."""
+    state = {'rows': 0}
+    for month_str in sorted(months):
+        month_state = load_state(month_str)
+        if month_state is None:
+            print(f"--> ERROR: No post state for {month_str}; aggregate that month first."); exit(1)
+        state = merge_states(state, month_state)
+    print(f"--- Combining {len(months)} months: {state['rows']} comments on {len(state['posts'])} posts ---")
+    write_summary(summarize_state(state), output_csv)
+
+def finalize_summary(final_summary):
+    final_summary['weighted_engagement_rate'] = weighted_engagement_rate(final_summary['total_likes'], final_summary['comment_count'], final_summary['num_shares'])
     
     # --- Step 4: Brute-Force Sanitization ---
     print("[SELF-SANITIZE] Aggressively cleaning all text columns in-memory...")
@@ -77,13 +95,21 @@ def aggregate_for_month(month_str):
     if has_issue:
         print("ACTION: Halting before saving corrupted file."); exit(1)
     print("[SELF-VERIFY PASSED] In-memory DataFrame is clean. Ready to save.")
+    return final_summary
 
+def write_summary(final_summary, output_csv):
+    final_summary = finalize_summary(final_summary)
     # --- Step 6: Save the Verified File ---
-    final_summary.to_csv(OUTPUT_SUMMARY_CSV, index=False)
-    print(f"[SUCCESS] Aggregation complete! Saved verified summary to {OUTPUT_SUMMARY_CSV}")
+    final_summary.to_csv(output_csv, index=False)
+    print(f"[SUCCESS] Aggregation complete! Saved verified summary to {output_csv}")
+    return final_summary
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Aggregate, sanitize, and self-verify data.")
-    parser.add_argument("month", type=str, help="The month to process (YYYY-MM).")
+    parser.add_argument("months", type=str, nargs='+', help="The month(s) to process (YYYY-MM).")
+    parser.add_argument("--combined", help="Also write one summary over all the given months to this CSV.")
     args = parser.parse_args()
-    aggregate_for_month(args.month)
\ No newline at end of file
+    for month in args.months:
+        aggregate_for_month(month)
+    if args.combined:
+        aggregate_combined(args.months, args.combined)
\ No newline at end of file
@@ -0,0 +1,34 @@
+# File: atomic_io.py
+# Helpers for writing stage outputs so that downstream stages never see a partially written file.
+import json
+import os
+
+def write_csv_atomic(df, path, **to_csv_kwargs):
+    """Writes `df` to a temp file next to `path`, fsyncs it, then renames it over `path` in one step."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    to_csv_kwargs.setdefault('index', False)
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        df.to_csv(f, **to_csv_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def write_json_atomic(obj, path):
+    """Same as write_csv_atomic, for a small JSON document such as a progress record."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def append_csv_durable(df, path, header=False, **to_csv_kwargs):
+    """Appends `df` to `path` and fsyncs it, so the rows are on disk before any record that points past them."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    to_csv_kwargs.setdefault('index', False)
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        df.to_csv(f, header=header, **to_csv_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
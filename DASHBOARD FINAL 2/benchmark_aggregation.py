@@ -0,0 +1,108 @@
+# File: benchmark_aggregation.py
+# Per-post aggregation throughput: the old two-groupby version with per-group lambdas and a Python loop over every
+# post vs. the single vectorized pass in aggregate_data.summarize_posts, on synthetic enriched comments, plus the
+# cost of folding a small batch of new comments into the saved per-post state vs. re-aggregating everything.
+# Also checks that both versions produce the same summary, to the last bit of every column.
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from aggregate_data import summarize_posts
+from post_stats import comments_to_state, fold_comments, summarize_state
+from enrich_data import CANDIDATE_TOPICS
+
+def make_synthetic_comments(num_comments, num_posts, seed=7):
+    """Enriched-data shaped frame: skewed comments per post, scores in {-1, 0, 1} (many ties), gaps in every column,
+    ISO-8601 comment timestamps spread over a month."""
+    rng = np.random.default_rng(seed)
+    post_ids = 1190483039302610 + np.minimum(rng.zipf(1.3, num_comments) - 1, num_posts - 1)
+    post_ids[:num_posts] = 1190483039302610 + np.arange(num_posts)  # every post has at least one comment
+    texts = np.array([f"Comment text {i}" for i in range(10000)], dtype=object)[rng.integers(0, 10000, num_comments)]
+    sentiment = rng.choice([-1.0, 0.0, 1.0], num_comments)
+    sentiment[rng.random(num_comments) < 0.2] = np.nan
+    topics = np.array(CANDIDATE_TOPICS + ['Uncategorized'], dtype=object)[rng.integers(0, len(CANDIDATE_TOPICS) + 1, num_comments)]
+    topics[np.isnan(sentiment)] = np.nan
+    posts = pd.DataFrame({'post_caption': [f"Post caption {i} #NammaPrabha" for i in range(num_posts)],
+                          'content_type': np.array(['Photo', 'Video', 'Reel', 'Unknown'], dtype=object)[rng.integers(0, 4, num_posts)],
+                          'total_likes': rng.integers(0, 5000, num_posts), 'num_shares': rng.integers(0, 200, num_posts)})
+    post_rows = post_ids - 1190483039302610
+    df = pd.DataFrame({'post_id': post_ids})
+    for column in posts.columns:
+        df[column] = posts[column].to_numpy()[post_rows]
+    df['original_comment_for_context'] = texts
+    df['text_for_analysis'] = np.where(np.isnan(sentiment) & (rng.random(num_comments) < 0.5), np.nan, texts)
+    df['sentiment_score'] = sentiment
+    df['topic'] = topics
+    seconds = np.datetime64('2025-03-01T00:00:00') + rng.integers(0, 31 * 86400, num_comments).astype('timedelta64[s]')
+    df['comment_date'] = np.char.add(np.datetime_as_string(seconds, unit='s').astype(str), '.000Z')
+    return df
+
+def get_most_extreme_comment_row(group, sentiment_col='sentiment_score', find_min=True):
+    valid_group = group.dropna(subset=[sentiment_col])
+    if valid_group.empty: return None
+    idx = valid_group[sentiment_col].idxmin() if find_min else valid_group[sentiment_col].idxmax()
+    return group.loc[idx]
+
+def legacy_summarize_posts(df):
+    """Steps 1-3 of aggregate_for_month before vectorization, kept here as the baseline."""
+    post_summary = df.groupby('post_id').agg(
+        post_caption=('post_caption', 'first'), content_type=('content_type', 'first'),
+        total_likes=('total_likes', 'first'), num_shares=('num_shares', 'first'),
+        comment_count=('original_comment_for_context', 'size'), avg_sentiment_score=('sentiment_score', 'mean'),
+        sentiment_variance=('sentiment_score', 'var'),
+        negative_comment_ratio=('sentiment_score', lambda s: (s < 0).sum() / s.count() if s.count() > 0 else 0),
+        main_topic=('topic', lambda x: x.mode()[0] if not x.mode().empty else 'N/A')
+    ).reset_index()
+    all_posts_data = []
+    for post_id, group in df.groupby('post_id'):
+        post_data = {'post_id': post_id}
+        pos_row, neg_row = get_most_extreme_comment_row(group, find_min=False), get_most_extreme_comment_row(group, find_min=True)
+        post_data['most_positive_comment'] = pos_row['text_for_analysis'] if pos_row is not None else "No analyzable text comments"
+        post_data['original_positive_context'] = pos_row['original_comment_for_context'] if pos_row is not None else "N/A"
+        if neg_row is not None and (pos_row is None or neg_row.name != pos_row.name):
+            post_data['most_negative_comment'] = neg_row['text_for_analysis']
+            post_data['original_negative_context'] = neg_row['original_comment_for_context']
+        else:
+            post_data['most_negative_comment'] = "No distinct negative comment"
+            post_data['original_negative_context'] = "N/A"
+        all_posts_data.append(post_data)
+    return pd.merge(post_summary, pd.DataFrame(all_posts_data), on='post_id', how='left')
+
+def time_it(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def same_summary(legacy, vectorized):
+    """Columns that differ between the two summaries; empty only if the frames and their CSV text are identical."""
+    differing = [c for c in legacy.columns if c not in vectorized.columns or not legacy[c].equals(vectorized[c])]
+    if not differing and not (legacy.equals(vectorized) and legacy.to_csv(index=False) == vectorized.to_csv(index=False)):
+        differing.append('(frame)')
+    return differing
+
+def main(num_comments, num_posts, new_comments, skip_legacy):
+    df = make_synthetic_comments(num_comments, num_posts)
+    print(f"Synthetic data: {len(df):,} comments on {df['post_id'].nunique():,} posts")
+    vectorized, vectorized_time = time_it(summarize_posts, df)
+    print(f"  vectorized single pass : {vectorized_time:8.2f} s  ({len(df) / vectorized_time:12,.0f} comments/s)")
+
+    old, new = df.iloc[:-new_comments], df.iloc[-new_comments:].reset_index(drop=True)
+    state = comments_to_state(old)
+    folded, fold_time = time_it(lambda: summarize_state(fold_comments(state, new)))
+    print(f"  fold {new_comments:,} new comments into the saved state + summarize: {fold_time:6.2f} s  "
+          f"({vectorized_time / fold_time:.0f}x faster than re-aggregating; same result: {folded.equals(vectorized)})")
+    if skip_legacy:
+        return
+    legacy, legacy_time = time_it(legacy_summarize_posts, df)
+    print(f"  groupby lambdas + loop : {legacy_time:8.2f} s  ({len(df) / legacy_time:12,.0f} comments/s)  ({legacy_time / vectorized_time:.0f}x slower)")
+    differing = same_summary(legacy, vectorized)
+    print(f"  same summary as before : {not differing}" + (f" (differs in {differing})" if differing else ""))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the per-post aggregation in aggregate_data.py.")
+    parser.add_argument("--comments", type=int, default=10_000_000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--new-comments", type=int, default=1000, help="Size of the batch folded into the saved state.")
+    parser.add_argument("--skip-legacy", action='store_true', help="Only time the vectorized pass (the baseline takes minutes at full size).")
+    args = parser.parse_args()
+    main(args.comments, args.posts, args.new_comments, args.skip_legacy)
@@ -0,0 +1,69 @@
+# File: benchmark_cascade.py
+# Time saved by the cheap-first cascade: both transformers over every distinct text of the analysis_ready_*.csv
+# files vs. the lexicon / naive Bayes tiers first and the transformers only on what they leave.
+# Coverage and agreement with the transformer labels are reported by `python cascade_classifier.py --evaluate`.
+import argparse
+import time
+from benchmark_enrichment import load_texts, build_offline_models
+from cascade_classifier import load_cascade_model, classify, DEFAULT_THRESHOLD
+from enrich_data import score_sentiment, score_topics, CANDIDATE_TOPICS, SENTIMENT_MODEL, TOPIC_MODEL
+from enrichment_batching import TOKEN_BUDGET
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def main(pattern, limit, threshold, token_budget, offline):
+    import torch
+    from transformers import pipeline
+    torch.manual_seed(0)
+
+    texts = load_texts(pattern, limit)
+    model = load_cascade_model()
+    print(f"Benchmarking on {len(texts):,} distinct texts from '{pattern}' ({torch.get_num_threads()} CPU threads)")
+    if model is None:
+        print("No cascade model found; lexicon tier only (train one with `python cascade_classifier.py --train`).")
+    if offline:
+        paths = build_offline_models(load_texts(pattern, None))
+        sentiment_model, topic_model = paths['sentiment'], paths['nli']
+        print("Offline models (random weights).")
+    else:
+        sentiment_model, topic_model = SENTIMENT_MODEL, TOPIC_MODEL
+    sentiment_pipeline = pipeline("sentiment-analysis", model=sentiment_model, device=-1)
+    topic_pipeline = pipeline("zero-shot-classification", model=topic_model, device=-1)
+
+    start = time.perf_counter()
+    labels = [classify(t, model, threshold, CANDIDATE_TOPICS) for t in texts]
+    cascade_seconds = time.perf_counter() - start
+    sentiment_rest = [t for t, (s, _) in zip(texts, labels) if s is None]
+    topic_rest = [t for t, (_, tp) in zip(texts, labels) if tp is None]
+    tiers = {}
+    for s, tp in labels:
+        for name, result in (("sentiment", s), ("topic", tp)):
+            key = (name, result[1] if result else 'transformer')
+            tiers[key] = tiers.get(key, 0) + 1
+
+    full = {"sentiment": timed(score_sentiment, sentiment_pipeline, texts, token_budget),
+            "topic": timed(score_topics, topic_pipeline, texts, CANDIDATE_TOPICS, token_budget)}
+    rest = {"sentiment": timed(score_sentiment, sentiment_pipeline, sentiment_rest, token_budget) if sentiment_rest else 0.0,
+            "topic": timed(score_topics, topic_pipeline, topic_rest, CANDIDATE_TOPICS, token_budget) if topic_rest else 0.0}
+
+    print(f"\nCascade tiers ran in {cascade_seconds:.3f} s ({len(texts) / cascade_seconds:,.0f} texts/s), threshold {threshold}")
+    print(f"{'pipeline':<10} {'lexicon':>8} {'linear':>8} {'to model':>9} {'all-transformer s':>18} {'cascade s':>10} {'saved':>7}")
+    for name in ("sentiment", "topic"):
+        cascade_total = rest[name] + cascade_seconds / 2  # the tiers label both pipelines in one pass
+        print(f"{name:<10} {tiers.get((name, 'lexicon'), 0) / len(texts):8.1%} {tiers.get((name, 'linear'), 0) / len(texts):8.1%} "
+              f"{tiers.get((name, 'transformer'), 0) / len(texts):9.1%} {full[name]:18.2f} {cascade_total:10.2f} {1 - cascade_total / full[name]:7.0%}")
+    total_full, total_cascade = sum(full.values()), sum(rest.values()) + cascade_seconds
+    print(f"{'total':<10} {'':>8} {'':>8} {'':>9} {total_full:18.2f} {total_cascade:10.2f} {1 - total_cascade / total_full:7.0%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time saved by the cheap-first cascade in front of the enrichment transformers.")
+    parser.add_argument("--input", default="processed_data/analysis_ready_*.csv", help="Glob of analysis_ready files to read texts from.")
+    parser.add_argument("--limit", type=int, default=1000, help="Distinct texts to score.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--offline", action='store_true', help="Use small locally built models with random weights instead of the production models.")
+    args = parser.parse_args()
+    main(args.input, args.limit, args.threshold, args.token_budget, args.offline)
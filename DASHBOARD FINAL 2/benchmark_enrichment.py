@@ -0,0 +1,109 @@
+# File: benchmark_enrichment.py
+# Texts-per-second of the enrichment pipelines on the real analysis_ready_*.csv texts:
+# the old fixed 64-text slices in file order vs. length-bucketed batches under a token budget.
+# With --offline, small randomly initialised models (same architecture family, a BPE tokenizer trained on the
+# comments) are built locally, so the comparison runs without downloading anything.
+import argparse
+import glob
+import os
+import time
+import pandas as pd
+from enrich_data import score_sentiment, score_topics, CANDIDATE_TOPICS, SENTIMENT_MODEL, TOPIC_MODEL, HYPOTHESIS_TOKENS
+from enrichment_batching import token_lengths, plan_batches, padded_tokens, TOKEN_BUDGET
+
+LEGACY_BATCH_SIZE = 64
+OFFLINE_MODEL_DIR = "processed_data/offline_models"
+
+def load_texts(pattern, limit):
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        texts.extend(pd.read_csv(path)['text_for_analysis'].dropna().astype(str).tolist())
+    return list(dict.fromkeys(texts))[:limit]
+
+def build_offline_models(texts, out_dir=OFFLINE_MODEL_DIR, hidden_size=256, layers=4):
+    """Saves a tiny RoBERTa sentiment model and a tiny NLI model (random weights) under `out_dir`; returns their paths."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors, trainers, decoders
+    from transformers import PreTrainedTokenizerFast, RobertaConfig, RobertaForSequenceClassification
+
+    paths = {'sentiment': os.path.join(out_dir, 'sentiment'), 'nli': os.path.join(out_dir, 'nli')}
+    if all(os.path.exists(os.path.join(p, 'config.json')) for p in paths.values()):
+        return paths
+    bpe = Tokenizer(models.BPE(unk_token="<unk>"))
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator(texts, trainers.BpeTrainer(vocab_size=8000, special_tokens=["<s>", "<pad>", "</s>", "<unk>", "<mask>"],
+                                                       initial_alphabet=pre_tokenizers.ByteLevel.alphabet()))
+    bpe.post_processor = processors.RobertaProcessing(("</s>", bpe.token_to_id("</s>")), ("<s>", bpe.token_to_id("<s>")))
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe, bos_token="<s>", eos_token="</s>", sep_token="</s>", cls_token="<s>",
+                                        unk_token="<unk>", pad_token="<pad>", mask_token="<mask>", model_max_length=512)
+    labels = {'sentiment': ['negative', 'neutral', 'positive'], 'nli': ['contradiction', 'neutral', 'entailment']}
+    for name, path in paths.items():
+        config = RobertaConfig(vocab_size=len(tokenizer), hidden_size=hidden_size, num_hidden_layers=layers, num_attention_heads=4,
+                               intermediate_size=hidden_size * 4, max_position_embeddings=514, pad_token_id=tokenizer.pad_token_id,
+                               id2label=dict(enumerate(labels[name])), label2id={l: i for i, l in enumerate(labels[name])})
+        RobertaForSequenceClassification(config).save_pretrained(path)
+        tokenizer.save_pretrained(path)
+    return paths
+
+def legacy_sentiment(sentiment_pipeline, texts):
+    """The pre-bucketing loop from enrich_data.py: 64 texts at a time in file order, no pipeline batch_size."""
+    for i in range(0, len(texts), LEGACY_BATCH_SIZE):
+        sentiment_pipeline(texts[i:i + LEGACY_BATCH_SIZE], truncation=True, max_length=512)
+
+def legacy_topics(topic_pipeline, texts):
+    for i in range(0, len(texts), LEGACY_BATCH_SIZE):
+        topic_pipeline(texts[i:i + LEGACY_BATCH_SIZE], candidate_labels=CANDIDATE_TOPICS, multi_label=False, truncation=True)
+
+def padding_report(name, lengths, token_budget, cost_per_item=1):
+    useful = sum(lengths) * cost_per_item
+    legacy = [list(range(i, min(i + LEGACY_BATCH_SIZE, len(lengths)))) for i in range(0, len(lengths), LEGACY_BATCH_SIZE)]
+    bucketed = plan_batches(lengths, token_budget, cost_per_item=cost_per_item)
+    print(f"  {name}: padded tokens if the 64-text slices were batched: {padded_tokens(legacy, lengths, cost_per_item):,} "
+          f"({useful / padded_tokens(legacy, lengths, cost_per_item):.0%} useful); "
+          f"bucketed: {padded_tokens(bucketed, lengths, cost_per_item):,} ({useful / padded_tokens(bucketed, lengths, cost_per_item):.0%} useful, {len(bucketed)} batches)")
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+def main(pattern, limit, token_budget, offline, topics_limit):
+    import torch
+    from transformers import pipeline
+    torch.manual_seed(0)
+
+    texts = load_texts(pattern, limit)
+    print(f"Benchmarking on {len(texts):,} distinct texts from '{pattern}' ({torch.get_num_threads()} CPU threads)")
+    if offline:
+        paths = build_offline_models(load_texts(pattern, None))
+        sentiment_model, topic_model = paths['sentiment'], paths['nli']
+        print(f"Offline models (random weights) under '{OFFLINE_MODEL_DIR}'.")
+    else:
+        sentiment_model, topic_model = SENTIMENT_MODEL, TOPIC_MODEL
+    sentiment_pipeline = pipeline("sentiment-analysis", model=sentiment_model, device=-1)
+    topic_pipeline = pipeline("zero-shot-classification", model=topic_model, device=-1)
+
+    lengths = token_lengths(texts, sentiment_pipeline.tokenizer)
+    print(f"Token lengths: median {sorted(lengths)[len(lengths) // 2]}, max {max(lengths)}")
+    padding_report("sentiment", lengths, token_budget)
+    padding_report("topics", [n + HYPOTHESIS_TOKENS for n in lengths], token_budget, len(CANDIDATE_TOPICS))
+
+    topic_texts = texts[:topics_limit]
+    for name, legacy, bucketed, subset in (("sentiment", legacy_sentiment, lambda p, t: score_sentiment(p, t, token_budget), texts),
+                                           ("topics", legacy_topics, lambda p, t: score_topics(p, t, CANDIDATE_TOPICS, token_budget), topic_texts)):
+        model = sentiment_pipeline if name == "sentiment" else topic_pipeline
+        legacy_time = time_it(legacy, model, subset)
+        bucketed_time = time_it(bucketed, model, subset)
+        print(f"{name} ({len(subset):,} texts)")
+        print(f"  fixed 64, file order : {legacy_time:7.2f} s  ({len(subset) / legacy_time:8.1f} texts/s)")
+        print(f"  length-bucketed      : {bucketed_time:7.2f} s  ({len(subset) / bucketed_time:8.1f} texts/s)  ({legacy_time / bucketed_time:.1f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fixed vs. length-bucketed enrichment batching.")
+    parser.add_argument("--input", default="processed_data/analysis_ready_*.csv", help="Glob of analysis_ready files to read texts from.")
+    parser.add_argument("--limit", type=int, default=2000, help="Distinct texts to score with the sentiment model.")
+    parser.add_argument("--topics-limit", type=int, default=500, help="Distinct texts to score with the zero-shot model (9 pairs per text).")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--offline", action='store_true', help="Use small locally built models with random weights instead of the production models.")
+    args = parser.parse_args()
+    main(args.input, args.limit, args.token_budget, args.offline, args.topics_limit)
@@ -0,0 +1,83 @@
+# File: benchmark_enrichment_server.py
+# Per-month latency of `python enrich_data.py <month>` as run_pipeline.py runs it: cold (each run imports
+# torch/transformers and loads both models) vs. warm (a thin client scoring through one enrichment_server).
+# Runs happen in a scratch directory holding copies of the analysis_ready files, with an empty inference cache
+# per run, so the repo's enriched_data/ and cache are never touched and every run scores every text.
+import argparse
+import glob
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from enrichment_server import EnrichmentClient, DEFAULT_PORT
+from enrich_data import SENTIMENT_MODEL, TOPIC_MODEL
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def prepare_workdir(months, limit):
+    """Scratch dir with processed_data/analysis_ready_<month>.csv for each month (first `limit` rows if set)."""
+    import pandas as pd
+    workdir = tempfile.mkdtemp(prefix="enrichment_bench_")
+    os.makedirs(os.path.join(workdir, "processed_data"))
+    for month in months:
+        df = pd.read_csv(os.path.join(HERE, "processed_data", f"analysis_ready_{month}.csv"))
+        (df.head(limit) if limit else df).to_csv(os.path.join(workdir, "processed_data", f"analysis_ready_{month}.csv"), index=False)
+    return workdir
+
+def run_month(workdir, month, extra_args):
+    cache = os.path.join(workdir, "processed_data", "inference_cache.sqlite")
+    if os.path.exists(cache):
+        os.remove(cache)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(HERE, "enrich_data.py"), month] + extra_args, cwd=workdir, check=True, capture_output=True, text=True)
+    return time.perf_counter() - start
+
+def main(months, limit, offline, port):
+    if offline:
+        from benchmark_enrichment import build_offline_models, load_texts
+        paths = build_offline_models(load_texts(os.path.join(HERE, "processed_data/analysis_ready_*.csv"), None),
+                                     out_dir=os.path.join(HERE, "processed_data", "offline_models"))
+        sentiment_model, topic_model = paths['sentiment'], paths['nli']
+        print("Offline models (random weights).")
+    else:
+        sentiment_model, topic_model = SENTIMENT_MODEL, TOPIC_MODEL
+    model_args = ["--sentiment-model", sentiment_model, "--topic-model", topic_model]
+    url = f"http://127.0.0.1:{port}"
+    workdir = prepare_workdir(months, limit)
+    try:
+        cold = {m: run_month(workdir, m, model_args + ["--no-server"]) for m in months}
+
+        start = time.perf_counter()
+        server = subprocess.Popen([sys.executable, os.path.join(HERE, "enrichment_server.py"), "--port", str(port)] + model_args,
+                                  cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        client = EnrichmentClient(url)
+        while client.health() is None:
+            if server.poll() is not None:
+                raise RuntimeError("enrichment_server.py exited during start-up")
+            time.sleep(0.2)
+        startup = time.perf_counter() - start
+        try:
+            warm = {m: run_month(workdir, m, model_args + ["--server", url]) for m in months}
+        finally:
+            client.shutdown()
+            server.wait(timeout=60)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'month':<9} {'cold s':>8} {'warm s':>8} {'saved':>7}")
+    for m in months:
+        print(f"{m:<9} {cold[m]:8.2f} {warm[m]:8.2f} {1 - warm[m] / cold[m]:7.0%}")
+    print(f"{'total':<9} {sum(cold.values()):8.2f} {sum(warm.values()) + startup:8.2f}   (warm total includes {startup:.2f}s server start-up)")
+
+if __name__ == "__main__":
+    available = sorted(re.search(r"(\d{4}-\d{2})", p).group(1) for p in glob.glob(os.path.join(HERE, "processed_data", "analysis_ready_*.csv")))
+    parser = argparse.ArgumentParser(description="Cold vs. warm per-month enrichment latency with the enrichment server.")
+    parser.add_argument("months", nargs='*', default=available, help="Months to run (default: every analysis_ready file).")
+    parser.add_argument("--limit", type=int, help="Only enrich the first N rows of each month.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT + 1, help="Port for the benchmark's own server instance.")
+    parser.add_argument("--offline", action='store_true', help="Use small locally built models with random weights instead of the production models.")
+    args = parser.parse_args()
+    main(args.months, args.limit, args.offline, args.port)
@@ -0,0 +1,127 @@
+# File: benchmark_inference.py
+# Throughput of the enrichment models on a fixed fixture of comments sampled from analysis_ready_*.csv, swept over
+# backend, thread count, batch size and max_length. Every configuration runs in a fresh process, so its thread
+# setting takes effect and its peak RSS is its own. Results (texts/s, p50/p95 batch latency, peak RSS) are written
+# as JSON; with --baseline, the run exits with status 1 if any configuration is more than --max-slowdown slower
+# than the same configuration in an earlier result file.
+# Runs offline: the production models must already be in the local Hugging Face cache, or --offline uses the
+# small random-weight stand-ins from benchmark_enrichment.py.
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from benchmark_enrichment import load_texts, build_offline_models
+from enrich_data import load_pipeline, CANDIDATE_TOPICS, SENTIMENT_MODEL, TOPIC_MODEL, BACKENDS
+
+RESULTS_FILE = "processed_data/benchmark_inference.json"
+TASKS = {'sentiment': "sentiment-analysis", 'topics': "zero-shot-classification"}
+
+def sample_fixture(pattern, size, seed=0):
+    """`size` distinct texts drawn with a fixed seed, so every run and every configuration sees the same inputs."""
+    texts = load_texts(pattern, None)
+    return random.Random(seed).sample(texts, min(size, len(texts)))
+
+def run_batch(pipe, task, backend, batch, max_length):
+    if task == 'sentiment':
+        return pipe(batch, batch_size=len(batch), truncation=True, max_length=max_length)
+    if backend == 'onnx':
+        return pipe(batch, candidate_labels=CANDIDATE_TOPICS, batch_size=len(batch) * len(CANDIDATE_TOPICS), max_length=max_length)
+    # The transformers zero-shot pipeline truncates to the tokenizer's limit and takes no max_length of its own.
+    pipe.tokenizer.model_max_length = max_length
+    return pipe(batch, candidate_labels=CANDIDATE_TOPICS, multi_label=False, truncation=True, batch_size=len(batch) * len(CANDIDATE_TOPICS))
+
+def run_config(config, model_name, texts):
+    """Runs in its own process: loads the model with the configured threads and times each batch after one warm-up."""
+    import torch
+    torch.set_num_threads(config['threads'])
+    pipe = load_pipeline(TASKS[config['task']], model_name, config['backend'], -1, config['threads'])
+    size = config['batch_size']
+    batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+    run_batch(pipe, config['task'], config['backend'], batches[0], config['max_length'])
+    latencies = []
+    for batch in batches:
+        start = time.perf_counter()
+        run_batch(pipe, config['task'], config['backend'], batch, config['max_length'])
+        latencies.append(time.perf_counter() - start)
+    seconds = sum(latencies)
+    return dict(config, texts=len(texts), seconds=round(seconds, 4), texts_per_sec=round(len(texts) / seconds, 2),
+                p50_batch_ms=round(float(np.percentile(latencies, 50)) * 1000, 2), p95_batch_ms=round(float(np.percentile(latencies, 95)) * 1000, 2),
+                peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1))
+
+def config_key(result):
+    return tuple(result[k] for k in ('task', 'backend', 'threads', 'batch_size', 'max_length'))
+
+def compare(results, baseline_path, max_slowdown):
+    """Prints configurations slower than the baseline by more than `max_slowdown`; returns False if there are any."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {config_key(r): r for r in json.load(f)['results']}
+    regressions = []
+    for r in results:
+        before = baseline.get(config_key(r))
+        if before and r['texts_per_sec'] < before['texts_per_sec'] * (1 - max_slowdown):
+            regressions.append((r, before))
+    for r, before in regressions:
+        print(f"  !! {' '.join(map(str, config_key(r)))}: {r['texts_per_sec']:.1f} texts/s vs {before['texts_per_sec']:.1f} in '{baseline_path}'")
+    print(f"Baseline comparison: {len(regressions)} of {len(results)} configurations slower by more than {max_slowdown:.0%}.")
+    return not regressions
+
+def main(args):
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')  # inherited by the spawned workers
+    if args.offline:
+        paths = build_offline_models(load_texts(args.input, None))
+        models = {'sentiment': paths['sentiment'], 'topics': paths['nli']}
+        print("Offline models (random weights).")
+    else:
+        models = {'sentiment': args.sentiment_model, 'topics': args.topic_model}
+    fixtures = {'sentiment': sample_fixture(args.input, args.fixture_size, args.seed),
+                'topics': sample_fixture(args.input, args.topics_fixture_size, args.seed)}
+    configs = [dict(zip(('task', 'backend', 'threads', 'batch_size', 'max_length'), values))
+               for values in itertools.product(args.tasks, args.backends, args.threads, args.batch_sizes, args.max_lengths)]
+    print(f"{len(configs)} configurations; fixtures: {len(fixtures['sentiment'])} sentiment texts, {len(fixtures['topics'])} topic texts "
+          f"({len(CANDIDATE_TOPICS)} pairs each), {os.cpu_count()} CPUs")
+
+    results = []
+    print(f"{'task':<10} {'backend':<8} {'threads':>7} {'batch':>6} {'max_len':>7} {'texts/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'peak RSS MB':>12}")
+    for config in configs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            r = pool.submit(run_config, config, models[config['task']], fixtures[config['task']]).result()
+        results.append(r)
+        print(f"{r['task']:<10} {r['backend']:<8} {r['threads']:>7} {r['batch_size']:>6} {r['max_length']:>7} {r['texts_per_sec']:9.1f} "
+              f"{r['p50_batch_ms']:8.1f} {r['p95_batch_ms']:8.1f} {r['peak_rss_mb']:12.1f}")
+
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'machine': {'cpus': os.cpu_count(), 'platform': platform.platform(), 'python': platform.python_version()},
+              'models': models, 'offline_models': args.offline, 'input': args.input, 'seed': args.seed, 'results': results}
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to '{args.out}'.")
+    return compare(results, args.baseline, args.max_slowdown) if args.baseline else True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep the enrichment models over backend, threads, batch size and max_length.")
+    parser.add_argument("--input", default="processed_data/analysis_ready_*.csv", help="Glob of analysis_ready files to sample the fixtures from.")
+    parser.add_argument("--fixture-size", type=int, default=512, help="Distinct texts scored by the sentiment model.")
+    parser.add_argument("--topics-fixture-size", type=int, default=64, help=f"Distinct texts scored by the zero-shot model ({len(CANDIDATE_TOPICS)} pairs per text).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tasks", nargs='+', choices=list(TASKS), default=list(TASKS))
+    parser.add_argument("--backends", nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--threads", nargs='+', type=int, default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--batch-sizes", nargs='+', type=int, default=[8, 32, 64])
+    parser.add_argument("--max-lengths", nargs='+', type=int, default=[128, 512])
+    parser.add_argument("--sentiment-model", default=SENTIMENT_MODEL)
+    parser.add_argument("--topic-model", default=TOPIC_MODEL)
+    parser.add_argument("--offline", action='store_true', help="Use small locally built models with random weights instead of the production models.")
+    parser.add_argument("--out", default=RESULTS_FILE)
+    parser.add_argument("--baseline", help="Earlier result file to compare texts/s against.")
+    parser.add_argument("--max-slowdown", type=float, default=0.2, help="Allowed texts/s drop per configuration before the run fails.")
+    args = parser.parse_args()
+    sys.exit(0 if main(args) else 1)
@@ -0,0 +1,88 @@
+# File: benchmark_kpi_cube.py
+# Per-rerun cost of the dashboards' overview and analysis widgets (KPI means and totals, topic scoreboard, comment
+# sentiment mix, monthly trend, content quadrant): computed from the filtered summary and comment frames, as the
+# dashboards did, vs. rolled up from the KPI cube. Synthetic enriched comments are spread over several months; the
+# cube is built the way aggregate_data.py builds it, and both ways are checked to give the same numbers.
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from aggregate_data import finalize_summary
+from benchmark_aggregation import make_synthetic_comments
+from kpi_cube import post_cube, comment_cube_from_state, select_cells, rollup, mean, bucket_shares
+from post_stats import comments_to_state, summarize_state
+
+def build(num_comments, num_posts, num_months):
+    """(summary frame, comment frame, post cube, comment cube) with a 'month' column as the dashboards load them."""
+    df = make_synthetic_comments(num_comments, num_posts)
+    month_of_row = np.sort(np.random.default_rng(3).integers(0, num_months, len(df)))
+    summaries, post_cells, comment_cells = [], [], []
+    for m in range(num_months):
+        month_str = f"2025-{m + 1:02d}"
+        rows = df[month_of_row == m]
+        state = comments_to_state(rows)
+        summary = finalize_summary(summarize_state(state))
+        post_cells.append(post_cube(summary, month_str))
+        comment_cells.append(comment_cube_from_state(state, month_str))
+        summaries.append(summary.assign(month=pd.Timestamp(month_str)))
+    df['month'] = pd.to_datetime([f"2025-{m + 1:02d}" for m in month_of_row])
+    df['topic'] = df['topic'].fillna("N/A")
+    return pd.concat(summaries, ignore_index=True), df, pd.concat(post_cells, ignore_index=True), pd.concat(comment_cells, ignore_index=True)
+
+def from_frames(summary, comments, start, end, topics):
+    posts = summary[summary['main_topic'].isin(topics) & (summary['month'] >= start) & (summary['month'] <= end)]
+    scored = comments[comments['topic'].isin(topics) & (comments['month'] >= start) & (comments['month'] <= end)]
+    return {'sentiment': posts['avg_sentiment_score'].mean(), 'engagement': posts['weighted_engagement_rate'].mean(),
+            'comments': posts['comment_count'].sum(),
+            'topics': posts.groupby('main_topic')['avg_sentiment_score'].mean(),
+            'mix': scored['sentiment_score'].map({-1: 'negative', 0: 'neutral', 1: 'positive'}).value_counts(normalize=True),
+            'monthly': posts.groupby(posts['month'].dt.strftime('%Y-%m'))['avg_sentiment_score'].mean(),
+            'content': posts.groupby('content_type')['weighted_engagement_rate'].mean()}
+
+def from_cube(post_cells, comment_cells, start, end, topics):
+    start, end = start.strftime('%Y-%m'), end.strftime('%Y-%m')
+    cells = select_cells(post_cells, start, end, topics)
+    totals = rollup(cells)
+    return {'sentiment': mean(totals, 'sentiment'), 'engagement': mean(totals, 'engagement'), 'comments': totals['comments'],
+            'topics': mean(rollup(cells, 'topic'), 'sentiment'),
+            'mix': bucket_shares(select_cells(comment_cells, start, end, topics)),
+            'monthly': mean(rollup(cells, 'month'), 'sentiment'),
+            'content': mean(rollup(cells, 'content_type'), 'engagement')}
+
+def same(a, b):
+    for key in a:
+        x, y = a[key], b[key]
+        if isinstance(x, pd.Series):
+            x, y = x.sort_index(), y.sort_index()
+            if list(x.index) != list(y.index) or not np.allclose(x.to_numpy(dtype=float), y.to_numpy(dtype=float), rtol=1e-9, equal_nan=True):
+                return False
+        elif not np.isclose(x, y, rtol=1e-9, equal_nan=True):
+            return False
+    return True
+
+def time_best(fn, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def main(num_comments, num_posts, num_months):
+    summary, comments, post_cells, comment_cells = build(num_comments, num_posts, num_months)
+    print(f"Synthetic data: {len(comments):,} comments, {len(summary):,} post-month rows over {num_months} months; "
+          f"cube: {len(post_cells):,} post cells, {len(comment_cells):,} comment cells")
+    topics = sorted(t for t in summary['main_topic'].unique() if t != "N/A")
+    start, end = pd.Timestamp(f"2025-{max(1, num_months - 2):02d}"), pd.Timestamp(f"2025-{num_months:02d}")
+    raw, raw_time = time_best(from_frames, summary, comments, start, end, topics)
+    cube, cube_time = time_best(from_cube, post_cells, comment_cells, start, end, topics)
+    print(f"  widgets from the frames : {raw_time * 1000:9.1f} ms per rerun")
+    print(f"  widgets from the cube   : {cube_time * 1000:9.1f} ms per rerun  ({raw_time / cube_time:.0f}x faster; same numbers: {same(raw, cube)})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboards' KPI widgets on the raw frames vs. the KPI cube.")
+    parser.add_argument("--comments", type=int, default=2_000_000)
+    parser.add_argument("--posts", type=int, default=50_000)
+    parser.add_argument("--months", type=int, default=6)
+    args = parser.parse_args()
+    main(args.comments, args.posts, args.months)
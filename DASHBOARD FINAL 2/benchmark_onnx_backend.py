@@ -0,0 +1,84 @@
+# File: benchmark_onnx_backend.py
+# Accuracy drift and throughput of the ONNX Runtime backend (fp32 export and int8 dynamic quantization)
+# against the PyTorch pipelines, on distinct texts from the analysis_ready_*.csv files. All backends go
+# through the same length-bucketed batching, so only the inference engine differs.
+# Exits with status 1 if an int8 model's top labels agree with PyTorch on fewer than --min-agreement of the texts.
+# The int8 result is recorded next to the export; enrich_data.py --backend onnx only uses a model that passed.
+# With --offline, the small random-weight models from benchmark_enrichment.py are used. Their near-uniform
+# outputs make label agreement much more sensitive to rounding than on the real models.
+import argparse
+import sys
+import time
+from benchmark_enrichment import load_texts, build_offline_models
+from enrich_data import score_sentiment, score_topics, CANDIDATE_TOPICS, SENTIMENT_MODEL, TOPIC_MODEL
+from enrichment_batching import TOKEN_BUDGET
+from onnx_backend import OnnxSentimentPipeline, OnnxZeroShotPipeline, MIN_AGREEMENT, save_parity
+
+def distribution(result):
+    """Scores by label; sentiment results only carry the top label's score."""
+    if 'labels' in result:
+        return dict(zip(result['labels'], result['scores']))
+    return {result['label']: result['score']}
+
+def drift(reference, candidate):
+    """(top-label agreement, max |score difference| on the labels both report)."""
+    agree, max_diff = 0, 0.0
+    for ref, cand in zip(reference, candidate):
+        ref_dist, cand_dist = distribution(ref), distribution(cand)
+        agree += max(ref_dist, key=ref_dist.get) == max(cand_dist, key=cand_dist.get)
+        shared = ref_dist.keys() & cand_dist.keys()
+        if shared:
+            max_diff = max(max_diff, max(abs(ref_dist[l] - cand_dist[l]) for l in shared))
+    return agree / len(reference), max_diff
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    results = fn(*args)
+    return results, time.perf_counter() - start
+
+def main(pattern, limit, topics_limit, token_budget, offline, min_agreement):
+    import torch
+    from transformers import pipeline
+    torch.manual_seed(0)
+
+    texts = load_texts(pattern, limit)
+    print(f"Benchmarking on {len(texts):,} distinct texts from '{pattern}' ({torch.get_num_threads()} CPU threads)")
+    if offline:
+        paths = build_offline_models(load_texts(pattern, None))
+        sentiment_model, topic_model = paths['sentiment'], paths['nli']
+        print("Offline models (random weights).")
+    else:
+        sentiment_model, topic_model = SENTIMENT_MODEL, TOPIC_MODEL
+
+    def run_sentiment(model, subset):
+        return score_sentiment(model, subset, token_budget)
+    def run_topics(model, subset):
+        return score_topics(model, subset, CANDIDATE_TOPICS, token_budget)
+
+    failed = False
+    for name, task, model_name, onnx_cls, run, subset in (
+            ("sentiment", "sentiment-analysis", sentiment_model, OnnxSentimentPipeline, run_sentiment, texts),
+            ("topics", "zero-shot-classification", topic_model, OnnxZeroShotPipeline, run_topics, texts[:topics_limit])):
+        reference, torch_seconds = timed(run, pipeline(task, model=model_name, device=-1), subset)
+        print(f"\n{name} ({len(subset):,} texts)")
+        print(f"  {'backend':<14} {'texts/s':>9} {'speedup':>8} {'label agreement':>16} {'max |score diff|':>17}")
+        print(f"  {'pytorch fp32':<14} {len(subset) / torch_seconds:9.1f} {'1.0x':>8} {'-':>16} {'-':>17}")
+        for label, quantized in (("onnx fp32", False), ("onnx int8", True)):
+            results, seconds = timed(run, onnx_cls(model_name, quantized=quantized), subset)
+            agreement, max_diff = drift(reference, results)
+            print(f"  {label:<14} {len(subset) / seconds:9.1f} {torch_seconds / seconds:7.1f}x {agreement:16.1%} {max_diff:17.4f}")
+            if quantized and not save_parity(model_name, task, agreement, len(subset), min_agreement):
+                print(f"  !! int8 {name} agreement {agreement:.1%} is below --min-agreement {min_agreement:.1%}")
+                failed = True
+    return not failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy drift and throughput of the ONNX Runtime backend vs. PyTorch.")
+    parser.add_argument("--input", default="processed_data/analysis_ready_*.csv", help="Glob of analysis_ready files to read texts from.")
+    parser.add_argument("--limit", type=int, default=1000, help="Distinct texts to score with the sentiment model.")
+    parser.add_argument("--topics-limit", type=int, default=200, help="Distinct texts to score with the zero-shot model (9 pairs per text).")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--min-agreement", type=float, default=MIN_AGREEMENT, help="Minimum share of texts where int8 and PyTorch pick the same label.")
+    parser.add_argument("--offline", action='store_true', help="Use small locally built models with random weights instead of the production models.")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.input, args.limit, args.topics_limit, args.token_budget, args.offline, args.min_agreement) else 1)
@@ -0,0 +1,73 @@
+# File: benchmark_partition.py
+# Compares peak RSS and wall time of the in-memory and streaming partitioners on a synthetic export.
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+CHILD_SCRIPT = """
+import resource, sys, time
+from partition_by_month import partition_json_by_month
+start = time.perf_counter()
+partition_json_by_month(sys.argv[1], output_folder=sys.argv[2], stream=sys.argv[3] == 'stream')
+elapsed = time.perf_counter() - start
+print(f"BENCH {elapsed} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}")
+"""
+
+def write_synthetic_export(path, num_comments, seed=7):
+    """Writes a comments export shaped like fb_comments_data.json, spread over twelve months."""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        for i in range(num_comments):
+            month = rng.randint(1, 12)
+            item = {
+                "facebookUrl": f"https://www.facebook.com/page/posts/{rng.randint(1, 5000)}/",
+                "commentUrl": f"https://www.facebook.com/page/posts/?comment_id={i}",
+                "id": f"comment-{i}",
+                "date": f"2025-{month:02d}-{rng.randint(1, 28):02d}T05:55:40.000Z",
+                "text": "Congratulations madam 🙏 " * rng.randint(1, 6),
+                "profileName": f"User {rng.randint(1, 100000)}",
+                "likesCount": rng.randint(0, 50),
+                "threadingDepth": 0,
+                "facebookId": str(1190483039302610 + rng.randint(0, 5000)),
+            }
+            if i: f.write(',\n')
+            f.write(json.dumps(item, ensure_ascii=False))
+        f.write('\n]')
+
+def run_mode(mode, input_path, output_folder):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, input_path, output_folder, mode],
+                            check=True, text=True, capture_output=True, cwd=script_dir)
+    line = next(l for l in result.stdout.splitlines() if l.startswith('BENCH '))
+    _, elapsed, max_rss_kb = line.split()
+    return float(elapsed), int(max_rss_kb)
+
+def main(num_comments):
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'fb_comments_data.json')
+        write_synthetic_export(input_path, num_comments)
+        size_mb = os.path.getsize(input_path) / 1e6
+        print(f"Synthetic export: {num_comments} comments, {size_mb:.1f} MB")
+
+        results = {}
+        for mode in ('in_memory', 'stream'):
+            out_dir = os.path.join(tmp, f"out_{mode}")
+            results[mode] = run_mode(mode, input_path, out_dir)
+            print(f"  {mode:>9}: {results[mode][0]:7.2f} s, peak RSS {results[mode][1] / 1024:8.1f} MB")
+
+        identical = all(
+            open(os.path.join(tmp, 'out_in_memory', name), 'rb').read() == open(os.path.join(tmp, 'out_stream', name), 'rb').read()
+            for name in os.listdir(os.path.join(tmp, 'out_in_memory'))
+        )
+        print(f"Outputs byte-identical: {identical}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark in-memory vs streaming month partitioning.")
+    parser.add_argument("--comments", type=int, default=500_000, help="Number of synthetic comments to generate.")
+    args = parser.parse_args()
+    main(args.comments)
@@ -0,0 +1,64 @@
+# File: benchmark_sharded_enrichment.py
+# Scaling of sharded enrichment from 1 to N worker processes on the analysis_ready_*.csv texts, against the
+# single process that uses every core through torch intra-op threads. Pool start-up (spawning the workers and
+# loading the models) is reported separately from scoring throughput.
+import argparse
+import os
+import time
+from benchmark_enrichment import load_texts, build_offline_models
+from enrich_data import load_pipeline, score_sentiment, score_topics, CANDIDATE_TOPICS, SENTIMENT_MODEL, TOPIC_MODEL, BACKENDS
+from enrichment_batching import TOKEN_BUDGET
+from sharded_enrichment import open_pool, score_sharded, default_threads
+
+TASKS = {"sentiment": "sentiment-analysis", "topics": "zero-shot-classification"}
+
+def worker_counts(max_workers):
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n); n *= 2
+    return counts + [max_workers]
+
+def main(pattern, limit, task_name, max_workers, backend, token_budget, offline):
+    import torch
+    texts = load_texts(pattern, limit)
+    cores = os.cpu_count() or 1
+    print(f"Benchmarking {task_name} on {len(texts):,} distinct texts from '{pattern}' ({cores} CPUs, {backend} backend)")
+    if offline:
+        paths = build_offline_models(load_texts(pattern, None))
+        model_name = paths['sentiment'] if task_name == "sentiment" else paths['nli']
+        print("Offline models (random weights).")
+    else:
+        model_name = SENTIMENT_MODEL if task_name == "sentiment" else TOPIC_MODEL
+    task = TASKS[task_name]
+
+    torch.set_num_threads(cores)
+    pipe = load_pipeline(task, model_name, backend, device=-1, threads=cores)
+    start = time.perf_counter()
+    score_sentiment(pipe, texts, token_budget) if task_name == "sentiment" else score_topics(pipe, texts, CANDIDATE_TOPICS, token_budget)
+    baseline = len(texts) / (time.perf_counter() - start)
+    print(f"\n{'mode':<26} {'start-up s':>10} {'texts/s':>9} {'vs 1 proc':>10}")
+    print(f"{f'1 process x {cores} threads':<26} {'-':>10} {baseline:9.1f} {'1.0x':>10}")
+
+    for workers in worker_counts(max_workers):
+        start = time.perf_counter()
+        with open_pool({task: model_name}, workers, backend) as pool:
+            # One short job per worker forces every worker to start and load its model before timing starts.
+            list(pool.map(time.sleep, [0.1] * workers))
+            startup = time.perf_counter() - start
+            start = time.perf_counter()
+            score_sharded(pool, task, texts, token_budget)
+            rate = len(texts) / (time.perf_counter() - start)
+        mode = f"{workers} workers x {default_threads(workers)} threads"
+        print(f"{mode:<26} {startup:10.1f} {rate:9.1f} {rate / baseline:9.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling benchmark for sharded multi-process enrichment.")
+    parser.add_argument("--input", default="processed_data/analysis_ready_*.csv", help="Glob of analysis_ready files to read texts from.")
+    parser.add_argument("--limit", type=int, default=2000, help="Distinct texts to score.")
+    parser.add_argument("--task", choices=list(TASKS), default="sentiment")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backend", choices=BACKENDS, default='pytorch')
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--offline", action='store_true', help="Use small locally built models with random weights instead of the production models.")
+    args = parser.parse_args()
+    main(args.input, args.limit, args.task, args.max_workers, args.backend, args.token_budget, args.offline)
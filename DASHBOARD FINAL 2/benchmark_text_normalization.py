@@ -0,0 +1,82 @@
+# File: benchmark_text_normalization.py
+# Measures comment normalization throughput: the old per-row clean_text / is_mostly_non_latin vs. text_normalization.
+import argparse
+import glob
+import re
+import string
+import time
+import pandas as pd
+from text_normalization import clean_text_series, is_mostly_non_latin_series
+
+def legacy_clean_text(text):
+    """The pre-vectorization clean_text from translate_and_prepare.py, kept here as the baseline."""
+    if not isinstance(text, str) or not text.strip(): return ""
+    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\[.*?\]', '', text)
+    text = re.sub(r'@\w+', '', text)
+    text = text.replace('#', '')
+    emoji_pattern = re.compile(
+        "["
+        u"\U0001F600-\U0001F64F" u"\U0001F300-\U0001F5FF" u"\U0001F680-\U0001F6FF"
+        u"\U0001F1E0-\U0001F1FF" u"\U00002702-\U000027B0" u"\U000024C2-\U0001F251"
+        "]+",
+        flags=re.UNICODE,
+    )
+    text = emoji_pattern.sub(r'', text)
+    text = ' '.join(text.split())
+    return text.strip()
+
+def legacy_is_mostly_non_latin(text, threshold=0.5):
+    """The pre-vectorization check from verify_translation.py, kept here as the baseline."""
+    if not text or not isinstance(text, str):
+        return False
+    cleaned_text = re.sub(r'[{re.escape(string.punctuation)}\s\d]', '', text)
+    if not cleaned_text:
+        return False
+    non_latin_chars = len(re.findall(r'[^\x00-\x7F]', cleaned_text))
+    return (non_latin_chars / len(cleaned_text)) > threshold
+
+def load_comments(pattern, rows):
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        texts.extend(pd.read_csv(path, dtype={'comment_text': str})['comment_text'].tolist())
+    # Tile the real comments (NaNs included) up to the requested size.
+    return pd.Series((texts * (rows // len(texts) + 1))[:rows])
+
+def time_it(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def report(label, rows, seconds, baseline=None):
+    speedup = f"  ({baseline / seconds:.1f}x)" if baseline else ""
+    print(f"  {label:<22}: {seconds:6.2f} s  ({rows / seconds:12,.0f} rows/s){speedup}")
+
+def main(pattern, rows, workers):
+    comments = load_comments(pattern, rows)
+    print(f"Benchmarking on {len(comments):,} rows tiled from '{pattern}'")
+
+    print("clean_text")
+    legacy, legacy_time = time_it(comments.apply, legacy_clean_text)
+    serial, serial_time = time_it(clean_text_series, comments, workers=1)
+    pooled, pooled_time = time_it(clean_text_series, comments, workers=workers)
+    report("legacy .apply", rows, legacy_time)
+    report("vectorized", rows, serial_time, legacy_time)
+    report(f"vectorized, {workers} procs", rows, pooled_time, legacy_time)
+    print(f"  byte-identical: {legacy.equals(serial) and legacy.equals(pooled)}")
+
+    print("is_mostly_non_latin")
+    texts = legacy.where(legacy != '', comments.fillna(''))
+    legacy_mask, legacy_time = time_it(texts.apply, legacy_is_mostly_non_latin)
+    mask, serial_time = time_it(is_mostly_non_latin_series, texts, workers=1)
+    report("legacy .apply", rows, legacy_time)
+    report("vectorized", rows, serial_time, legacy_time)
+    print(f"  identical: {legacy_mask.equals(mask)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark comment text normalization.")
+    parser.add_argument("--input", default="processed_data/processed_comments_*.csv", help="Glob of processed comment files to tile.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of rows to normalize.")
+    parser.add_argument("--workers", type=int, default=4, help="Processes for the pooled run.")
+    args = parser.parse_args()
+    main(args.input, args.rows, args.workers)
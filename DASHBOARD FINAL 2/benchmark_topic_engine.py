@@ -0,0 +1,99 @@
+# File: benchmark_topic_engine.py
+# Agreement and speed of the embedding-similarity topic engine against the zero-shot NLI labels already in
+# enriched_data/*.csv (rows another tier labelled are left out). Prototypes are built from one half of the labelled texts and evaluated on the other,
+# so the report never scores a text against a prototype it helped build.
+# With --offline, the small random-weight models from benchmark_enrichment.py stand in for both models: the
+# timings are representative, the agreement figures are not.
+import argparse
+import glob
+import time
+import pandas as pd
+from cascade_classifier import model_labelled
+from enrich_data import score_topics, CANDIDATE_TOPICS, TOPIC_MODEL
+from enrichment_batching import TOKEN_BUDGET
+from topic_embeddings import (EMBEDDING_MODEL, LABELLED_GLOB, MAX_EXAMPLES_PER_TOPIC, load_encoder, build_prototypes,
+                              encode_texts, classify_embeddings)
+
+MARGINS = [0.0, 0.01, 0.02, 0.05, 0.1, 0.15, 0.2]
+
+def load_labelled(pattern):
+    df = pd.concat([pd.read_csv(path, usecols=lambda c: c in ('text_for_analysis', 'topic', 'topic_tier')) for path in sorted(glob.glob(pattern))])
+    df = model_labelled(df, ['topic_tier'])[['text_for_analysis', 'topic']].dropna().drop_duplicates('text_for_analysis')
+    return df[df['topic'].isin(CANDIDATE_TOPICS)].reset_index(drop=True)
+
+def split_labelled(df, seed=0):
+    """Half of each topic's texts seed the prototypes, the other half is evaluated."""
+    prototype_rows = df.groupby('topic').sample(frac=0.5, random_state=seed)
+    return prototype_rows, df.drop(prototype_rows.index)
+
+def margin_report(results, expected, embed_seconds, nli_seconds_per_text):
+    """Per margin: share handled by the fast path, its agreement, and overall agreement/speed if NLI takes the rest."""
+    n = len(expected)
+    print(f"\n{'margin':>7} {'fast path':>10} {'fast agree':>11} {'overall agree*':>15} {'texts/s':>9} {'speedup':>8}")
+    for margin in MARGINS:
+        fast = [(r['labels'][0], e) for r, e in zip(results, expected) if r is not None and r['margin'] >= margin]
+        agree = sum(p == e for p, e in fast)
+        to_nli = n - len(fast)
+        seconds = embed_seconds + to_nli * nli_seconds_per_text
+        print(f"{margin:7.2f} {len(fast) / n:10.1%} {agree / max(len(fast), 1):11.1%} {(agree + to_nli) / n:15.1%} "
+              f"{n / seconds:9.1f} {n * nli_seconds_per_text / seconds:7.1f}x")
+    print("* assumes the NLI fallback reproduces the existing label, as it does when models and topics are unchanged.")
+
+def per_topic_report(results, expected):
+    print(f"\n{'topic':>15} {'texts':>6} {'agree (margin 0)':>17}")
+    df = pd.DataFrame({'expected': expected, 'predicted': [r['labels'][0] if r else None for r in results]})
+    for topic, group in df.groupby('expected'):
+        print(f"{topic:>15} {len(group):6} {(group['expected'] == group['predicted']).mean():17.1%}")
+
+def main(pattern, limit, nli_limit, token_budget, offline, seed):
+    import torch
+    from transformers import pipeline
+    torch.manual_seed(0)
+
+    df = load_labelled(pattern)
+    prototype_rows, eval_rows = split_labelled(df, seed)
+    eval_rows = eval_rows.sample(min(limit, len(eval_rows)), random_state=seed)
+    texts, expected = eval_rows['text_for_analysis'].astype(str).tolist(), eval_rows['topic'].tolist()
+    print(f"{len(df):,} distinct labelled texts: {len(prototype_rows):,} build prototypes, {len(texts):,} evaluated "
+          f"({torch.get_num_threads()} CPU threads)")
+
+    if offline:
+        from benchmark_enrichment import build_offline_models, load_texts
+        paths = build_offline_models(load_texts("processed_data/analysis_ready_*.csv", None))
+        embedding_model, topic_model = paths['sentiment'], paths['nli']
+        print("Offline models (random weights): agreement figures below are not meaningful.")
+    else:
+        embedding_model, topic_model = EMBEDDING_MODEL, TOPIC_MODEL
+    encoder = load_encoder(embedding_model)
+    topic_pipeline = pipeline("zero-shot-classification", model=topic_model, device=-1)
+
+    examples = {topic: group['text_for_analysis'].astype(str).tolist()[:MAX_EXAMPLES_PER_TOPIC] for topic, group in prototype_rows.groupby('topic')}
+    prototypes, sources = build_prototypes(encoder, CANDIDATE_TOPICS, examples, token_budget)
+    print("Prototypes: " + ", ".join(f"{label}: {source}" for label, source in sources.items()))
+
+    start = time.perf_counter()
+    results = classify_embeddings(encode_texts(encoder, texts, token_budget), prototypes, CANDIDATE_TOPICS)
+    embed_seconds = time.perf_counter() - start
+
+    nli_texts = texts[:nli_limit]
+    start = time.perf_counter()
+    nli_results = score_topics(topic_pipeline, nli_texts, CANDIDATE_TOPICS, token_budget)
+    nli_seconds_per_text = (time.perf_counter() - start) / len(nli_texts)
+    nli_agree = sum(r is not None and r['labels'][0] == e for r, e in zip(nli_results, expected))
+
+    print(f"\nEmbedding engine: {len(texts) / embed_seconds:8.1f} texts/s ({len(texts):,} texts)")
+    print(f"Zero-shot NLI   : {1 / nli_seconds_per_text:8.1f} texts/s ({len(nli_texts):,} texts, "
+          f"{nli_agree / len(nli_texts):.1%} agree with the stored labels)")
+    margin_report(results, expected, embed_seconds, nli_seconds_per_text)
+    per_topic_report(results, expected)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agreement and speed of the embedding topic engine vs. the stored zero-shot topics.")
+    parser.add_argument("--input", default=LABELLED_GLOB, help="Glob of enriched files with a 'topic' column.")
+    parser.add_argument("--limit", type=int, default=2000, help="Held-out texts to classify with the embedding engine.")
+    parser.add_argument("--nli-limit", type=int, default=200, help="Held-out texts to time the zero-shot model on (9 pairs per text).")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--offline", action='store_true', help="Use small locally built models with random weights instead of the production models.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.input, args.limit, args.nli_limit, args.token_budget, args.offline, args.seed)
@@ -0,0 +1,97 @@
+# File: benchmark_translation_batching.py
+# Replays the real processed_comments_*.csv texts against an in-process Translate stub with a per-request
+# cost model, comparing the old fixed 100-string batches with size-aware adaptive batching.
+import argparse
+import glob
+import random
+import threading
+import time
+import pandas as pd
+from translation_engine import translate_batches, translate_texts_adaptive, TARGET_LATENCY
+
+SCENARIOS = {
+    # name: (seconds per request, seconds per character, server character limit, transient error rate)
+    'typical': (0.25, 0.0002, 5000, 0.02),
+    'slow-per-char': (0.25, 0.001, 5000, 0.02),
+    'strict-limit': (0.25, 0.0002, 2000, 0.02),
+}
+
+class StubTranslateError(RuntimeError):
+    def __init__(self, code):
+        super().__init__(f"Stub Translate error {code}")
+        self.code = code
+
+class StubClient:
+    """Sleeps for the modelled cost of each request (scaled by `time_scale`) and records it."""
+
+    def __init__(self, model, time_scale, log, seed):
+        self.per_request, self.per_char, self.max_chars, self.error_rate = model
+        self.time_scale, self.log, self.rng = time_scale, log, random.Random(seed)
+
+    def translate(self, values, target_language='en'):
+        chars = sum(len(v) for v in values)
+        cost = self.per_request + self.per_char * chars
+        time.sleep(cost * self.time_scale)
+        status = 413 if chars > self.max_chars else (503 if self.rng.random() < self.error_rate else 200)
+        self.log.append((len(values), chars, cost, status))
+        if status != 200: raise StubTranslateError(status)
+        return [{'input': v, 'translatedText': v, 'detectedSourceLanguage': 'kn'} for v in values]
+
+def load_texts(pattern):
+    texts = []
+    for path in sorted(glob.glob(pattern)):
+        comments = pd.read_csv(path, dtype={'comment_text': str})['comment_text'].dropna()
+        texts.extend(' '.join(t.split()) for t in comments)
+    return [t for t in dict.fromkeys(texts) if t]
+
+def run(mode, texts, model, time_scale, max_in_flight):
+    log, seeds = [], iter(range(1000))
+    lock = threading.Lock()
+
+    def factory():
+        with lock:
+            return StubClient(model, time_scale, log, next(seeds))
+
+    start = time.perf_counter()
+    if mode == 'fixed-100':
+        batches = [texts[i:i + 100] for i in range(0, len(texts), 100)]
+        results = [r for batch, rs in zip(batches, translate_batches(factory, batches, max_in_flight=max_in_flight, requests_per_second=1000,
+                                                                     max_retries=3, backoff_base=0.01))
+                   for r in (rs if rs is not None else [None] * len(batch))]
+    else:
+        results = translate_texts_adaptive(factory, texts, max_in_flight=max_in_flight, requests_per_second=1000, max_retries=3,
+                                           backoff_base=0.01, target_latency=TARGET_LATENCY * time_scale)
+    elapsed = (time.perf_counter() - start) / time_scale
+    costs = sorted(cost for _, _, cost, _ in log)
+    return {
+        'requests': len(log),
+        'rejected_413': sum(status == 413 for *_, status in log),
+        'failed_texts': sum(r is None for r in results),
+        'mean_chars': sum(chars for _, chars, _, _ in log) / len(log),
+        'p95_latency': costs[int(0.95 * (len(costs) - 1))],
+        'max_latency': costs[-1],
+        'elapsed': elapsed,
+    }
+
+def main(pattern, scenarios, time_scale, max_in_flight):
+    texts = load_texts(pattern)
+    lengths = sorted(len(t) for t in texts)
+    print(f"Replaying {len(texts):,} distinct texts ({sum(lengths):,} characters, longest {lengths[-1]:,}) from '{pattern}'")
+    print(f"{max_in_flight} requests in flight; times are simulated seconds (sleeps scaled by {time_scale}).")
+    for name in scenarios:
+        model = SCENARIOS[name]
+        print(f"\nScenario '{name}': {model[0]}s/request + {model[1]}s/char, server limit {model[2]:,} chars, {model[3]:.0%} transient errors")
+        print(f"  {'mode':<10} {'requests':>8} {'413s':>5} {'failed':>7} {'chars/req':>9} {'p95 lat':>8} {'max lat':>8} {'wall':>8}")
+        for mode in ('fixed-100', 'adaptive'):
+            r = run(mode, texts, model, time_scale, max_in_flight)
+            print(f"  {mode:<10} {r['requests']:>8} {r['rejected_413']:>5} {r['failed_texts']:>7} {r['mean_chars']:>9,.0f} "
+                  f"{r['p95_latency']:>7.2f}s {r['max_latency']:>7.2f}s {r['elapsed']:>7.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fixed vs. size-aware adaptive translation batching.")
+    parser.add_argument("--input", default="processed_data/processed_comments_*.csv", help="Glob of processed comment files to replay.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action='append', help="Cost model(s) to run (default: all).")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Fraction of the modelled latency actually slept.")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    args = parser.parse_args()
+    main(args.input, args.scenario or list(SCENARIOS), args.time_scale, args.max_in_flight)
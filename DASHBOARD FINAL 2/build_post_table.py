@@ -0,0 +1,90 @@
+# File: build_post_table.py
+# Turns fb_posts_data.json into a compact post table keyed by normalized postId.
+# The table is built once and reused by every per-month stage; it is only rebuilt when the source changes.
+import pandas as pd
+import hashlib
+import json
+import os
+import argparse
+from atomic_io import write_json_atomic
+
+POSTS_JSON_FILE = "fb_posts_data.json"
+POST_TABLE_FILE = "processed_data/post_table.pkl"
+POST_TABLE_COLUMNS = ['post_caption', 'total_likes', 'num_shares', 'content_type']
+
+def _meta_path(table_path):
+    return os.path.splitext(table_path)[0] + ".meta.json"
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _source_fingerprint(source_path):
+    stat = os.stat(source_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "pandas": pd.__version__}
+
+def build_post_table(source_path=POSTS_JSON_FILE, table_path=POST_TABLE_FILE):
+    """Parses the posts export and saves it as a DataFrame indexed by stripped postId."""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        posts_data = json.load(f)
+
+    # Later duplicates of a postId win, exactly like the old per-stage posts_map dict.
+    records = {}
+    for post in posts_data:
+        if post_id := post.get('postId'):
+            records[str(post_id).strip()] = (post.get('text', ''), post.get('likes', 0), post.get('shares', 0), post.get('type', 'Unknown'))
+
+    post_table = pd.DataFrame.from_dict(records, orient='index', columns=POST_TABLE_COLUMNS)
+    post_table.index.name = 'post_id'
+
+    os.makedirs(os.path.dirname(table_path) or '.', exist_ok=True)
+    post_table.to_pickle(table_path + '.tmp')
+    os.replace(table_path + '.tmp', table_path)
+    meta = dict(_source_fingerprint(source_path), sha256=_file_sha256(source_path), rows=len(post_table))
+    write_json_atomic(meta, _meta_path(table_path))
+    return post_table
+
+def is_post_table_stale(source_path=POSTS_JSON_FILE, table_path=POST_TABLE_FILE):
+    """A cheap size/mtime check first; the source is only re-hashed when those differ."""
+    if not os.path.exists(table_path): return True
+    try:
+        with open(_meta_path(table_path), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return True
+    fingerprint = _source_fingerprint(source_path)
+    if all(meta.get(k) == v for k, v in fingerprint.items()): return False
+    if meta.get('pandas') != fingerprint['pandas'] or meta.get('sha256') != _file_sha256(source_path): return True
+    # Same content, new mtime (e.g. the export was copied): refresh the fingerprint and keep the table.
+    meta.update(fingerprint)
+    write_json_atomic(meta, _meta_path(table_path))
+    return False
+
+def load_post_table(source_path=POSTS_JSON_FILE, table_path=POST_TABLE_FILE):
+    """
+    Returns the post table (index: post_id; columns: post_caption, total_likes, num_shares, content_type).
+    Rebuilds it first if the posts export changed. Raises FileNotFoundError if the export is missing.
+    """
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"'{source_path}' not found.")
+    if is_post_table_stale(source_path, table_path):
+        return build_post_table(source_path, table_path)
+    return pd.read_pickle(table_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the keyed post table from the posts export.")
+    parser.add_argument("--force", action='store_true', help="Rebuild even if the source has not changed.")
+    args = parser.parse_args()
+
+    print("--- [Pre-Step] Building Post Dimension Table ---")
+    try:
+        if args.force or is_post_table_stale():
+            table = build_post_table()
+            print(f"Built post table with {len(table)} posts at '{POST_TABLE_FILE}'.")
+        else:
+            print(f"Post table '{POST_TABLE_FILE}' is up to date. Nothing to do.")
+    except FileNotFoundError:
+        print(f"--> ERROR: '{POSTS_JSON_FILE}' not found."); exit(1)
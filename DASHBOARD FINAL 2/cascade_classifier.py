@@ -0,0 +1,168 @@
+# File: cascade_classifier.py
+# Cheap-first tiers in front of the enrichment transformers. Short blessings and greetings ("Congratulations madam",
+# "Happy birthday sir") are labelled by a lexicon rule; other short comments by a word n-gram naive Bayes model trained
+# on the transformer labels already in enriched_data/. Only texts neither tier is confident about reach the models.
+import argparse
+import glob
+import hashlib
+import html
+import json
+import math
+import os
+import re
+
+POSITIVE_WORDS = frozenset("""
+congratulations congratulation congrats congratulate congratz happy birthday bday wishes blessings bless blessed god super superb
+nice good great excellent awesome wonderful fantastic beautiful lovely proud thanks thank greetings namaste namaskara namaskar
+welcome jai hail best brilliant outstanding amazing cute gorgeous respect salute inspiring inspiration hats
+""".split())
+FILLER_WORDS = frozenset("""
+very so much many all the a of to you your u ur and for on day returns keep it up job work done well wish luck happy always
+our my love dear be with""".split())
+ADDRESS_WORDS = frozenset("""
+madam mam maam ma'am medam madem sir saar ji akka anna avare amma didi bhai brother sister mom ma sis bro
+""".split())
+WORD_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?", re.UNICODE)
+MAX_LEXICON_WORDS = 5
+MAX_MODEL_WORDS = 8
+MODEL_FILE = "processed_data/cascade_model.json"
+DEFAULT_THRESHOLD = 0.99
+SENTIMENT_LABELS = {1: 'positive', 0: 'neutral', -1: 'negative'}
+
+def words(text):
+    return WORD_PATTERN.findall(html.unescape(str(text)).lower())
+
+def lexicon_rule(text):
+    """(sentiment, topic) for short texts made only of blessing/greeting words and forms of address, else None."""
+    tokens = words(text)
+    content = [w for w in tokens if w not in ADDRESS_WORDS]
+    if not content or len(tokens) > MAX_LEXICON_WORDS:
+        return None
+    if all(w in POSITIVE_WORDS or w in FILLER_WORDS for w in content) and any(w in POSITIVE_WORDS for w in content):
+        return 'positive', 'Praise'
+    return None
+
+def _features(text):
+    tokens = words(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])] or ['<empty>']
+
+def train_naive_bayes(texts, labels, alpha=0.5):
+    """Multinomial naive Bayes over word unigrams and bigrams: {'alpha', 'priors', 'counts'}."""
+    counts, docs = {}, {}
+    for text, label in zip(texts, labels):
+        docs[label] = docs.get(label, 0) + 1
+        side = counts.setdefault(label, {})
+        for f in _features(text):
+            side[f] = side.get(f, 0) + 1
+    return {'alpha': alpha, 'priors': {l: n / len(labels) for l, n in docs.items()}, 'counts': counts}
+
+def train_cascade_model(texts, sentiments, topics, output_path=MODEL_FILE):
+    """Trains the sentiment and topic models on transformer-labelled texts and saves them as JSON."""
+    model = {'sentiment': train_naive_bayes(texts, sentiments), 'topic': train_naive_bayes(texts, topics)}
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(model, f, ensure_ascii=False)
+    return model
+
+def _prepare(nb):
+    vocab = len(set().union(*nb['counts'].values()))
+    nb['totals'] = {l: sum(c.values()) + nb['alpha'] * vocab for l, c in nb['counts'].items()}
+    return nb
+
+def load_cascade_model(path=MODEL_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            model = json.load(f)
+    except FileNotFoundError:
+        return None
+    return {name: _prepare(nb) for name, nb in model.items()}
+
+def naive_bayes_posterior(text, nb):
+    """[(label, probability)] sorted by probability."""
+    feats = _features(text)
+    logp = {l: math.log(prior) + sum(math.log((nb['counts'][l].get(f, 0) + nb['alpha']) / nb['totals'][l]) for f in feats)
+            for l, prior in nb['priors'].items()}
+    top = max(logp.values())
+    exp = {l: math.exp(v - top) for l, v in logp.items()}
+    total = sum(exp.values())
+    return sorted(((l, e / total) for l, e in exp.items()), key=lambda x: -x[1])
+
+def classify(text, model=None, threshold=DEFAULT_THRESHOLD, candidate_topics=None):
+    """
+    Returns ((sentiment_result, tier) or None, (topic_result, tier) or None), results shaped like the pipelines'.
+    The lexicon tier answers both; the linear tier answers each one whose posterior reaches `threshold`.
+    """
+    rule = lexicon_rule(text)
+    if rule is not None and (candidate_topics is None or rule[1] in candidate_topics):
+        sentiment, topic = rule
+        return ({'label': sentiment, 'score': 1.0}, 'lexicon'), ({'labels': [topic], 'scores': [1.0]}, 'lexicon')
+    if model is None or len(words(text)) > MAX_MODEL_WORDS:
+        return None, None
+    sentiment = naive_bayes_posterior(text, model['sentiment'])
+    topics = [(l, p) for l, p in naive_bayes_posterior(text, model['topic']) if candidate_topics is None or l in candidate_topics]
+    sentiment_result = ({'label': sentiment[0][0], 'score': sentiment[0][1]}, 'linear') if sentiment[0][1] >= threshold else None
+    topic_result = ({'labels': [l for l, _ in topics], 'scores': [p for _, p in topics]}, 'linear') if topics and topics[0][1] >= threshold else None
+    return sentiment_result, topic_result
+
+def model_labelled(df, tier_columns=('sentiment_tier', 'topic_tier')):
+    """
+    Enriched rows whose labels in `tier_columns` came from the transformers, or that predate the tier columns.
+    Lexicon, linear, embedding and fallback labels are derived from the transformer ones, so anything trained or
+    scored against stored labels must use only these rows.
+    """
+    for column in tier_columns:
+        if column in df.columns:
+            df = df[df[column].eq('transformer') | df[column].isna()]
+    return df
+
+def _load_labelled_texts(pattern):
+    """Distinct texts with the sentiment and topic the transformers gave them (cascade-labelled rows excluded)."""
+    import pandas as pd
+    df = pd.concat([pd.read_csv(f) for f in sorted(glob.glob(pattern))], ignore_index=True)
+    df = model_labelled(df.dropna(subset=['text_for_analysis', 'sentiment_score', 'topic']))
+    df = df[df['topic'] != 'Uncategorized']
+    df['sentiment'] = df['sentiment_score'].astype(int).map(SENTIMENT_LABELS)
+    df['rows'] = df.groupby('text_for_analysis')['text_for_analysis'].transform('size')
+    df = df.drop_duplicates('text_for_analysis')
+    # Deterministic 80/20 split so the model is evaluated on texts it was not trained on.
+    df['holdout'] = df['text_for_analysis'].apply(lambda t: hashlib.sha1(t.encode('utf-8')).digest()[0] % 5 == 0)
+    return df
+
+def evaluate(df, model=None, threshold=DEFAULT_THRESHOLD):
+    """Per tier: share of texts and rows it labels, and how often it agrees with the transformer labels."""
+    stats = {}
+    for text, sentiment, topic, rows in zip(df['text_for_analysis'], df['sentiment'], df['topic'], df['rows']):
+        for pipeline, result, expected in zip(('sentiment', 'topic'), classify(text, model, threshold), (sentiment, topic)):
+            tier = result[1] if result else 'transformer'
+            s = stats.setdefault((pipeline, tier), [0, 0, 0])
+            s[0] += 1; s[1] += rows
+            if result:
+                s[2] += (result[0].get('label') or result[0]['labels'][0]) == expected
+    print(f"Distinct texts evaluated: {len(df)} ({int(df['rows'].sum())} rows), threshold {threshold}")
+    for pipeline in ('sentiment', 'topic'):
+        print(f"  {pipeline}:")
+        for tier in ('lexicon', 'linear', 'transformer'):
+            texts, rows, agree = stats.get((pipeline, tier), [0, 0, 0])
+            accuracy = f"{agree / texts:.1%} agree with transformer" if texts and tier != 'transformer' else "-"
+            print(f"    {tier:<12} {texts / len(df):6.1%} of texts, {rows / df['rows'].sum():6.1%} of rows  {accuracy}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cheap-first cascade for the enrichment step.")
+    parser.add_argument("--data", default="enriched_data/enriched_data_*.csv", help="Glob of transformer-labelled files to train or evaluate on.")
+    parser.add_argument("--train", action='store_true', help=f"Train the naive Bayes tier on the training split and save it to {MODEL_FILE}.")
+    parser.add_argument("--evaluate", action='store_true', help="Report coverage and agreement with the transformer labels per tier.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    labelled = _load_labelled_texts(args.data)
+    if args.train:
+        training = labelled[~labelled['holdout']]
+        train_cascade_model(training['text_for_analysis'], training['sentiment'], training['topic'])
+        print(f"Trained cascade model on {len(training)} texts; saved to '{MODEL_FILE}'.")
+    if args.evaluate:
+        print("--- Lexicon only, all labelled texts ---")
+        evaluate(labelled, None, args.threshold)
+        trained_model = load_cascade_model()
+        if trained_model is not None:
+            print("\n--- Lexicon + naive Bayes, held-out split ---")
+            evaluate(labelled[labelled['holdout']], trained_model, args.threshold)
@@ -5,6 +5,9 @@ import plotly.express as px
 import plotly.graph_objects as go # We need this for the gauge chart
 import os
 from dateutil.relativedelta import relativedelta
+from post_store import open_post_store, get_post_history, POST_STORE_DB
+from kpi_cube import load_cube, load_daily_rollup, post_cube, comment_cube, rollup_summary, rollup_comment_cube, select_cells, rollup, mean, bucket_shares
+from post_stats import comment_days
 
 # --- 1. CONFIGURATION ---
 CONFIG = {
@@ -45,6 +48,9 @@ def load_and_process_data(folder_path, file_prefix):
     for col in text_cols:
         if col in full_df.columns:
             full_df[col] = full_df[col].fillna("N/A")
+    if 'original_comment_for_context' in full_df.columns:
+        # UTC day of each comment, for Week / Day filtering (NaT where no timestamp was kept).
+        full_df['comment_day'] = comment_days(full_df.get('comment_date', pd.Series(index=full_df.index, dtype=object)))
     return full_df.sort_values('month', ignore_index=True)
 
 @st.cache_data
@@ -57,9 +63,30 @@ def load_gemini_report(month_str):
     except FileNotFoundError:
         return ""
 
+@st.cache_data
+def load_post_history(post_id):
+    """A post's lifetime row and monthly slices from the cross-month post store (one keyed lookup)."""
+    if not os.path.exists(POST_STORE_DB): return None, pd.DataFrame()
+    conn = open_post_store()
+    try:
+        return get_post_history(conn, post_id)
+    finally:
+        conn.close()
+
+@st.cache_data
+def load_kpi_cube():
+    """The pipeline's KPI cube (post cells, comment cells), keyed by 'YYYY-MM' month, topic, content type and sentiment bucket."""
+    return load_cube()
+
+@st.cache_data
+def load_daily():
+    """The pipeline's daily rollup: comments and sentiment sums per UTC day, post, topic and sentiment bucket."""
+    return load_daily_rollup()
+
 # --- 4. LOAD INITIAL DATA ---
 df_full_summary = load_and_process_data(CONFIG["summary_data_folder"], "post_summary")
 df_full_comments = load_and_process_data(CONFIG["comment_data_folder"], "enriched_data")
+df_daily = load_daily()
 
 if df_full_summary.empty:
     st.error("No Summary Data Found!", icon="🚨")
@@ -71,69 +98,109 @@ if df_full_summary.empty:
 st.sidebar.title("Dashboard Controls")
 st.sidebar.header("Analysis Period")
 min_date = df_full_summary['month'].min().date()
-max_date = df_full_summary['month'].max().date()
+max_date = (df_full_summary['month'].max() + pd.offsets.MonthEnd(0)).date()
 default_start_calculated = max_date - relativedelta(months=2)
 default_start = max([min_date, default_start_calculated])
 date_selection = st.sidebar.date_input("Select Date Range:", value=(default_start, max_date), min_value=min_date, max_value=max_date)
+# Week and Day filter to exact dates through the daily rollup, which needs the comment timestamps. Months it lacks
+# (aggregated before it existed, or from comments without timestamps) are left out of those views, with a warning.
+summary_months = set(df_full_summary['month'].dt.strftime('%Y-%m'))
+daily_months = set(df_daily['month']) & summary_months
+missing_daily_months = sorted(summary_months - daily_months)
+granularity = st.sidebar.radio("Granularity:", ("Month", "Week", "Day"), horizontal=True) if daily_months else "Month"
 if isinstance(date_selection, tuple) and len(date_selection) == 2:
     selected_start_date, selected_end_date = date_selection
 else:
     selected_start_date = selected_end_date = date_selection[0] if isinstance(date_selection, tuple) else date_selection
-primary_start = pd.to_datetime(selected_start_date).to_period('M').to_timestamp()
-primary_end = (pd.to_datetime(selected_end_date).to_period('M') + 1).to_timestamp() - pd.Timedelta(days=1)
-st.sidebar.info(f"Filtering from {primary_start.strftime('%Y-%m-01')} to {primary_end.strftime('%Y-%m-%d')}")
+if granularity == "Month":
+    primary_start = pd.to_datetime(selected_start_date).to_period('M').to_timestamp()
+    primary_end = (pd.to_datetime(selected_end_date).to_period('M') + 1).to_timestamp() - pd.Timedelta(days=1)
+else:
+    primary_start, primary_end = pd.Timestamp(selected_start_date), pd.Timestamp(selected_end_date)
+    if granularity == "Week":
+        primary_start -= pd.Timedelta(days=primary_start.weekday())
+        primary_end += pd.Timedelta(days=6 - primary_end.weekday())
+period_format = '%Y-%m' if granularity == "Month" else '%Y-%m-%d'
+st.sidebar.info(f"Filtering from {primary_start.strftime('%Y-%m-%d')} to {primary_end.strftime('%Y-%m-%d')}")
 st.sidebar.header("Comparison Period")
 comparison_option = st.sidebar.selectbox("Compare to:", ("Previous Period", "Previous 3 Months", "Previous 6 Months", "None"), index=0)
 st.sidebar.header("Content Filters")
 all_topics = sorted(df_full_summary[df_full_summary['main_topic'] != "N/A"]['main_topic'].unique())
 selected_topics = st.sidebar.multiselect("Filter by Topic:", options=all_topics, default=all_topics)
 search_term = st.sidebar.text_input("Search in Post Caption:")
+df_posts = df_full_summary.drop_duplicates('post_id', keep='last').set_index('post_id')
 
 # --- 6. DYNAMIC DATA FILTERING ---
 # (This section is unchanged and remains the same as the last correct version)
 comp_start_date, comp_end_date = None, None
 if comparison_option != "None":
-    period_length_months = relativedelta(months=len(pd.date_range(primary_start, primary_end, freq='ME')))
+    period_length = relativedelta(months=len(pd.date_range(primary_start, primary_end, freq='ME'))) if granularity == "Month" else primary_end - primary_start + pd.Timedelta(days=1)
     if comparison_option == "Previous Period":
         comp_end_date = primary_start - pd.Timedelta(days=1)
-        comp_start_date = primary_start - period_length_months
+        comp_start_date = primary_start - period_length
     elif comparison_option == "Previous 3 Months":
         comp_end_date = primary_start - pd.Timedelta(days=1)
         comp_start_date = primary_start - relativedelta(months=3)
     elif comparison_option == "Previous 6 Months":
         comp_end_date = primary_start - pd.Timedelta(days=1)
         comp_start_date = primary_start - relativedelta(months=6)
+uncovered_months = []
+if granularity != "Month":
+    shown_months = ((comp_start_date or primary_start).strftime('%Y-%m'), primary_end.strftime('%Y-%m'))
+    uncovered_months = [m for m in missing_daily_months if shown_months[0] <= m <= shown_months[1]]
+    # One row per post and week / day from the daily rollup, with the period start in 'month' like the monthly rows.
+    df_full_summary = rollup_summary(df_daily, df_posts, granularity)
 common_mask = (df_full_summary['main_topic'].isin(selected_topics)) & (df_full_summary['post_caption'].str.contains(search_term, case=False, na=False))
 df_primary_summary = df_full_summary[common_mask & (df_full_summary['month'] >= primary_start) & (df_full_summary['month'] <= primary_end)]
-df_comparison_summary = pd.DataFrame()
-if comp_start_date and comp_end_date:
-    df_comparison_summary = df_full_summary[common_mask & (df_full_summary['month'] >= comp_start_date) & (df_full_summary['month'] <= comp_end_date)]
 if not df_full_comments.empty:
     common_mask_comments = (df_full_comments['topic'].isin(selected_topics)) & (df_full_comments['post_caption'].str.contains(search_term, case=False, na=False))
-    df_filtered_comments = df_full_comments[common_mask_comments & (df_full_comments['month'] >= primary_start) & (df_full_comments['month'] <= primary_end)]
+    comment_period = df_full_comments['month'] if granularity == "Month" else df_full_comments['comment_day']
+    df_filtered_comments = df_full_comments[common_mask_comments & (comment_period >= primary_start) & (comment_period <= primary_end)]
 else:
     df_filtered_comments = pd.DataFrame()
+# KPI widgets roll up the pipeline's cube, so their cost does not grow with the comments. A caption search needs
+# the post and comment rows, and a cube missing some month is stale, so both fall back to a cube built from the rows,
+# as do weeks and days, whose rows come from the daily rollup.
+post_cells, comment_cells = load_kpi_cube()
+if search_term or granularity != "Month" or set(post_cells['month']) != set(df_full_summary['month'].dt.strftime('%Y-%m')):
+    post_cells = post_cube(df_full_summary[common_mask], df_full_summary.loc[common_mask, 'month'].dt.strftime(period_format))
+    if granularity != "Month":
+        comment_cells = rollup_comment_cube(df_daily[df_daily['post_id'].map(df_posts['post_caption']).str.contains(search_term, case=False, na=False)], df_posts, granularity)
+    elif df_full_comments.empty:
+        comment_cells = comment_cells.iloc[:0]
+    else:
+        comments = df_full_comments[common_mask_comments]
+        comment_cells = comment_cube(comments, comments['month'].dt.strftime('%Y-%m'))
+primary_months = (primary_start.strftime(period_format), primary_end.strftime(period_format))
+primary_cells = select_cells(post_cells, *primary_months, selected_topics)
+comp_cells = select_cells(post_cells, comp_start_date.strftime(period_format), comp_end_date.strftime(period_format), selected_topics) if comp_start_date and comp_end_date else post_cells.iloc[:0]
 
 # --- 7. MAIN DASHBOARD LAYOUT ---
+period_label = '%B %Y' if granularity == "Month" else '%d %b %Y'
 st.title("Astra Intelligence: Social Media Analysis Platform")
-st.markdown(f"**Client:** {CONFIG['client_name']} | **Period Analyzed:** {primary_start.strftime('%B %Y')} to {primary_end.strftime('%B %Y')}")
+st.markdown(f"**Client:** {CONFIG['client_name']} | **Period Analyzed:** {primary_start.strftime(period_label)} to {primary_end.strftime(period_label)}")
+if uncovered_months:
+    st.warning(f"No daily data for {', '.join(uncovered_months)}: these months are left out of the {granularity.lower()} figures. "
+               "Re-run aggregate_data.py for them (their comments need timestamps) or switch to Month.")
 
 if df_primary_summary.empty:
     st.warning("No data matches your current filter selection.")
     st.stop()
 
 # --- Pre-calculate metrics for the new cockpit ---
-primary_sentiment = df_primary_summary['avg_sentiment_score'].mean()
-primary_engagement = df_primary_summary['weighted_engagement_rate'].mean()
-primary_comments = df_primary_summary['comment_count'].sum()
+primary_totals, comp_totals = rollup(primary_cells), rollup(comp_cells)
+has_comparison = comp_totals['posts'] > 0
+primary_sentiment = mean(primary_totals, 'sentiment')
+primary_engagement = mean(primary_totals, 'engagement')
+primary_comments = int(primary_totals['comments'])
 primary_posts = df_primary_summary['post_id'].nunique()
 
-comp_sentiment = df_comparison_summary['avg_sentiment_score'].mean() if not df_comparison_summary.empty else 0
-comp_engagement = df_comparison_summary['weighted_engagement_rate'].mean() if not df_comparison_summary.empty else 0
-comp_comments = df_comparison_summary['comment_count'].sum() if not df_comparison_summary.empty else 0
+comp_sentiment = mean(comp_totals, 'sentiment') if has_comparison else 0
+comp_engagement = mean(comp_totals, 'engagement') if has_comparison else 0
+comp_comments = int(comp_totals['comments'])
 
-sentiment_map = {-1: 'Negative', 0: 'Neutral', 1: 'Positive'}
-sentiment_dist = df_filtered_comments['sentiment_score'].map(sentiment_map).value_counts(normalize=True) * 100
+sentiment_map = {'negative': 'Negative', 'neutral': 'Neutral', 'positive': 'Positive'}
+sentiment_dist = bucket_shares(select_cells(comment_cells, *primary_months, selected_topics)).rename(index=sentiment_map) * 100
 
 # (The rest of the dashboard remains the same)
 overview_tab, analysis_tab, explorer_tab, reports_tab = st.tabs(["Executive Overview", "Trend & Content Analysis", "Data Explorer", "AI Briefing Library"])
@@ -219,29 +286,33 @@ with analysis_tab:
     # ... (rest of the tab code is unchanged) ...
     with tab1:
         st.subheader("Performance Over Time (Primary Period)")
-        df_monthly = df_primary_summary.groupby(df_primary_summary['month'].dt.to_period('M')).agg(avg_sentiment_score=('avg_sentiment_score', 'mean'), weighted_engagement_rate=('weighted_engagement_rate', 'mean')).reset_index()
-        df_monthly['month'] = df_monthly['month'].dt.to_timestamp()
+        monthly_totals = rollup(primary_cells, 'month')
+        df_monthly = pd.DataFrame({'avg_sentiment_score': mean(monthly_totals, 'sentiment'), 'weighted_engagement_rate': mean(monthly_totals, 'engagement')}).reset_index()
+        df_monthly['month'] = pd.to_datetime(df_monthly['month'], format=period_format)
         fig_time = px.line(df_monthly, x='month', y=['avg_sentiment_score', 'weighted_engagement_rate'], markers=True, labels={"value": "Score / Rate", "month": "Month", "variable": "Metric"})
         st.plotly_chart(fig_time, use_container_width=True)
     with tab2:
         st.subheader("Performance by Content Type")
-        if 'content_type' not in df_primary_summary.columns or df_primary_summary['content_type'].nunique() <= 1:
+        if primary_cells['content_type'].nunique() <= 1:
             st.info("Enable this chart by adding a 'content_type' column to your data.")
         else:
-            content_performance = df_primary_summary.groupby('content_type').agg(avg_engagement=('weighted_engagement_rate', 'mean'), avg_sentiment=('avg_sentiment_score', 'mean'), post_count=('post_id', 'nunique')).reset_index()
+            content_totals = rollup(primary_cells, 'content_type')
+            # Distinct posts do not add up across months, so they are counted on the post rows.
+            content_performance = pd.DataFrame({'avg_engagement': mean(content_totals, 'engagement'), 'avg_sentiment': mean(content_totals, 'sentiment'), 'post_count': df_primary_summary.groupby('content_type')['post_id'].nunique()}).reset_index()
             fig_quadrant = px.scatter(content_performance, x='avg_engagement', y='avg_sentiment', size='post_count', color='content_type', text='content_type', labels={"avg_engagement": "Average Engagement Rate", "avg_sentiment": "Average Sentiment Score"}, title="Content Type Performance Quadrant")
             fig_quadrant.update_traces(textposition='top center')
             st.plotly_chart(fig_quadrant, use_container_width=True)
     with tab3:
         st.subheader("Sentiment Trend Comparison")
-        if df_comparison_summary.empty or comparison_option == "None":
+        if not has_comparison or comparison_option == "None":
             st.info("Select a comparison period from the sidebar to view this chart.")
         else:
-            primary_monthly = df_primary_summary.groupby(df_primary_summary['month'].dt.to_period('M')).agg(avg_sentiment_score=('avg_sentiment_score', 'mean')).reset_index()
+            primary_monthly = mean(rollup(primary_cells, 'month'), 'sentiment').rename('avg_sentiment_score').reset_index()
             primary_monthly['Period'] = 'Primary'
-            comp_monthly = df_comparison_summary.groupby(df_comparison_summary['month'].dt.to_period('M')).agg(avg_sentiment_score=('avg_sentiment_score', 'mean')).reset_index()
-            primary_monthly['day_num'] = (primary_monthly['month'].dt.to_timestamp() - primary_monthly['month'].dt.to_timestamp().min()).dt.days
-            comp_monthly['day_num'] = (comp_monthly['month'].dt.to_timestamp() - comp_monthly['month'].dt.to_timestamp().min()).dt.days
+            comp_monthly = mean(rollup(comp_cells, 'month'), 'sentiment').rename('avg_sentiment_score').reset_index()
+            for monthly in (primary_monthly, comp_monthly):
+                monthly['month'] = pd.to_datetime(monthly['month'], format=period_format)
+                monthly['day_num'] = (monthly['month'] - monthly['month'].min()).dt.days
             comparison_df = pd.concat([primary_monthly, comp_monthly])
             fig_comp = px.line(comparison_df, x='day_num', y='avg_sentiment_score', color='Period', markers=True, labels={"day_num": "Days into Period", "avg_sentiment_score": "Average Sentiment Score"}, title="Sentiment Trend: Primary vs. Comparison Period")
             st.plotly_chart(fig_comp, use_container_width=True)
@@ -263,6 +334,20 @@ with explorer_tab:
             "negative_comment_ratio": st.column_config.ProgressColumn("Negative Ratio", format="%.1f%%", min_value=0, max_value=1),
         }, use_container_width=True, hide_index=True)
     st.markdown("---")
+    st.subheader("Post History")
+    st.markdown("Whole-lifetime metrics and month-by-month slices for one post, across every month it received comments in.")
+    history_post_id = st.selectbox("Select a post:", options=df_primary_summary['post_id'].unique())
+    lifetime, post_months = load_post_history(history_post_id) if history_post_id else (None, pd.DataFrame())
+    if lifetime is None:
+        st.info("This post is not in the post store yet. Re-run `python aggregate_data.py <month>` for its months to add it.")
+    else:
+        h1, h2, h3, h4 = st.columns(4)
+        h1.metric("Lifetime Comments", f"{lifetime['comment_count']:,}")
+        h2.metric("Lifetime Avg. Sentiment", "N/A" if lifetime['avg_sentiment_score'] is None else f"{lifetime['avg_sentiment_score']:.2f}")
+        h3.metric("Lifetime Negative Ratio", f"{lifetime['negative_comment_ratio']:.1%}")
+        h4.metric("Months Active", lifetime['month_count'], help=f"{lifetime['first_month']} to {lifetime['last_month']}")
+        st.dataframe(post_months[['month', 'comment_count', 'avg_sentiment_score', 'negative_comment_ratio', 'main_topic']], use_container_width=True, hide_index=True)
+    st.markdown("---")
     st.subheader("Individual Comment Explorer")
     st.markdown("A detailed view of all individual comments that match the current filter selection.")
     if df_filtered_comments.empty:
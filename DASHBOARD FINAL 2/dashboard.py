@@ -7,6 +7,9 @@ import os
 from dateutil.relativedelta import relativedelta
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
+from post_store import open_post_store, get_post_history, POST_STORE_DB
+from kpi_cube import load_cube, load_daily_rollup, post_cube, rollup_summary, select_cells, rollup, mean
+from post_stats import comment_days
 
 # --- 1. CONFIGURATION ---
 # Central hub for easy updates to dashboard parameters.
@@ -52,6 +55,9 @@ def load_and_process_data(folder_path, file_prefix):
     for col in text_cols:
         if col in full_df.columns:
             full_df[col] = full_df[col].fillna("N/A")
+    if 'original_comment_for_context' in full_df.columns:
+        # UTC day of each comment, for Week / Day filtering (NaT where no timestamp was kept).
+        full_df['comment_day'] = comment_days(full_df.get('comment_date', pd.Series(index=full_df.index, dtype=object)))
             
     return full_df.sort_values('month', ignore_index=True)
 
@@ -65,6 +71,26 @@ def load_gemini_report(month_str):
     except FileNotFoundError:
         return ""
 
+@st.cache_data
+def load_post_history(post_id):
+    """A post's lifetime row and monthly slices from the cross-month post store (one keyed lookup)."""
+    if not os.path.exists(POST_STORE_DB): return None, pd.DataFrame()
+    conn = open_post_store()
+    try:
+        return get_post_history(conn, post_id)
+    finally:
+        conn.close()
+
+@st.cache_data
+def load_kpi_cube():
+    """The pipeline's KPI cube (post cells, comment cells), keyed by 'YYYY-MM' month, topic, content type and sentiment bucket."""
+    return load_cube()
+
+@st.cache_data
+def load_daily():
+    """The pipeline's daily rollup: comments and sentiment sums per UTC day, post, topic and sentiment bucket."""
+    return load_daily_rollup()
+
 @st.cache_data
 def create_wordcloud(text_series):
     """Generates a word cloud figure from a pandas series of text."""
@@ -84,6 +110,7 @@ def create_wordcloud(text_series):
 # --- 4. LOAD INITIAL DATA ---
 df_full_summary = load_and_process_data(CONFIG["summary_data_folder"], "post_summary")
 df_full_comments = load_and_process_data(CONFIG["comment_data_folder"], "enriched_data")
+df_daily = load_daily()
 
 if df_full_summary.empty:
     st.error("No Summary Data Found!", icon="🚨")
@@ -95,11 +122,17 @@ st.sidebar.title("Dashboard Controls")
 st.sidebar.header("Analysis Period")
 
 min_date = df_full_summary['month'].min().date()
-max_date = df_full_summary['month'].max().date()
+max_date = (df_full_summary['month'].max() + pd.offsets.MonthEnd(0)).date()
 default_start_calculated = max_date - relativedelta(months=2)
 default_start = max([min_date, default_start_calculated])
 
 date_selection = st.sidebar.date_input("Select Date Range:", value=(default_start, max_date), min_value=min_date, max_value=max_date)
+# Week and Day filter to exact dates through the daily rollup, which needs the comment timestamps. Months it lacks
+# (aggregated before it existed, or from comments without timestamps) are left out of those views, with a warning.
+summary_months = set(df_full_summary['month'].dt.strftime('%Y-%m'))
+daily_months = set(df_daily['month']) & summary_months
+missing_daily_months = sorted(summary_months - daily_months)
+granularity = st.sidebar.radio("Granularity:", ("Month", "Week", "Day"), horizontal=True) if daily_months else "Month"
 
 if isinstance(date_selection, tuple) and len(date_selection) == 2:
     selected_start_date, selected_end_date = date_selection
@@ -107,9 +140,16 @@ else:
     selected_start_date = selected_end_date = date_selection[0] if isinstance(date_selection, tuple) else date_selection
 
 # Use 'M' for .to_period() as required by this function, which is older.
-primary_start = pd.to_datetime(selected_start_date).to_period('M').to_timestamp()
-primary_end = (pd.to_datetime(selected_end_date).to_period('M') + 1).to_timestamp() - pd.Timedelta(days=1)
-st.sidebar.info(f"Filtering from {primary_start.strftime('%Y-%m-01')} to {primary_end.strftime('%Y-%m-%d')}")
+if granularity == "Month":
+    primary_start = pd.to_datetime(selected_start_date).to_period('M').to_timestamp()
+    primary_end = (pd.to_datetime(selected_end_date).to_period('M') + 1).to_timestamp() - pd.Timedelta(days=1)
+else:
+    primary_start, primary_end = pd.Timestamp(selected_start_date), pd.Timestamp(selected_end_date)
+    if granularity == "Week":
+        primary_start -= pd.Timedelta(days=primary_start.weekday())
+        primary_end += pd.Timedelta(days=6 - primary_end.weekday())
+period_format = '%Y-%m' if granularity == "Month" else '%Y-%m-%d'
+st.sidebar.info(f"Filtering from {primary_start.strftime('%Y-%m-%d')} to {primary_end.strftime('%Y-%m-%d')}")
 
 st.sidebar.header("Comparison Period")
 comparison_option = st.sidebar.selectbox("Compare to:", ("Previous Period", "Previous 3 Months", "Previous 6 Months", "None"), index=0)
@@ -118,15 +158,16 @@ st.sidebar.header("Content Filters")
 all_topics = sorted(df_full_summary[df_full_summary['main_topic'] != "N/A"]['main_topic'].unique())
 selected_topics = st.sidebar.multiselect("Filter by Topic:", options=all_topics, default=all_topics)
 search_term = st.sidebar.text_input("Search in Post Caption:")
+df_posts = df_full_summary.drop_duplicates('post_id', keep='last').set_index('post_id')
 
 # --- 6. DYNAMIC DATA FILTERING ---
 comp_start_date, comp_end_date = None, None
 if comparison_option != "None":
     # Use 'ME' for pd.date_range() to address the FutureWarning.
-    period_length_months = relativedelta(months=len(pd.date_range(primary_start, primary_end, freq='ME')))
+    period_length = relativedelta(months=len(pd.date_range(primary_start, primary_end, freq='ME'))) if granularity == "Month" else primary_end - primary_start + pd.Timedelta(days=1)
     if comparison_option == "Previous Period":
         comp_end_date = primary_start - pd.Timedelta(days=1)
-        comp_start_date = primary_start - period_length_months
+        comp_start_date = primary_start - period_length
     elif comparison_option == "Previous 3 Months":
         comp_end_date = primary_start - pd.Timedelta(days=1)
         comp_start_date = primary_start - relativedelta(months=3)
@@ -134,22 +175,39 @@ if comparison_option != "None":
         comp_end_date = primary_start - pd.Timedelta(days=1)
         comp_start_date = primary_start - relativedelta(months=6)
 
+uncovered_months = []
+if granularity != "Month":
+    shown_months = ((comp_start_date or primary_start).strftime('%Y-%m'), primary_end.strftime('%Y-%m'))
+    uncovered_months = [m for m in missing_daily_months if shown_months[0] <= m <= shown_months[1]]
+    # One row per post and week / day from the daily rollup, with the period start in 'month' like the monthly rows.
+    df_full_summary = rollup_summary(df_daily, df_posts, granularity)
 common_mask = (df_full_summary['main_topic'].isin(selected_topics)) & (df_full_summary['post_caption'].str.contains(search_term, case=False, na=False))
 df_primary_summary = df_full_summary[common_mask & (df_full_summary['month'] >= primary_start) & (df_full_summary['month'] <= primary_end)]
 
-df_comparison_summary = pd.DataFrame()
-if comp_start_date and comp_end_date:
-    df_comparison_summary = df_full_summary[common_mask & (df_full_summary['month'] >= comp_start_date) & (df_full_summary['month'] <= comp_end_date)]
+# KPI widgets roll up the pipeline's cube, so their cost does not grow with the comments. A caption search needs
+# the post rows, and a cube missing some month is stale, so both fall back to a cube built from the summary rows,
+# as do weeks and days, whose rows come from the daily rollup.
+post_cells, _ = load_kpi_cube()
+if search_term or granularity != "Month" or set(post_cells['month']) != set(df_full_summary['month'].dt.strftime('%Y-%m')):
+    post_cells = post_cube(df_full_summary[common_mask], df_full_summary.loc[common_mask, 'month'].dt.strftime(period_format))
+primary_cells = select_cells(post_cells, primary_start.strftime(period_format), primary_end.strftime(period_format), selected_topics)
+primary_totals = rollup(primary_cells)
+comp_totals = rollup(select_cells(post_cells, comp_start_date.strftime(period_format), comp_end_date.strftime(period_format), selected_topics)) if comp_start_date and comp_end_date else None
 
 if not df_full_comments.empty:
     common_mask_comments = (df_full_comments['topic'].isin(selected_topics)) & (df_full_comments['post_caption'].str.contains(search_term, case=False, na=False))
-    df_filtered_comments = df_full_comments[common_mask_comments & (df_full_comments['month'] >= primary_start) & (df_full_comments['month'] <= primary_end)]
+    comment_period = df_full_comments['month'] if granularity == "Month" else df_full_comments['comment_day']
+    df_filtered_comments = df_full_comments[common_mask_comments & (comment_period >= primary_start) & (comment_period <= primary_end)]
 else:
     df_filtered_comments = pd.DataFrame()
 
 # --- 7. MAIN DASHBOARD LAYOUT ---
+period_label = '%B %Y' if granularity == "Month" else '%d %b %Y'
 st.title("Astra Strategic Command Center")
-st.markdown(f"**Client:** {CONFIG['client_name']} | **Period Analyzed:** {primary_start.strftime('%B %Y')} to {primary_end.strftime('%B %Y')}")
+st.markdown(f"**Client:** {CONFIG['client_name']} | **Period Analyzed:** {primary_start.strftime(period_label)} to {primary_end.strftime(period_label)}")
+if uncovered_months:
+    st.warning(f"No daily data for {', '.join(uncovered_months)}: these months are left out of the {granularity.lower()} figures. "
+               "Re-run aggregate_data.py for them (their comments need timestamps) or switch to Month.")
 
 if df_primary_summary.empty:
     st.warning("No data matches your current filter selection.")
@@ -163,20 +221,21 @@ with overview_tab:
     
     with col1:
         st.subheader("Key Performance Metrics")
-        primary_engagement = df_primary_summary['weighted_engagement_rate'].mean()
-        comp_engagement = df_comparison_summary['weighted_engagement_rate'].mean() if not df_comparison_summary.empty else 0
-        primary_sentiment = df_primary_summary['avg_sentiment_score'].mean()
-        comp_sentiment = df_comparison_summary['avg_sentiment_score'].mean() if not df_comparison_summary.empty else 0
+        has_comparison = comp_totals is not None and comp_totals['posts'] > 0
+        primary_engagement = mean(primary_totals, 'engagement')
+        comp_engagement = mean(comp_totals, 'engagement') if has_comparison else 0
+        primary_sentiment = mean(primary_totals, 'sentiment')
+        comp_sentiment = mean(comp_totals, 'sentiment') if has_comparison else 0
         
         st.metric("Average Engagement Rate", f"{primary_engagement:.3%}", f"{primary_engagement - comp_engagement:.3%}" if comparison_option != "None" else None, help="Engagement score per follower")
         st.metric("Average Sentiment Score", f"{primary_sentiment:.2f}", f"{primary_sentiment - comp_sentiment:.2f}" if comparison_option != "None" else None, help="From -1 (Negative) to +1 (Positive)")
         st.metric("Total Posts", f"{df_primary_summary['post_id'].nunique():,}")
-        st.metric("Total Comments", f"{df_primary_summary['comment_count'].sum():,}")
+        st.metric("Total Comments", f"{int(primary_totals['comments']):,}")
 
     with col2:
         st.subheader("Narrative Sentiment Scoreboard")
         st.markdown("Average sentiment for each key discussion topic.")
-        topic_sentiment = df_primary_summary.groupby('main_topic')['avg_sentiment_score'].mean().sort_values(ascending=False)
+        topic_sentiment = mean(rollup(primary_cells, 'topic'), 'sentiment').rename_axis('main_topic').rename('avg_sentiment_score').sort_values(ascending=False)
         fig = px.bar(topic_sentiment, orientation='h', labels={'value': 'Average Sentiment Score', 'main_topic': 'Topic / Narrative'}, color=topic_sentiment.values, color_continuous_scale='RdYlGn', range_color=[-1,1])
         fig.update_layout(showlegend=False, height=350, margin=dict(l=10, r=10, t=10, b=10))
         st.plotly_chart(fig, use_container_width=True)
@@ -231,14 +290,16 @@ with strategy_tab:
     st.header("Content Strategy Quadrant")
     st.markdown("Identify which content formats drive the most engagement and positive sentiment.")
     
-    if 'content_type' not in df_primary_summary.columns or df_primary_summary['content_type'].nunique() <= 1:
+    if primary_cells['content_type'].nunique() <= 1:
         st.info("Enable this chart by adding a 'content_type' column with varied types (e.g., Photo, Video) to your source data and re-running the pipeline.")
     else:
-        content_performance = df_primary_summary.groupby('content_type').agg(
-            avg_engagement=('weighted_engagement_rate', 'mean'), 
-            avg_sentiment=('avg_sentiment_score', 'mean'), 
-            post_count=('post_id', 'nunique')
-        ).reset_index()
+        content_totals = rollup(primary_cells, 'content_type')
+        content_performance = pd.DataFrame({
+            'avg_engagement': mean(content_totals, 'engagement'),
+            'avg_sentiment': mean(content_totals, 'sentiment'),
+            # Distinct posts do not add up across months, so they are counted on the post rows.
+            'post_count': df_primary_summary.groupby('content_type')['post_id'].nunique()
+        }).reset_index()
         fig_quadrant = px.scatter(
             content_performance, x='avg_engagement', y='avg_sentiment', size='post_count', 
             color='content_type', text='content_type', 
@@ -255,6 +316,21 @@ with explorer_tab:
     st.data_editor(df_primary_summary[columns_to_display],
         column_config={"post_caption": st.column_config.TextColumn("Post Caption", width="medium"),"most_positive_comment": st.column_config.TextColumn("Most Positive Comment", width="large"),"most_negative_comment": st.column_config.TextColumn("Most Negative Comment", width="large"),"avg_sentiment_score": st.column_config.NumberColumn("Avg. Sentiment", format="%.2f"),"negative_comment_ratio": st.column_config.ProgressColumn("Negative Ratio", format="%.1f%%", min_value=0, max_value=1),}, use_container_width=True, hide_index=True)
     
+    st.markdown("---")
+    st.subheader("Post History")
+    st.markdown("Whole-lifetime metrics and month-by-month slices for one post, across every month it received comments in.")
+    history_post_id = st.selectbox("Select a post:", options=df_primary_summary['post_id'].unique())
+    lifetime, post_months = load_post_history(history_post_id) if history_post_id else (None, pd.DataFrame())
+    if lifetime is None:
+        st.info("This post is not in the post store yet. Re-run `python aggregate_data.py <month>` for its months to add it.")
+    else:
+        h1, h2, h3, h4 = st.columns(4)
+        h1.metric("Lifetime Comments", f"{lifetime['comment_count']:,}")
+        h2.metric("Lifetime Avg. Sentiment", "N/A" if lifetime['avg_sentiment_score'] is None else f"{lifetime['avg_sentiment_score']:.2f}")
+        h3.metric("Lifetime Negative Ratio", f"{lifetime['negative_comment_ratio']:.1%}")
+        h4.metric("Months Active", lifetime['month_count'], help=f"{lifetime['first_month']} to {lifetime['last_month']}")
+        st.dataframe(post_months[['month', 'comment_count', 'avg_sentiment_score', 'negative_comment_ratio', 'main_topic']], use_container_width=True, hide_index=True)
+    
     st.subheader("Individual Comment Explorer")
     if df_filtered_comments.empty:
         st.warning("No individual comments match your current filter selection.")
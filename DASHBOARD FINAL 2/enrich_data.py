@@ -1,67 +1,297 @@
 # enrich_data.py
 import pandas as pd
-from transformers import pipeline
 import os
+import json
 import argparse
-import torch
+from contextlib import ExitStack
+from atomic_io import write_csv_atomic, append_csv_durable, write_json_atomic
+from inference_cache import open_inference_cache, lookup_inferences, store_inferences
+from enrichment_batching import token_lengths, run_bucketed, TOKEN_BUDGET, MAX_SEQUENCE_LENGTH
+from topic_embeddings import EMBEDDING_MODEL
+from enrichment_server import DEFAULT_SERVER_URL
+from cascade_classifier import DEFAULT_THRESHOLD as CASCADE_THRESHOLD
 
-def enrich_for_month(month_str):
+CANDIDATE_TOPICS = ['Economy', 'Healthcare', 'Public Safety', 'Environment', 'Foreign Policy', 'Education', 'Praise', 'Criticism', 'Infrastructure']
+SENTIMENT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+TOPIC_MODEL = "MoritzLaurer/mDeBERTa-v3-base-mnli-xnli"
+HYPOTHESIS_TOKENS = 8  # "This example is {}." and separators, added to every text in a zero-shot pair
+BACKENDS = ['pytorch', 'onnx']
+# Tasks the 'onnx' backend applies to. Each model only runs on ONNX once its int8 export has passed the parity
+# check of benchmark_onnx_backend.py (see onnx_backend.parity_passed); until then it stays on PyTorch.
+ONNX_TASKS = ("sentiment-analysis", "zero-shot-classification")
+CHUNK_ROWS = 5000  # input rows read, scored and committed to the partial output at a time
+
+def task_backend(task, backend, model_name):
+    """The backend `task` actually runs on under the requested `backend`."""
+    if backend != 'onnx' or task not in ONNX_TASKS:
+        return 'pytorch'
+    from onnx_backend import parity_passed
+    return 'onnx' if parity_passed(model_name, task) else 'pytorch'
+
+def model_cache_id(model_name, backend='pytorch', max_length=None):
+    """
+    Id of a model's results in the inference cache. Quantized ONNX outputs differ slightly from PyTorch's, and texts
+    truncated to another `max_length` score differently, so both get their own id. `max_length=None` means the
+    model's own limit (fixed by the model name).
+    """
+    model_id = model_name if backend == 'pytorch' else f"{model_name}@onnx-int8"
+    return model_id if max_length is None else f"{model_id}@max{max_length}"
+
+def load_pipeline(task, model_name, backend='pytorch', device=-1, threads=None):
+    """A transformers pipeline, or its int8 ONNX Runtime stand-in (exported on first use, see onnx_backend.py)."""
+    if task_backend(task, backend, model_name) == 'onnx':
+        from onnx_backend import OnnxSentimentPipeline, OnnxZeroShotPipeline
+        onnx_cls = OnnxSentimentPipeline if task == "sentiment-analysis" else OnnxZeroShotPipeline
+        return onnx_cls(model_name, threads=threads)
+    if backend == 'onnx':
+        print(f"--> NOTE: {model_name} has no passing int8 parity check for {task} (run benchmark_onnx_backend.py); using PyTorch.")
+    from transformers import pipeline
+    return pipeline(task, model=model_name, device=device)
+
+def score_sentiment(sentiment_pipeline, texts, token_budget=TOKEN_BUDGET, on_batch_done=None):
+    """Sentiment {'label', 'score'} per text (None where a batch failed), batched by token length."""
+    lengths = token_lengths(texts, getattr(sentiment_pipeline, 'tokenizer', None))
+    def run(batch):
+        return [{'label': res['label'], 'score': res['score']} for res in sentiment_pipeline(batch, batch_size=len(batch), truncation=True, max_length=MAX_SEQUENCE_LENGTH)]
+    return run_bucketed(run, texts, lengths, token_budget, on_batch_done=on_batch_done)
+
+def score_topics(topic_pipeline, texts, candidate_topics=CANDIDATE_TOPICS, token_budget=TOKEN_BUDGET, on_batch_done=None):
+    """Full zero-shot {'labels', 'scores'} distribution per text (None where a batch failed), batched by token length.
+    Every text is paired with each candidate topic, so a text costs len(candidate_topics) sequences."""
+    lengths = [n + HYPOTHESIS_TOKENS for n in token_lengths(texts, getattr(topic_pipeline, 'tokenizer', None))]
+    def run(batch):
+        results = topic_pipeline(batch, candidate_labels=candidate_topics, multi_label=False, truncation=True, batch_size=len(batch) * len(candidate_topics))
+        return [{'labels': res['labels'], 'scores': res['scores']} for res in ([results] if isinstance(results, dict) else results)]
+    return run_bucketed(run, texts, lengths, token_budget, cost_per_item=len(candidate_topics), on_batch_done=on_batch_done)
+
+def load_topic_encoder(device):
+    """(encoder, prototypes, cache id) for the embedding fast path; prototypes are built on first use."""
+    from topic_embeddings import load_encoder, load_or_build_prototypes, prototypes_id
+    print("Loading topic embedding model...")
+    encoder = load_encoder(EMBEDDING_MODEL, device)
+    prototypes = load_or_build_prototypes(encoder, CANDIDATE_TOPICS)
+    return encoder, prototypes, prototypes_id(EMBEDDING_MODEL, CANDIDATE_TOPICS, prototypes)
+
+def similarity_fast_path(cache_conn, texts, topic_encoder, margin, token_budget=TOKEN_BUDGET):
+    """
+    Scores `texts` against the topic prototypes and returns {text: result} for those whose best topic beats the
+    runner-up by at least `margin`; the rest are left for the zero-shot model. All similarity results are cached
+    with their margin, so a later run with another margin reuses them.
+    """
+    from topic_embeddings import score_topics_by_similarity, is_confident
+    encoder, prototypes, engine_id = topic_encoder
+    similar = lookup_inferences(cache_conn, texts, engine_id, CANDIDATE_TOPICS)
+    fresh = [t for t in texts if t not in similar]
+    if fresh:
+        results = score_topics_by_similarity(encoder, prototypes, fresh, CANDIDATE_TOPICS, token_budget)
+        scored = [(t, r) for t, r in zip(fresh, results) if r is not None]
+        store_inferences(cache_conn, [t for t, _ in scored], [r for _, r in scored], engine_id, CANDIDATE_TOPICS)
+        similar.update(scored)
+    confident = {t: r for t, r in similar.items() if is_confident(r, margin)}
+    print(f"Topic fast path: {len(confident)}/{len(texts)} texts above margin {margin}, {len(texts) - len(confident)} left for zero-shot NLI.")
+    return confident
+
+def load_progress(progress_path, partial_path, input_path, settings):
+    """Input rows already written to `partial_path` by an interrupted run with the same input and settings, else 0."""
+    try:
+        with open(progress_path, 'r', encoding='utf-8') as f:
+            progress = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+    stat = os.stat(input_path)
+    if (progress.get('input_size'), progress.get('input_mtime'), progress.get('settings')) != (stat.st_size, stat.st_mtime, settings) \
+            or not os.path.exists(partial_path) or os.path.getsize(partial_path) < progress.get('partial_bytes', 0):
+        return 0
+    # Drops a chunk that was appended but not yet recorded when the run stopped.
+    with open(partial_path, 'r+b') as f:
+        f.truncate(progress['partial_bytes'])
+    return progress['rows_done']
+
+def enrich_for_month(month_str, token_budget=TOKEN_BUDGET, topic_engine='nli', topic_margin=None, backend='pytorch', workers=1,
+                     sentiment_model=SENTIMENT_MODEL, topic_model=TOPIC_MODEL, server_url=None, cascade=False, cascade_threshold=CASCADE_THRESHOLD,
+                     chunk_rows=CHUNK_ROWS):
     INPUT_CSV = f"processed_data/analysis_ready_{month_str}.csv"
     OUTPUT_DIR = "enriched_data"
     OUTPUT_CSV = f"{OUTPUT_DIR}/enriched_data_{month_str}.csv"
-    CANDIDATE_TOPICS = ['Economy', 'Healthcare', 'Public Safety', 'Environment', 'Foreign Policy', 'Education', 'Praise', 'Criticism', 'Infrastructure']
-    BATCH_SIZE = 64
+    PARTIAL_CSV = f"{OUTPUT_CSV}.partial"
+    PROGRESS_FILE = f"{OUTPUT_DIR}/enrich_progress_{month_str}.json"
 
     print(f"\n--- [Step 3] Enriching Data for {month_str} ---")
 
-    try:
-        df = pd.read_csv(INPUT_CSV)
-        df_to_process = df.dropna(subset=['text_for_analysis']).copy()
-        print(f"Found {len(df_to_process)} non-empty comments to analyze.")
-    except FileNotFoundError:
+    if not os.path.exists(INPUT_CSV):
         print(f"--> ERROR: Input file '{INPUT_CSV}' not found."); exit(1)
+    if topic_engine == 'embedding' and topic_margin is None:
+        print("--> ERROR: The embedding topic engine needs a margin (pick one with benchmark_topic_engine.py)."); exit(1)
+
+    # score_sentiment truncates at MAX_SEQUENCE_LENGTH; the zero-shot pipeline at the model's own limit.
+    sentiment_id = model_cache_id(sentiment_model, task_backend("sentiment-analysis", backend, sentiment_model), MAX_SEQUENCE_LENGTH)
+    topic_id = model_cache_id(topic_model, task_backend("zero-shot-classification", backend, topic_model))
+    settings = {'sentiment': sentiment_id, 'topic': topic_id, 'topic_engine': topic_engine, 'topic_margin': topic_margin,
+                'cascade': cascade_threshold if cascade else None, 'topics': CANDIDATE_TOPICS}
+    # The input is read and written `chunk_rows` rows at a time; each finished chunk is appended to PARTIAL_CSV and
+    # PROGRESS_FILE records how many input rows it covers, so a crash only loses the chunk in flight.
+    rows_done = load_progress(PROGRESS_FILE, PARTIAL_CSV, INPUT_CSV, settings)
+    if rows_done:
+        print(f"Resuming: {rows_done} rows already enriched in '{PARTIAL_CSV}'.")
+    elif os.path.exists(PARTIAL_CSV):
+        os.remove(PARTIAL_CSV)
 
-    if df_to_process.empty:
+    cascade_model = None
+    if cascade:
+        from cascade_classifier import load_cascade_model, classify
+        cascade_model = load_cascade_model()
+        if cascade_model is None:
+            print("No cascade model found; lexicon tier only (train one with `python cascade_classifier.py --train`).")
+    cache_conn = open_inference_cache()
+    # Models, the server connection and the worker pool are set up on the first chunk that needs them and kept for the rest.
+    engines, resources = {}, ExitStack()
+
+    def device():
+        if 'device' not in engines:
+            import torch
+            engines['device'] = 0 if torch.cuda.is_available() else -1
+        return engines['device']
+
+    def scorer():
+        if 'mode' not in engines:
+            # A running enrichment_server already has the models loaded; without one, they are loaded in this process.
+            client = None
+            if workers <= 1 and server_url:
+                from enrichment_server import connect
+                client = connect(server_url, sentiment_model, topic_model, backend)
+            engines['mode'], engines['client'] = ('server' if client else 'pool' if workers > 1 else 'local'), client
+            if engines['mode'] == 'pool':
+                # CPU only: each worker process loads the models once and scores shards of similar-length texts.
+                from sharded_enrichment import open_pool
+                engines['pool'] = resources.enter_context(open_pool({"sentiment-analysis": sentiment_model, "zero-shot-classification": topic_model}, workers, backend))
+        return engines['mode']
+
+    def local_pipeline(task, model_name):
+        if task not in engines:
+            print(f"Loading AI model {model_name} ({backend} backend)...")
+            engines[task] = load_pipeline(task, model_name, backend, device())
+        return engines[task]
+
+    def cache_batches(name, found, model_id, labels=None):
+        def on_batch_done(number, total, batch_texts, results, error):
+            if error is not None:
+                # Left out of the cache, so the next run retries them; this run falls back to neutral/Uncategorized.
+                print(f"  -> {name} batch {number}/{total} FAILED ({len(batch_texts)} texts): {error}"); return
+            print(f"  -> {name} batch {number}/{total} ({len(batch_texts)} texts)")
+            store_inferences(cache_conn, batch_texts, results, model_id, labels)
+            found.update(zip(batch_texts, results))
+        return on_batch_done
+
+    def label_texts(texts):
+        """{text: (sentiment_score, topic, sentiment_tier, topic_tier)} for distinct texts."""
+        # Which tier labelled each text; anything not listed here came from the transformers (or their cache).
+        sentiment_results, topic_results, sentiment_tiers, topic_tiers = {}, {}, {}, {}
+        if cascade:
+            # Trivial comments (blessings, greetings, a few words) are labelled by the lexicon or naive Bayes tier.
+            for t in texts:
+                for result, results, tiers in zip(classify(t, cascade_model, cascade_threshold, CANDIDATE_TOPICS), (sentiment_results, topic_results), (sentiment_tiers, topic_tiers)):
+                    if result is not None:
+                        results[t], tiers[t] = result
+            print(f"Cascade: sentiment {len(sentiment_results)}/{len(texts)}, topics {len(topic_results)}/{len(texts)} texts labelled without the transformers.")
+
+        # Texts already scored by the same model (and, for topics, the same candidate labels) skip the model.
+        sentiment_results.update(lookup_inferences(cache_conn, [t for t in texts if t not in sentiment_results], sentiment_id))
+        topic_results.update(lookup_inferences(cache_conn, [t for t in texts if t not in topic_results], topic_id, CANDIDATE_TOPICS))
+        sentiment_todo = [t for t in texts if t not in sentiment_results]
+        topic_todo = [t for t in texts if t not in topic_results]
+        print(f"Inference cache: sentiment {len(texts) - len(sentiment_todo) - len(sentiment_tiers)}/{len(texts) - len(sentiment_tiers)} hits, "
+              f"topics {len(texts) - len(topic_todo) - len(topic_tiers)}/{len(texts) - len(topic_tiers)} hits.")
+
+        if topic_todo and topic_engine == 'embedding':
+            # Encode each text once and compare it with per-topic prototypes; only low-margin texts reach NLI.
+            if 'topic_encoder' not in engines:
+                engines['topic_encoder'] = load_topic_encoder(device())
+            similar = similarity_fast_path(cache_conn, topic_todo, engines['topic_encoder'], topic_margin, token_budget)
+            topic_results.update(similar)
+            topic_tiers.update(dict.fromkeys(similar, 'embedding'))
+            topic_todo = [t for t in topic_todo if t not in topic_results]
+
+        # Texts are grouped by token length so each batch pads to a similar length (see enrichment_batching.py).
+        if (sentiment_todo or topic_todo) and scorer() == 'server':
+            if sentiment_todo:
+                engines['client'].score('sentiment', sentiment_todo, token_budget=token_budget, on_batch_done=cache_batches("Sentiment request", sentiment_results, sentiment_id))
+            if topic_todo:
+                engines['client'].score('topics', topic_todo, CANDIDATE_TOPICS, token_budget, on_batch_done=cache_batches("Topic request", topic_results, topic_id, CANDIDATE_TOPICS))
+        elif (sentiment_todo or topic_todo) and scorer() == 'pool':
+            from sharded_enrichment import score_sharded
+            if sentiment_todo:
+                score_sharded(engines['pool'], "sentiment-analysis", sentiment_todo, token_budget, on_batch_done=cache_batches("Sentiment shard", sentiment_results, sentiment_id))
+            if topic_todo:
+                score_sharded(engines['pool'], "zero-shot-classification", topic_todo, token_budget, CANDIDATE_TOPICS, on_batch_done=cache_batches("Topic shard", topic_results, topic_id, CANDIDATE_TOPICS))
+        else:
+            if sentiment_todo:
+                score_sentiment(local_pipeline("sentiment-analysis", sentiment_model), sentiment_todo, token_budget, cache_batches("Sentiment", sentiment_results, sentiment_id))
+            if topic_todo:
+                score_topics(local_pipeline("zero-shot-classification", topic_model), topic_todo, CANDIDATE_TOPICS, token_budget, cache_batches("Topic", topic_results, topic_id, CANDIDATE_TOPICS))
+
+        sentiment_map = {'positive': 1, 'neutral': 0, 'negative': -1}
+        # 'fallback' marks texts whose model batch failed and that got the neutral/Uncategorized default.
+        return {t: (sentiment_map.get(sentiment_results[t]['label'], 0) if t in sentiment_results else 0,
+                    topic_results[t]['labels'][0] if t in topic_results else 'Uncategorized',
+                    sentiment_tiers.get(t, 'transformer') if t in sentiment_results else 'fallback',
+                    topic_tiers.get(t, 'transformer') if t in topic_results else 'fallback') for t in texts}
+
+    total_rows = rows_done
+    with resources:
+        # skiprows keeps the header line and drops the rows the partial output already covers.
+        for chunk in pd.read_csv(INPUT_CSV, chunksize=chunk_rows, skiprows=range(1, rows_done + 1)):
+            chunk_texts = chunk['text_for_analysis'].dropna().astype(str)
+            print(f"Rows {total_rows + 1}-{total_rows + len(chunk)}: {len(chunk_texts)} non-empty comments to analyze.")
+            # Score each distinct text once and scatter the labels back to every row that carries it.
+            text_codes, unique_texts = pd.factorize(chunk_texts)
+            texts = unique_texts.tolist()
+            if texts:
+                print(f"Dedup: {len(chunk_texts)} comments -> {len(texts)} unique texts ({1 - len(texts) / len(chunk_texts):.1%} duplicates).")
+            labels = label_texts(texts) if texts else {}
+            scored = pd.DataFrame([labels[texts[code]] for code in text_codes], index=chunk_texts.index,
+                                  columns=['sentiment_score', 'topic', 'sentiment_tier', 'topic_tier'])
+            chunk = chunk.join(scored)
+            append_csv_durable(chunk, PARTIAL_CSV, header=total_rows == 0)
+            total_rows += len(chunk)
+            write_json_atomic({'rows_done': total_rows, 'partial_bytes': os.path.getsize(PARTIAL_CSV), 'input_size': os.stat(INPUT_CSV).st_size,
+                               'input_mtime': os.stat(INPUT_CSV).st_mtime, 'settings': settings}, PROGRESS_FILE)
+    cache_conn.close()
+
+    if not os.path.exists(PARTIAL_CSV):
         print("No data to process. Skipping enrichment.")
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        df['sentiment_score'] = None
-        df['topic'] = None
-        df.to_csv(OUTPUT_CSV, index=False)
-        return
-
-    print("Loading AI models...")
-    device = 0 if torch.cuda.is_available() else -1
-    sentiment_pipeline = pipeline("sentiment-analysis", model="cardiffnlp/twitter-roberta-base-sentiment-latest", device=device)
-    topic_pipeline = pipeline("zero-shot-classification", model="MoritzLaurer/mDeBERTa-v3-base-mnli-xnli", device=device)
-
-    all_sentiments, all_topics = [], []
-    texts = df_to_process['text_for_analysis'].astype(str).tolist()
-
-    for i in range(0, len(texts), BATCH_SIZE):
-        batch_texts = texts[i:i + BATCH_SIZE]
-        print(f"  -> Processing batch {i//BATCH_SIZE + 1}/{(len(texts) - 1)//BATCH_SIZE + 1}")
-        try:
-            sentiment_results = sentiment_pipeline(batch_texts, truncation=True, max_length=512)
-            sentiment_map = {'positive': 1, 'neutral': 0, 'negative': -1}
-            all_sentiments.extend([sentiment_map.get(res['label'], 0) for res in sentiment_results])
-        except Exception:
-            all_sentiments.extend([0] * len(batch_texts))
-        try:
-            topic_results = topic_pipeline(batch_texts, candidate_labels=CANDIDATE_TOPICS, multi_label=False, truncation=True)
-            all_topics.extend([res['labels'][0] for res in topic_results])
-        except Exception:
-            all_topics.extend(['Uncategorized'] * len(batch_texts))
-
-    df_to_process['sentiment_score'] = all_sentiments
-    df_to_process['topic'] = all_topics
-    df_final = df.merge(df_to_process[['sentiment_score', 'topic']], left_index=True, right_index=True, how='left')
-
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    df_final.to_csv(OUTPUT_CSV, index=False)
+        df = pd.read_csv(INPUT_CSV)
+        for column in ('sentiment_score', 'topic', 'sentiment_tier', 'topic_tier'):
+            df[column] = None
+        write_csv_atomic(df, OUTPUT_CSV)
+    else:
+        os.replace(PARTIAL_CSV, OUTPUT_CSV)
+    if os.path.exists(PROGRESS_FILE):
+        os.remove(PROGRESS_FILE)
     print(f"Enrichment complete! Saved to {OUTPUT_CSV}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Enrich data with sentiment and topics.")
     parser.add_argument("month", type=str, help="The month to process in YYYY-MM format.")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET, help="Padded tokens per forward pass (batch size x longest text).")
+    parser.add_argument("--topic-engine", choices=['nli', 'embedding'], default='nli',
+                        help="'embedding' scores topics by similarity to per-topic prototypes and uses zero-shot NLI only for low-margin texts.")
+    parser.add_argument("--topic-margin", type=float,
+                        help="Minimum cosine gap between the top two topics to accept the embedding result. Required with --topic-engine embedding; "
+                             "there is no default because it must be picked on the production models with benchmark_topic_engine.py.")
+    parser.add_argument("--backend", choices=BACKENDS, default='pytorch',
+                        help="'onnx' runs each model as an int8-quantized ONNX graph on ONNX Runtime (CPU), once it has passed benchmark_onnx_backend.py's parity check.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for CPU inference; each loads the models once and gets cpu_count / workers threads.")
+    parser.add_argument("--sentiment-model", default=SENTIMENT_MODEL)
+    parser.add_argument("--topic-model", default=TOPIC_MODEL)
+    parser.add_argument("--server", default=os.getenv('ENRICHMENT_SERVER_URL', DEFAULT_SERVER_URL),
+                        help="Enrichment server to score through when it serves the same models (see enrichment_server.py).")
+    parser.add_argument("--no-server", action='store_true', help="Always load the models in this process.")
+    parser.add_argument("--cascade", action='store_true', help="Label trivial comments with the lexicon / naive Bayes tiers before the transformers (see cascade_classifier.py).")
+    parser.add_argument("--cascade-threshold", type=float, default=CASCADE_THRESHOLD, help="Minimum naive Bayes probability to accept its label.")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Input rows per committed chunk; an interrupted run resumes after the last one.")
     args = parser.parse_args()
-    enrich_for_month(args.month)
+    if args.topic_engine == 'embedding' and args.topic_margin is None:
+        parser.error("--topic-margin is required with --topic-engine embedding")
+    enrich_for_month(args.month, args.token_budget, args.topic_engine, args.topic_margin, args.backend, args.workers,
+                     args.sentiment_model, args.topic_model, None if args.no_server else args.server, args.cascade, args.cascade_threshold,
+                     args.chunk_rows)
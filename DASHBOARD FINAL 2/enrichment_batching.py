@@ -0,0 +1,55 @@
+# File: enrichment_batching.py
+# Length-bucketed batching for the enrichment pipelines: texts of similar token length share a forward
+# pass, each pass stays under a padded-token budget, and results come back in the original order.
+
+TOKEN_BUDGET = 8192         # padded tokens per forward pass: batch size x longest sequence in the batch
+MAX_BATCH_SIZE = 128
+MAX_SEQUENCE_LENGTH = 512
+
+def token_lengths(texts, tokenizer=None, max_length=MAX_SEQUENCE_LENGTH):
+    """Tokenized lengths (special tokens included, truncated to `max_length`); a word-count estimate without a tokenizer."""
+    if tokenizer is None:
+        return [min(max_length, int(len(t.split()) * 1.3) + 3) for t in texts]
+    encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=max_length)['input_ids']
+    return [len(ids) for ids in encoded]
+
+def plan_batches(lengths, token_budget=TOKEN_BUDGET, max_batch_size=MAX_BATCH_SIZE, cost_per_item=1):
+    """
+    Returns lists of indices into `lengths`, longest texts first, such that every batch's padded cost
+    (items x longest length x `cost_per_item`) stays within `token_budget`. A single text over budget gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    batches, current = [], []
+    for i in order:
+        # Descending order: the first item of the current batch is its longest.
+        if current and (len(current) >= max_batch_size or (len(current) + 1) * lengths[current[0]] * cost_per_item > token_budget):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+def padded_tokens(batches, lengths, cost_per_item=1):
+    return sum(len(b) * max(lengths[i] for i in b) for b in batches) * cost_per_item
+
+def run_bucketed(fn, texts, lengths, token_budget=TOKEN_BUDGET, max_batch_size=MAX_BATCH_SIZE, cost_per_item=1, on_batch_done=None):
+    """
+    Calls `fn(batch_texts)` (returning one result per text) for each planned batch and returns the results
+    aligned with `texts`. A batch whose call raises leaves its slots as None.
+    `on_batch_done(batch_number, total_batches, batch_texts, results_or_None, error_or_None)` is called after every batch.
+    """
+    results = [None] * len(texts)
+    batches = plan_batches(lengths, token_budget, max_batch_size, cost_per_item)
+    for number, indices in enumerate(batches, 1):
+        batch_texts = [texts[i] for i in indices]
+        try:
+            batch_results, error = list(fn(batch_texts)), None
+        except Exception as e:
+            batch_results, error = None, e
+        if batch_results is not None:
+            for i, result in zip(indices, batch_results):
+                results[i] = result
+        if on_batch_done is not None:
+            on_batch_done(number, len(batches), batch_texts, batch_results, error)
+    return results
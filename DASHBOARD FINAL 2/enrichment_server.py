@@ -0,0 +1,173 @@
+# File: enrichment_server.py
+# Long-lived local scoring service: loads the sentiment and zero-shot models once and answers batched scoring
+# requests over localhost HTTP, so per-month enrich_data.py runs skip the torch/transformers import and model load.
+# enrich_data.py uses it when it answers at ENRICHMENT_SERVER_URL (default below) and falls back to in-process
+# scoring otherwise. Start it with `python enrichment_server.py` and leave it running across months and runs.
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8766
+DEFAULT_SERVER_URL = f"http://127.0.0.1:{DEFAULT_PORT}"
+REQUEST_TEXTS = 512  # texts per client request; each answered request is cached by the client before the next
+
+class ModelHost:
+    """Holds the loaded pipelines. Model calls are serialized: one forward pass already uses every core."""
+
+    def __init__(self, sentiment_model, topic_model, backend='pytorch', threads=None):
+        from enrich_data import load_pipeline
+        # Models without a passing ONNX parity check run on PyTorch under every backend (see enrich_data.task_backend).
+        import torch
+        if threads:
+            torch.set_num_threads(threads)
+        device = 0 if torch.cuda.is_available() else -1
+        start = time.perf_counter()
+        self.models = {'sentiment': sentiment_model, 'topics': topic_model}
+        self.backend = backend
+        self.pipelines = {'sentiment': load_pipeline("sentiment-analysis", sentiment_model, backend, device, threads),
+                          'topics': load_pipeline("zero-shot-classification", topic_model, backend, device, threads)}
+        self.load_seconds = time.perf_counter() - start
+        self.started_at = time.time()
+        self.requests = 0
+        self.last_request_at = time.time()
+        self.lock = threading.Lock()
+
+    def score(self, task, texts, candidate_labels=None, token_budget=None):
+        from enrich_data import score_sentiment, score_topics, CANDIDATE_TOPICS
+        from enrichment_batching import TOKEN_BUDGET
+        with self.lock:
+            self.requests += 1
+            self.last_request_at = time.time()
+            if task == 'sentiment':
+                return score_sentiment(self.pipelines['sentiment'], texts, token_budget or TOKEN_BUDGET)
+            return score_topics(self.pipelines['topics'], texts, candidate_labels or CANDIDATE_TOPICS, token_budget or TOKEN_BUDGET)
+
+    def health(self):
+        return {'status': 'ok', 'pid': os.getpid(), 'backend': self.backend, 'models': self.models, 'requests': self.requests,
+                'load_seconds': round(self.load_seconds, 2), 'uptime_seconds': round(time.time() - self.started_at, 1)}
+
+def make_handler(host):
+    class EnrichmentHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                return self._reply(200, host.health())
+            self._reply(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if self.path == '/shutdown':
+                self._reply(200, {'status': 'stopping'})
+                return threading.Thread(target=self.server.shutdown, daemon=True).start()
+            if self.path != '/score' or payload.get('task') not in ('sentiment', 'topics'):
+                return self._reply(400, {'error': "POST /score with task 'sentiment' or 'topics'."})
+            try:
+                results = host.score(payload['task'], payload.get('texts', []), payload.get('candidate_labels'), payload.get('token_budget'))
+            except Exception as e:
+                return self._reply(500, {'error': str(e)})
+            self._reply(200, {'results': results, 'model': host.models[payload['task']], 'backend': host.backend})
+
+    return EnrichmentHandler
+
+def stop_when_idle(server, host, idle_minutes):
+    while True:
+        time.sleep(min(60, idle_minutes * 60))
+        if time.time() - host.last_request_at > idle_minutes * 60:
+            print(f"No requests for {idle_minutes} minutes; stopping.")
+            server.shutdown(); return
+
+class EnrichmentClient:
+    """Speaks to a running enrichment_server. Failed requests raise; callers treat them as failed batches."""
+
+    def __init__(self, url=DEFAULT_SERVER_URL, timeout=600):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _call(self, path, payload=None, timeout=None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(f"{self.url}{path}", data=data, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+            return json.load(response)
+
+    def health(self, timeout=2):
+        """The server's /health document, or None if nothing answers at the URL."""
+        try:
+            return self._call('/health', timeout=timeout)
+        except (urllib.error.URLError, OSError, ValueError):
+            return None
+
+    def score(self, task, texts, candidate_labels=None, token_budget=None, request_texts=REQUEST_TEXTS, on_batch_done=None):
+        """
+        Results aligned with `texts` (None where a request failed), sent `request_texts` at a time.
+        `on_batch_done(number, total, texts, results, error)` follows the in-process callback contract.
+        """
+        results = []
+        total = (len(texts) - 1) // request_texts + 1 if texts else 0
+        for number, i in enumerate(range(0, len(texts), request_texts), 1):
+            chunk = texts[i:i + request_texts]
+            try:
+                chunk_results, error = self._call('/score', {'task': task, 'texts': chunk, 'candidate_labels': candidate_labels, 'token_budget': token_budget})['results'], None
+            except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+                chunk_results, error = [None] * len(chunk), e
+            results.extend(chunk_results)
+            if on_batch_done is None:
+                continue
+            done = [(t, r) for t, r in zip(chunk, chunk_results) if r is not None]
+            failed = [t for t, r in zip(chunk, chunk_results) if r is None]
+            if done:
+                on_batch_done(number, total, [t for t, _ in done], [r for _, r in done], None)
+            if failed:
+                on_batch_done(number, total, failed, None, error or RuntimeError("model call failed on the server"))
+        return results
+
+    def shutdown(self):
+        self._call('/shutdown', {}, timeout=5)
+
+def connect(url, sentiment_model, topic_model, backend='pytorch'):
+    """A client if a server at `url` serves exactly these models on this backend, else None (with the reason printed)."""
+    client = EnrichmentClient(url)
+    health = client.health()
+    if health is None:
+        print(f"No enrichment server at {url}; scoring in-process.")
+        return None
+    expected = {'sentiment': sentiment_model, 'topics': topic_model}
+    if health.get('models') != expected or health.get('backend') != backend:
+        print(f"Enrichment server at {url} serves {health.get('models')} ({health.get('backend')}), "
+              f"not {expected} ({backend}); scoring in-process.")
+        return None
+    print(f"Using enrichment server at {url} (pid {health['pid']}, up {health['uptime_seconds']}s, {health['requests']} requests served).")
+    return client
+
+if __name__ == "__main__":
+    from enrich_data import SENTIMENT_MODEL, TOPIC_MODEL, BACKENDS
+    parser = argparse.ArgumentParser(description="Serve the enrichment models over localhost HTTP.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--sentiment-model", default=SENTIMENT_MODEL)
+    parser.add_argument("--topic-model", default=TOPIC_MODEL)
+    parser.add_argument("--backend", choices=BACKENDS, default='pytorch')
+    parser.add_argument("--threads", type=int, help="Intra-op threads for inference (default: all cores).")
+    parser.add_argument("--idle-minutes", type=float, default=0, help="Exit after this many minutes without requests (0: never).")
+    args = parser.parse_args()
+
+    print("Loading AI models...")
+    host = ModelHost(args.sentiment_model, args.topic_model, args.backend, args.threads)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(host))
+    if args.idle_minutes > 0:
+        threading.Thread(target=stop_when_idle, args=(server, host, args.idle_minutes), daemon=True).start()
+    print(f"Enrichment server listening on http://127.0.0.1:{args.port} (models loaded in {host.load_seconds:.1f}s; Ctrl+C to stop)", flush=True)
+    server.serve_forever()
@@ -0,0 +1,143 @@
+# File: fake_translate_server.py
+# A local stand-in for the Google Translate v2 REST API with injectable latency and errors.
+# Point translate_and_prepare.py at it with TRANSLATE_API_ENDPOINT=http://127.0.0.1:<port>,
+# or run `python fake_translate_server.py --selftest` to exercise the translation engine against it.
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def fake_translate(text):
+    """Deterministic 'translation' so callers can check results landed on the right rows."""
+    detected = 'en' if all(ord(c) < 128 for c in text) else 'kn'
+    return {'translatedText': text if detected == 'en' else f"[translated] {text}", 'detectedSourceLanguage': detected}
+
+def make_handler(latency=0.05, latency_per_char=0.0, error_rate=0.0, max_chars=None, fail_texts=()):
+    class FakeTranslateHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            texts = payload.get('q', [])
+            texts = [texts] if isinstance(texts, str) else texts
+            chars = sum(len(t) for t in texts)
+            time.sleep(latency + latency_per_char * chars)
+            if max_chars is not None and chars > max_chars:
+                return self._reply(413, {'error': {'code': 413, 'message': f'Request too large: {chars} characters.'}})
+            if any(t in fail_texts for t in texts):
+                return self._reply(400, {'error': {'code': 400, 'message': 'Injected permanent failure.'}})
+            if random.random() < error_rate:
+                return self._reply(random.choice([429, 500, 503]), {'error': {'code': 503, 'message': 'Injected transient failure.'}})
+            self._reply(200, {'data': {'translations': [fake_translate(t) for t in texts]}})
+
+    return FakeTranslateHandler
+
+def start_fake_server(port=0, **handler_options):
+    """Starts the server on a background thread; returns (server, endpoint_url). Call server.shutdown() to stop."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(**handler_options))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+class TranslateHTTPError(RuntimeError):
+    def __init__(self, code):
+        super().__init__(f"Translate API error {code}")
+        self.code = code
+
+class FakeServerClient:
+    """Minimal Translate v2 client speaking the same protocol, for use where google-cloud-translate is not installed."""
+
+    def __init__(self, endpoint, timeout=30):
+        self.url = f"{endpoint}/language/translate/v2"
+        self.timeout = timeout
+
+    def translate(self, values, target_language='en'):
+        body = json.dumps({'q': values, 'target': target_language, 'format': 'text'}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                translations = json.load(response)['data']['translations']
+        except urllib.error.HTTPError as e:
+            raise TranslateHTTPError(e.code) from e
+        return [dict(t, input=v) for v, t in zip(values, translations)]
+
+def run_selftest():
+    """Checks concurrency, retries, per-batch failure isolation and size-aware batching of translation_engine."""
+    from translation_engine import translate_batches, translate_texts_adaptive
+
+    batches = [[f"comment {b}-{i}" for i in range(20)] for b in range(30)]
+    batches[7][3] = "POISON"
+    server, endpoint = start_fake_server(latency=0.1, error_rate=0.2, fail_texts={"POISON"})
+    try:
+        start = time.perf_counter()
+        results = translate_batches(lambda: FakeServerClient(endpoint), batches, max_in_flight=8,
+                                    requests_per_second=50, max_retries=5, backoff_base=0.05)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    failed = [i for i, r in enumerate(results) if r is None]
+    ok = failed == [7] and all(r[j]['input'] == batches[i][j] for i, r in enumerate(results) if r is not None for j in range(len(r)))
+    print(f"Translated {len(batches)} batches in {elapsed:.2f}s (serial lower bound {len(batches) * 0.1:.1f}s); failed batches: {failed}")
+
+    # The server rejects requests over 1,500 characters, below the engine's 5,000 default: the engine must
+    # shrink its budget on 413s, and split the texts that are longer than the limit on their own.
+    texts = [f"ಕಾಮೆಂಟ್ {i} " * (1 + i % 40) for i in range(300)] + ["word " * 900]
+    server, endpoint = start_fake_server(latency=0.02, max_chars=1500)
+    try:
+        adaptive = translate_texts_adaptive(lambda: FakeServerClient(endpoint), texts, max_chars=1500, max_in_flight=4,
+                                            requests_per_second=200, max_retries=2, backoff_base=0.01)
+        adaptive_ok = all(r is not None and r['input'] == t for r, t in zip(adaptive, texts))
+        adaptive_ok = adaptive_ok and adaptive[-1]['translatedText'].split() == texts[-1].split()
+        oversized = translate_texts_adaptive(lambda: FakeServerClient(endpoint), texts, max_chars=5000, max_in_flight=4,
+                                             requests_per_second=200, max_retries=2, backoff_base=0.01)
+        oversized_ok = [i for i, r in enumerate(oversized) if r is None] == [len(texts) - 1]
+    finally:
+        server.shutdown()
+    print(f"Adaptive batching: all texts translated within the server limit: {adaptive_ok}; "
+          f"only the single over-limit text failed with a too-large budget: {oversized_ok}")
+
+    # A server limit below the budget's floor: the rejected batch already fits the budget after shrinking, and
+    # must still be split rather than re-queued unchanged (run in a thread so a regression fails instead of hanging).
+    small = ['a' * 200, 'b' * 200]
+    server, endpoint = start_fake_server(latency=0.01, max_chars=300)
+    done = {}
+    worker = threading.Thread(target=lambda: done.update(results=translate_texts_adaptive(
+        lambda: FakeServerClient(endpoint), small, requests_per_second=200, max_retries=1, backoff_base=0.01)), daemon=True)
+    try:
+        worker.start()
+        worker.join(timeout=10)
+    finally:
+        server.shutdown()
+    small_ok = [r['input'] if r else None for r in done.get('results', [])] == small
+    print(f"Adaptive batching: a rejected batch below the minimum budget is split instead of retried forever: {small_ok}")
+    ok = ok and adaptive_ok and oversized_ok and small_ok
+    print("[PASSED] Engine self-test." if ok else "[FAILED] Engine self-test."); exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Google Translate v2 server for local testing.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds of delay added to every request.")
+    parser.add_argument("--latency-per-char", type=float, default=0.0, help="Extra seconds of delay per character.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a transient 429/5xx.")
+    parser.add_argument("--max-chars", type=int, help="Reject requests larger than this many characters with 413.")
+    parser.add_argument("--selftest", action='store_true', help="Run the translation engine self-test and exit.")
+    args = parser.parse_args()
+
+    if args.selftest:
+        run_selftest()
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(args.latency, args.latency_per_char, args.error_rate, args.max_chars))
+    print(f"Fake Translate API listening on http://127.0.0.1:{args.port} (Ctrl+C to stop)")
+    server.serve_forever()
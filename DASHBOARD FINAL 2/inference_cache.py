@@ -0,0 +1,110 @@
+# File: inference_cache.py
+# Persistent cache of model outputs for the enrichment stage, shared across months and runs.
+# Entries are keyed by (normalized text hash, model id, label set), so changing a model or the
+# candidate topics only invalidates the entries produced under the old setting. Model ids carry the
+# backend and truncation length where those change the outputs (see enrich_data.model_cache_id).
+import sqlite3
+import os
+import hashlib
+import json
+import time
+import argparse
+import unicodedata
+
+INFERENCE_CACHE_DB = "processed_data/inference_cache.sqlite"
+SQLITE_MAX_PARAMS = 500
+
+def normalize_for_cache(text):
+    return ' '.join(unicodedata.normalize('NFC', str(text)).split())
+
+def text_hash(text):
+    return hashlib.sha256(normalize_for_cache(text).encode('utf-8')).hexdigest()
+
+def label_set_key(labels):
+    """'' for models with a fixed output space (e.g. sentiment); otherwise a hash of the candidate labels."""
+    if not labels: return ''
+    return hashlib.sha256(json.dumps(sorted(labels), ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+def open_inference_cache(db_path=INFERENCE_CACHE_DB):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS inferences (
+            text_hash TEXT NOT NULL,
+            model_id TEXT NOT NULL,
+            label_set TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (text_hash, model_id, label_set)
+        )""")
+    return conn
+
+def lookup_inferences(conn, texts, model_id, labels=None):
+    """Returns {text: result} for every text already scored by `model_id` (over `labels`, if given)."""
+    label_set = label_set_key(labels)
+    hashes = {}
+    for t in set(texts):
+        hashes.setdefault(text_hash(t), []).append(t)
+    hash_list, found, now = list(hashes), {}, time.time()
+    for i in range(0, len(hash_list), SQLITE_MAX_PARAMS):
+        chunk = hash_list[i:i + SQLITE_MAX_PARAMS]
+        placeholders = ','.join('?' * len(chunk))
+        rows = conn.execute(f"SELECT text_hash, result FROM inferences WHERE model_id = ? AND label_set = ? AND text_hash IN ({placeholders})",
+                            [model_id, label_set] + chunk).fetchall()
+        for h, result in rows:
+            for t in hashes[h]:
+                found[t] = json.loads(result)
+        conn.executemany("UPDATE inferences SET hits = hits + 1, last_used_at = ? WHERE text_hash = ? AND model_id = ? AND label_set = ?",
+                         [(now, h, model_id, label_set) for h, _ in rows])
+    conn.commit()
+    return found
+
+def store_inferences(conn, texts, results, model_id, labels=None):
+    """Stores one batch of results (JSON-serializable dicts). Called per batch so completed work survives a crash."""
+    label_set, now = label_set_key(labels), time.time()
+    conn.executemany(
+        "INSERT OR REPLACE INTO inferences (text_hash, model_id, label_set, result, created_at, last_used_at, hits) VALUES (?, ?, ?, ?, ?, ?, 0)",
+        [(text_hash(t), model_id, label_set, json.dumps(r, ensure_ascii=False), now, now) for t, r in zip(texts, results)])
+    conn.commit()
+
+def print_stats(conn):
+    total, hits = conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM inferences").fetchone()
+    print(f"Cached inferences: {total} (served {hits} cache hits in total)")
+    for model_id, label_set, count in conn.execute("SELECT model_id, label_set, COUNT(*) FROM inferences GROUP BY 1, 2 ORDER BY 3 DESC"):
+        print(f"  - {model_id} [{label_set or 'fixed labels'}]: {count}")
+
+def prune_cache(conn, older_than_days=None, model_id=None, clear_all=False):
+    """Deletes entries not used for `older_than_days` days and/or produced by the given model, or all with `clear_all`."""
+    if clear_all == (older_than_days is not None or bool(model_id)):
+        raise ValueError("Pass either a filter (older_than_days / model_id) or clear_all=True, not both or neither.")
+    clauses, params = [], []
+    if older_than_days is not None:
+        clauses.append("last_used_at < ?"); params.append(time.time() - older_than_days * 86400)
+    if model_id:
+        clauses.append("model_id = ?"); params.append(model_id)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    deleted = conn.execute(f"DELETE FROM inferences{where}", params).rowcount
+    conn.commit()
+    conn.execute("VACUUM")
+    return deleted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and prune the enrichment inference cache.")
+    parser.add_argument("--db", default=INFERENCE_CACHE_DB, help="Path to the cache database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show entry counts per model and label set.")
+    prune_parser = subparsers.add_parser("prune", help="Delete entries matching the filters, or every entry with --all.")
+    prune_parser.add_argument("--older-than-days", type=float, help="Delete entries not used for this many days.")
+    prune_parser.add_argument("--model", help="Delete entries produced by this model id (as listed by `stats`).")
+    prune_parser.add_argument("--all", action='store_true', help="Delete every cached inference.")
+    args = parser.parse_args()
+    if args.command == "prune" and args.all == (args.older_than_days is not None or bool(args.model)):
+        prune_parser.error("give --older-than-days and/or --model, or --all on its own to clear the whole cache")
+
+    conn = open_inference_cache(args.db)
+    if args.command == "stats":
+        print_stats(conn)
+    elif args.command == "prune":
+        print(f"Deleted {prune_cache(conn, args.older_than_days, args.model, args.all)} cached inferences.")
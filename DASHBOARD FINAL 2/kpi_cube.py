@@ -0,0 +1,163 @@
+# File: kpi_cube.py
+# Pre-materialized KPI cube for the dashboards, keyed by month x topic x content_type x sentiment bucket, in two
+# grains: `post_cube` counts posts by their main topic and the bucket of their average sentiment, with the sums and
+# sums of squares of sentiment and engagement and their comment totals; `comment_cube` counts comments by their own
+# topic and sentiment bucket, with the sum and sum of squares of their scores. aggregate_data.py replaces a month's
+# cells whenever it aggregates the month, so every mean, total and mix the dashboards show rolls up from a few
+# hundred cells instead of being recomputed from the comment frames on each rerun.
+# `daily_rollup` holds the comment counts and sentiment sums per (UTC day, post, topic, sentiment bucket), from the
+# comment timestamps, so the dashboards can filter to exact days and weeks without the comment-level data.
+import argparse
+import os
+import sqlite3
+import pandas as pd
+from post_stats import sentiment_bucket, weighted_engagement_rate, SENTIMENT_BUCKETS
+from post_store import post_key
+
+KPI_CUBE_DB = "processed_data/kpi_cube.sqlite"
+CUBE_KEYS = ['month', 'topic', 'content_type', 'sentiment_bucket']
+POST_MEASURES = ['posts', 'comments', 'sentiment_n', 'sentiment_sum', 'sentiment_sumsq', 'engagement_n', 'engagement_sum', 'engagement_sumsq']
+COMMENT_MEASURES = ['comments', 'sentiment_sum', 'sentiment_sumsq']
+DAILY_KEYS = ['month', 'day', 'post_id', 'topic', 'sentiment_bucket']
+TABLES = {'post_cube': (CUBE_KEYS, POST_MEASURES), 'comment_cube': (CUBE_KEYS, COMMENT_MEASURES), 'daily_rollup': (DAILY_KEYS, COMMENT_MEASURES)}
+SUMMARY_TEXT_COLUMNS = ['most_positive_comment', 'original_positive_context', 'most_negative_comment', 'original_negative_context']
+
+def _add_sums(facts, name, values):
+    values = values.astype(float)
+    facts[f'{name}_n'] = values.notna().astype(int)
+    facts[f'{name}_sum'] = values.fillna(0)
+    facts[f'{name}_sumsq'] = (values * values).fillna(0)
+
+def post_cube(summary, month):
+    """Post cells of post summary rows. `month` is a 'YYYY-MM' string or a Series of them aligned with the rows."""
+    facts = pd.DataFrame({'month': month, 'topic': summary['main_topic'], 'content_type': summary['content_type'],
+                          'sentiment_bucket': sentiment_bucket(summary['avg_sentiment_score']), 'posts': 1,
+                          'comments': summary['comment_count']}, index=summary.index)
+    _add_sums(facts, 'sentiment', summary['avg_sentiment_score'])
+    _add_sums(facts, 'engagement', summary['weighted_engagement_rate'])
+    return facts.groupby(CUBE_KEYS, as_index=False)[POST_MEASURES].sum()
+
+def comment_cube(comments, month):
+    """Comment cells of enriched comment rows (comments without a topic are left out, as in the post state)."""
+    scores = comments['sentiment_score'].astype(float)
+    facts = pd.DataFrame({'month': month, 'topic': comments['topic'], 'content_type': comments['content_type'].fillna('N/A'),
+                          'sentiment_bucket': sentiment_bucket(scores), 'comments': 1,
+                          'sentiment_sum': scores.fillna(0), 'sentiment_sumsq': (scores * scores).fillna(0)}, index=comments.index)
+    return facts.dropna(subset=['topic']).groupby(CUBE_KEYS, as_index=False)[COMMENT_MEASURES].sum()
+
+def comment_cube_from_state(state, month_str):
+    """Comment cells of a month from its post state (see post_stats.py), without reading the comments again."""
+    topics = state['topics'].reset_index()
+    content_type = topics['post_id'].map(state['posts']['content_type']).fillna('N/A')
+    facts = topics.assign(month=month_str, content_type=content_type.astype(str), comments=topics['n'])
+    return facts.groupby(CUBE_KEYS, as_index=False)[COMMENT_MEASURES].sum()
+
+def daily_rollup_from_state(state, month_str):
+    """Daily rollup rows of a month from its post state: comments and sentiment sums per UTC day, post, topic and bucket."""
+    daily = state['daily'].reset_index()
+    return pd.DataFrame({'month': month_str, 'day': daily['day'].dt.strftime('%Y-%m-%d'), 'post_id': daily['post_id'].map(post_key),
+                         'topic': daily['topic'], 'sentiment_bucket': daily['sentiment_bucket'], 'comments': daily['n'],
+                         'sentiment_sum': daily['sentiment_sum'], 'sentiment_sumsq': daily['sentiment_sumsq']})
+
+def open_cube(db_path=KPI_CUBE_DB):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    for table, (keys, measures) in TABLES.items():
+        columns = ", ".join([f"{k} TEXT NOT NULL" for k in keys] + [f"{m} REAL NOT NULL" for m in measures])
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns}, PRIMARY KEY ({', '.join(keys)}))")
+    conn.execute("CREATE INDEX IF NOT EXISTS daily_rollup_day ON daily_rollup (day)")
+    return conn
+
+def replace_month(conn, month_str, posts, comments, daily):
+    """Replaces the month's cells of both cubes and its daily rollup rows in one transaction."""
+    with conn:
+        for table, cells in (('post_cube', posts), ('comment_cube', comments), ('daily_rollup', daily)):
+            columns = TABLES[table][0] + TABLES[table][1]
+            conn.execute(f"DELETE FROM {table} WHERE month = ?", (month_str,))
+            conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                             cells[columns].astype(object).itertuples(index=False, name=None))
+
+def _load_table(table, db_path):
+    if not os.path.exists(db_path):
+        return pd.DataFrame(columns=TABLES[table][0] + TABLES[table][1])
+    with sqlite3.connect(db_path) as conn:
+        return pd.read_sql_query(f"SELECT * FROM {table} ORDER BY {', '.join(TABLES[table][0])}", conn)
+
+def load_cube(db_path=KPI_CUBE_DB):
+    """(post cube, comment cube) as DataFrames; both empty if the cube has not been built."""
+    return _load_table('post_cube', db_path), _load_table('comment_cube', db_path)
+
+def load_daily_rollup(db_path=KPI_CUBE_DB):
+    """The daily rollup with `day` as a Timestamp; empty if it has not been built."""
+    daily = _load_table('daily_rollup', db_path)
+    return daily.assign(day=pd.to_datetime(daily['day'], format='%Y-%m-%d'))
+
+def period_starts(days, granularity):
+    """First day of the 'Day' or 'Week' (Monday to Sunday) period each day falls in."""
+    return days if granularity == 'Day' else days - pd.to_timedelta(days.dt.weekday, unit='D')
+
+def rollup_summary(daily, posts, granularity):
+    """
+    Post summary rows per post and 'Day' or 'Week' from the daily rollup, shaped like the monthly post summaries with
+    the period start in 'month'. `posts` (indexed by post_id) gives each post's caption, type, likes and shares. The
+    rollup keeps no comment text, so the most positive / negative comment columns are 'N/A'.
+    """
+    keys = ['post_id', 'month']
+    daily = daily.assign(month=period_starts(daily['day'], granularity))
+    scored = daily['comments'].where(daily['sentiment_bucket'] != 'unscored', 0)
+    negative = daily['comments'].where(daily['sentiment_bucket'] == 'negative', 0)
+    per_post = daily.assign(scored=scored, negative=negative).groupby(keys)[['comments', 'scored', 'negative', 'sentiment_sum', 'sentiment_sumsq']].sum()
+    n, total = per_post['scored'], per_post['sentiment_sum']
+    summary = posts.reindex(per_post.index.get_level_values('post_id'))[['post_caption', 'content_type', 'total_likes', 'num_shares']].set_axis(per_post.index)
+    summary['comment_count'] = per_post['comments'].astype(int)
+    summary['avg_sentiment_score'] = (total / n).where(n > 0)
+    summary['sentiment_variance'] = ((n * per_post['sentiment_sumsq'] - total ** 2) / (n * (n - 1))).where(n > 1)
+    summary['negative_comment_ratio'] = (per_post['negative'] / n).where(n > 0, 0)
+    # Most frequent topic; ties go to the first in sort order, as in the monthly summaries.
+    counts = daily[daily['topic'] != 'N/A'].groupby(keys + ['topic'])['comments'].sum().reset_index()
+    main_topic = counts.sort_values(keys + ['comments'], ascending=[True, True, False], kind='stable').drop_duplicates(keys).set_index(keys)['topic']
+    summary['main_topic'] = main_topic.reindex(summary.index).fillna('N/A')
+    summary['weighted_engagement_rate'] = weighted_engagement_rate(summary['total_likes'], summary['comment_count'], summary['num_shares'])
+    for column in SUMMARY_TEXT_COLUMNS:
+        summary[column] = 'N/A'
+    for column in ['post_caption', 'content_type']:
+        summary[column] = summary[column].fillna('N/A')
+    return summary.reset_index()
+
+def rollup_comment_cube(daily, posts, granularity):
+    """Comment cells per 'Day' or 'Week' period ('YYYY-MM-DD' of its first day in 'month') from the daily rollup."""
+    facts = daily.assign(month=period_starts(daily['day'], granularity).dt.strftime('%Y-%m-%d'),
+                         content_type=daily['post_id'].map(posts['content_type']).fillna('N/A'))
+    return facts[facts['topic'] != 'N/A'].groupby(CUBE_KEYS, as_index=False)[COMMENT_MEASURES].sum()
+
+def select_cells(cube, start_month, end_month, topics):
+    """Cells of the months from `start_month` to `end_month` ('YYYY-MM', inclusive) and the given topics."""
+    return cube[cube['month'].between(start_month, end_month) & cube['topic'].isin(topics)]
+
+def rollup(cells, by=None):
+    """Measures summed over all cells (a Series), or per value of the `by` column(s) (a DataFrame)."""
+    measures = [m for m in cells.columns if m not in CUBE_KEYS]
+    return cells[measures].sum() if by is None else cells.groupby(by)[measures].sum()
+
+def mean(totals, name, empty=float('nan')):
+    """Mean of a measure from rolled-up totals (`empty` where nothing was counted)."""
+    n = totals[f'{name}_n']
+    if isinstance(n, pd.Series):
+        return (totals[f'{name}_sum'] / n).where(n > 0, empty)
+    return totals[f'{name}_sum'] / n if n > 0 else empty
+
+def bucket_shares(cells):
+    """Share of the scored comments in each sentiment bucket that has any, largest first (as value_counts(normalize=True))."""
+    counts = rollup(cells, 'sentiment_bucket')['comments'].reindex(SENTIMENT_BUCKETS[:3], fill_value=0)
+    counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+    return counts / counts.sum()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the KPI cube (filled by aggregate_data.py).")
+    parser.add_argument("--db", default=KPI_CUBE_DB, help="Path to the cube database.")
+    args = parser.parse_args()
+    posts, comments = load_cube(args.db)
+    print(f"Post cube: {len(posts)} cells; comment cube: {len(comments)} cells.")
+    for month, totals in rollup(posts, 'month').iterrows():
+        print(f"  - {month}: {totals['posts']:.0f} posts, {totals['comments']:.0f} comments, "
+              f"avg sentiment {mean(totals, 'sentiment'):.3f}, avg engagement {mean(totals, 'engagement'):.5f}")
@@ -0,0 +1,233 @@
+# File: language_detect.py
+# Offline pre-classifier that spots comments which are confidently English, so they can skip the Translate API.
+# Romanized Kannada/Hindi/Telugu is also plain ASCII, so the script check alone is not enough:
+# a text is only routed locally when nearly all of its words are common English words.
+import argparse
+import glob
+import hashlib
+import html
+import json
+import math
+import os
+import re
+
+ENGLISH_LEXICON = frozenset("""
+a able about above absolutely accept accident according account achieve achievement achievements across act action active
+activities activity actor actually address admin admitted advance advice affordable afraid after afternoon again against age ago
+agree agriculture ahead aid aim air airport alive all allow almost alone along already also always am amazing amenities among
+amount an ancient and angel angry animal anniversary announce announced annual another answer any anybody anyone anything anyway
+apply appointed appreciate appreciated appreciation approach april are area areas around arrange arrangements arrive art article
+as ask asked asking assembly assistance association at attack attend attended attention august authority available avoid award
+aware awareness away awesome baby back bad badly bag ball band bank banks based basic basically battle be beach bear beat
+beautiful beauty became because become bed bee been before began begin behalf behaviour behind being believe bell belong benefit
+best better between beyond big bike bill birth birthday bit bite black bless blessed blessing blessings blind blood blue board
+body book born boss both bottom boy brain branch brave bread break breakfast bridge brief briefing bright brilliant bring broken
+brother brothers brought brown budget build building built bureau bus buses business busy but buy by cabinet call called came
+camera camp campaign can can't candidate cannot capital captain car card care career careful carry case cases cash caste cause
+celebrate celebrated celebration celebrities celebrity center central centre century certain chair chairman champion chance change
+channel character charge charming cheap check chief child children choice choose chosen church circle citizen citizens city civil
+claim class classmate clean cleaning clear clearly clever climate close club coach colleague collector college colour come comes
+coming comment comments commission committee common community company compare compared competition complaint complete completed
+concept concern condition conditions congrats congratulation congratulations connect consider constituency construction contact
+contest continue control cook cool corner correct corruption cost could council counter country couple courage course court cover
+cow coz crazy create created crime crisis cross crowd culture cup current customer cut daily dam damage dance danger dark daughter
+day days dead deal dear death debate december decent decide decision dedicated dedication deep definitely degree delay deliver
+demand democracy department deputy deserve design desk despite destroy details develop development devotee dialogue did didn't die
+different difficult digital dinner direct direction discussed discussion disease district disturb divine do doctor doctors does
+doesn't dogs doing don't done door double doubt down drainage draw dream dress drink drive drugs dry due during dust duty each
+eager early earth ease east easy eat economy educated education effective effort efforts egg either elder elected election
+elections electricity elegant eligible else emergency emerging employee employees employment empower empowerment encourage
+encouragement end enemy energetic energy engineer engineering enjoy enjoyed enough ensure enter entire entrance environment equal
+equipment especially establish even evening event events ever every everybody everyone everything evidence exactly exam
+examination example excellent excited exciting excuse exercise exist expect expected experience explain express extra eye eyes
+face facilities facility facing fact factory fail failed failure fair faith fake fall false family famous fan fantastic far farmer
+farmers fast father favorite favour favourite fear feature february fee feel feeling feet female festival fever few field fight
+fighting figure fill film final finally finance financial find fine fire first fish fit fix flag flood floor flower fly focus folk
+follow food for force foreign forest forever forget forgot form fortune forward found fourth free freedom fresh friday friend
+friendly friends from front fruit fuel full fun function fund funds funny future gain game garden gas gate gave general gentle get
+gets getting gift girl girls give given giving glad global go goal god goes going gold golden gone good gorgeous got governance
+government grace grand grant grateful great greatest green greetings ground group grow growth guest guidance guide guy guys had
+hair half hall hand hands handsome hang happen happened happiness happy hard harvest has hate have having he head heal health
+healthy hear heard heart hearty heat heaven hello help helping her here hero hey hi high highly highway hill hills him hindu
+hindus his history hold holiday holy home honest honey honor honorable honour honourable hope hospital hospitals hot hotel hour
+hours house how however huge human humanity humble hundred hunger hurt husband i i'm i've idea ideal if ignore ill image
+immediately impact implement importance important impossible improve improvement in incident include including income increase
+indeed independence indian industry info information infrastructure initiative injured innocent inside inspiration inspire
+inspired inspiring instead institute insurance intelligent interest international into invite invited iron is island isn't issue
+issues it it's its itself jail january job jobless jobs join journey joy judge july jump june junior just justice keep keeping key
+kids kind kindly kindness king know knowledge known labour lack ladies lady lake lakh land lane language large last late later
+laugh launch law laws lawyer lazy lead leader leaders leadership leading learn learning least leave left legend less lesson let
+letter level liberty library lie life light like line lion list listen little live lived lives living loan local lock lonely long
+look looking lord lose loss lost lot lots loud love loved lovely low lowest luck lucky ma'am maam machine madam made magic mahatma
+main maintain maintenance major majority make makes making male mam man manage manager manner many march market marks marriage
+mass master match matter mature may maybe me mean meaning medical medicine meet meeting member members mention merchants mere
+message met metro middle might mighty military milk million millionaires mind minimum minister minute minutes miss mission mistake
+mobile model modern moment monday money month months moon moral more morning most mother mothers mountain mouth move movement
+movie mrs much multi museum music must my myself mystery name nation national natural nature near necessary need needed needs
+neighbour neither never new news next nice night nine no nobody none nor normal not nothing notice now number nurse obviously
+occasion ocean october of off offer offering office officer officers official officials often oh oil okay old older on once one
+only open operation opinion opportunity opposition option or orange order ordinary organize original other others our out
+outstanding over overall own owner paid pain paper parents park parliament parliamentary part party pass passed passion past path
+patient patients pay peace pending pension people per perfect perform performance period permanent permission person personal
+personality pet phone photo pic pick picture piece pig pigs pink pity place plan plant plastic platform play player please pleased
+pleasure pocket poem poet point police policy political politician politicians politics pollution pond poor population position
+positive possible post poverty power powerful practice praise pray prayer prayers precious prepare presence present president
+press pressure pretty prevent price pride prime principal priority prison private prize probably problem problems process produce
+product professional professor profile profound program progress project projects promise promote promotion promotions proof
+proper property proposal protect protest proud prove provide provided pub public pure purpose put quality queen question quick
+quickly quiet quite race radio railway rain raise rally rare rate rather reach reached reaction read reading ready real reality
+realize really reason receive received recent recently recognition recognize record reduce reform regarding regards region regular
+related release relief religion remain remember remove rent repair report represent representative republic request required
+rescue research reservation resign resolve resource resources respect respected responsibility responsible rest restaurant result
+return revenue revolution rich ride right rights ring rip rise risk river road roads rock role roof room root rose round royal
+rule rules run rural sacred sad safe safety said salary salute same sand saturday save saw say says scarcity scheme school schools
+science score scream sea seat second secret secretary security see seek seems seen select selected sell send senior sense separate
+september serious servant serve service services session set settle seven several shall shame share sharing sharp she shop short
+shortage should shoulder show sick side sign silence silver simple simply since sincere sincerely singer single sir sister sisters
+sit situation six sky sleep slow small smart smile snake so social society soft soil soldier soldiers solution solve some someone
+something sometimes son song sons soon sorry soul sound source south space speak speaker speaking special specifics speech speed
+spend spirit spiritual sport sports spread spring square staff stage stand standard star stars start starting state statement
+station statue stay step steps still stone stop storm story straight street strength stress strike strong struggle stuck student
+students study stuff submitted success successful such sudden sugar suggest suggestion suit summer sun sunday super superb supply
+support supporter supporting supreme sure surely surprise survey sweet system table take taken talent talented talk tank target
+task taste tax tea teach teacher teachers teaching team tears technology tell temple temporary ten term terrible test than thank
+thankful thanks that that's the their them then theory there these they thing things think this those though thought thousand
+three through thursday ticket tiger time times tired title to today together toilet told tomorrow tonight too took tool top topic
+total touch tour tourism tourist towards tower town track trade tradition traditional traffic train training transfer transport
+travel treatment tree tremendous trip trouble true truly trust truth try trying tuesday turn twenty twice two type under
+understand union unique united unity universe university unless until up upcoming update updates upgrade upon urban urgent us use
+used useful useless usually valley valuable value various vehicle version very victim victory video view village villager
+villages violence vision visit visited visiting voice volunteer vote voted voter voters wage wages wait walk wall want war warm
+was waste watch water way ways we we're wealth wear weather website wedding wednesday week weekend weight welcome well went were
+west what whatever when where whether which while white who whole whom whose why wife wild will willing win window winner
+winter wise wish wished wishes wishing with within without woman women won won't wonder wonderful wood word words work worked
+worker workers working works workshop world worried worry worse worst worth would wow write wrong wrote year years yellow yes
+yesterday yet yoga you you're young your yours yourself youth zero
+""".split())
+
+# Proper nouns and abbreviations that are common in otherwise-English comments on this page.
+# They neither count for nor against English; at least one lexicon word is still required.
+NEUTRAL_TOKENS = frozenset("""
+bangalore bengaluru bharat bjp ceo channagiri cm congress d davanagere davangere dc delhi dr dvg gandhi harapanahalli harihara
+honnali hubli ias india ips jagalur k karnataka m mallikarjun mallikarjuna mayakonda mla mlc modi mp mr ms mysore n ok pl pls plz
+pm prabha prabhakka r s shamanur st u ur
+""".split())
+
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+NON_ASCII_LETTER = re.compile(r"[^\W\d_]", re.UNICODE)
+LEXICON_THRESHOLD = 0.8
+MODEL_FILE = "processed_data/language_model.json"
+MODEL_THRESHOLD = 0.99
+MODEL_LEXICON_FLOOR = 0.7
+
+def lexicon_coverage(text):
+    """
+    Returns (fraction of words that are common English words, word count), ignoring NEUTRAL_TOKENS.
+    Texts containing letters from a non-Latin script return (0.0, 0).
+    """
+    if any(not ch.isascii() for ch in NON_ASCII_LETTER.findall(text)):
+        return 0.0, 0
+    words = [w for w in WORD_PATTERN.findall(text.lower()) if w not in NEUTRAL_TOKENS]
+    if not words: return 0.0, 0
+    return sum(w in ENGLISH_LEXICON for w in words) / len(words), len(words)
+
+def _trigrams(text):
+    padded = f"  {text.lower()} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def train_ngram_model(texts, labels, output_path=MODEL_FILE, alpha=0.5):
+    """Trains a character-trigram naive Bayes model (English vs. not) and saves it as JSON."""
+    counts = {True: {}, False: {}}
+    docs = {True: 0, False: 0}
+    for text, is_english in zip(texts, labels):
+        docs[is_english] += 1
+        for gram in _trigrams(text):
+            counts[is_english][gram] = counts[is_english].get(gram, 0) + 1
+    model = {"alpha": alpha, "prior_en": docs[True] / max(1, docs[True] + docs[False]),
+             "en": counts[True], "other": counts[False]}
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(model, f, ensure_ascii=False)
+    return model
+
+def load_ngram_model(path=MODEL_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            model = json.load(f)
+    except FileNotFoundError:
+        return None
+    vocab = len(set(model["en"]) | set(model["other"]))
+    for side in ("en", "other"):
+        model[f"{side}_total"] = sum(model[side].values()) + model["alpha"] * vocab
+    return model
+
+def ngram_english_probability(text, model):
+    alpha = model["alpha"]
+    log_odds = math.log(model["prior_en"] / (1 - model["prior_en"]))
+    for gram in _trigrams(text):
+        log_odds += math.log((model["en"].get(gram, 0) + alpha) / model["en_total"])
+        log_odds -= math.log((model["other"].get(gram, 0) + alpha) / model["other_total"])
+    return 1 / (1 + math.exp(-max(-50.0, min(50.0, log_odds))))
+
+def is_confident_english(text, model=None):
+    """True when `text` (already cleaned) can skip translation and be treated as English."""
+    coverage, word_count = lexicon_coverage(text)
+    if word_count == 0: return False
+    if coverage >= LEXICON_THRESHOLD: return True
+    if model is not None and coverage >= MODEL_LEXICON_FLOOR:
+        return ngram_english_probability(text, model) >= MODEL_THRESHOLD
+    return False
+
+def _load_labelled_texts(pattern):
+    """Unique cleaned comments with the language and translation the Translate API recorded for them."""
+    import pandas as pd
+    from text_normalization import clean_text_series
+    frames = [pd.read_csv(f) for f in sorted(glob.glob(pattern))]
+    df = pd.concat(frames, ignore_index=True)
+    df = df[df['original_language'] != 'error'].dropna(subset=['original_language'])
+    df['cleaned_comment'] = clean_text_series(df['original_comment_for_context'])
+    df = df[df['cleaned_comment'] != ''].drop_duplicates('cleaned_comment')
+    # Deterministic 80/20 split so the optional trigram model is evaluated on texts it was not trained on.
+    df['holdout'] = df['cleaned_comment'].apply(lambda t: hashlib.sha1(t.encode('utf-8')).digest()[0] % 5 == 0)
+    return df
+
+def evaluate(df, model=None):
+    """Precision/recall of local English routing against the languages the Translate API recorded."""
+    predicted = df['cleaned_comment'].apply(lambda t: is_confident_english(t, model))
+    actual = df['original_language'] == 'en'
+    tp, fp, fn = int((predicted & actual).sum()), int((predicted & ~actual).sum()), int((~predicted & actual).sum())
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    chars_saved = df.loc[predicted, 'cleaned_comment'].str.len().sum() / df['cleaned_comment'].str.len().sum()
+    # A false positive is harmless when the API's "translation" left the text unchanged (e.g. 'Nice mam' detected as 'ro').
+    unchanged = df['text_for_analysis'].fillna('').apply(html.unescape).str.strip() == df['cleaned_comment'].str.strip()
+    harmless_fp = int((predicted & ~actual & unchanged).sum())
+    print(f"Unique cleaned texts evaluated: {len(df)} ({int(actual.sum())} labelled 'en' by the API)")
+    print(f"Routed locally as English: {int(predicted.sum())} ({predicted.mean():.1%} of API segments, {chars_saved:.1%} of characters saved)")
+    print(f"Precision: {precision:.3f}  Recall: {recall:.3f}  (false positives: {fp}, of which {harmless_fp} were left unchanged by the API; missed English: {fn})")
+    if fp:
+        print("False positives whose API translation differed from the source:")
+        for _, row in df[predicted & ~actual & ~unchanged].head(10).iterrows():
+            print(f"  [{row['original_language']}] {row['cleaned_comment'][:70]!r} -> {str(row['text_for_analysis'])[:70]!r}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local English detection for the translation step.")
+    parser.add_argument("--data", default="processed_data/analysis_ready_*.csv", help="Glob of API-labelled files to evaluate or train on.")
+    parser.add_argument("--train", action='store_true', help=f"Train the optional trigram model on the training split and save it to {MODEL_FILE}.")
+    parser.add_argument("--evaluate", action='store_true', help="Report precision/recall against the API's recorded languages.")
+    args = parser.parse_args()
+
+    labelled = _load_labelled_texts(args.data)
+    if args.train:
+        training = labelled[~labelled['holdout']]
+        train_ngram_model(training['cleaned_comment'], training['original_language'] == 'en')
+        print(f"Trained trigram model on {len(training)} texts; saved to '{MODEL_FILE}'.")
+    if args.evaluate:
+        print("--- Lexicon only, all labelled texts ---")
+        evaluate(labelled)
+        trained_model = load_ngram_model()
+        if trained_model is not None:
+            print("\n--- Lexicon only, held-out split ---")
+            evaluate(labelled[labelled['holdout']])
+            print("\n--- Lexicon + trigram model, held-out split ---")
+            evaluate(labelled[labelled['holdout']], trained_model)
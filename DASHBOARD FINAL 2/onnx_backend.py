@@ -0,0 +1,156 @@
+# File: onnx_backend.py
+# CPU inference backend for the enrichment models: each model is exported once to ONNX, quantized to int8
+# (dynamic quantization of the weights), and served through ONNX Runtime by small wrappers that accept the same
+# calls enrich_data.py makes on the transformers pipelines.
+import argparse
+import json
+import os
+import re
+import numpy as np
+
+ONNX_MODEL_DIR = "processed_data/onnx_models"
+OPSET = 17
+PARITY_FILE = "parity.json"
+MIN_AGREEMENT = 0.98  # share of texts where the int8 model must pick the same top label as PyTorch
+ZERO_SHOT_TEMPLATE = "This example is {}."  # the transformers zero-shot pipeline default
+
+def model_dir(model_name, out_dir=ONNX_MODEL_DIR):
+    return os.path.join(out_dir, re.sub(r'[^A-Za-z0-9_.-]+', '--', model_name.strip('/')))
+
+def export_model(model_name, out_dir=ONNX_MODEL_DIR, quantize=True):
+    """
+    Exports a sequence-classification model to `model.onnx` (dynamic batch and sequence axes) and, with
+    `quantize`, a weight-only dynamic int8 copy `model.int8.onnx`. Tokenizer and config are saved alongside.
+    Returns the directory. Nothing is redone if the files already exist.
+    """
+    path = model_dir(model_name, out_dir)
+    fp32_path, int8_path = os.path.join(path, 'model.onnx'), os.path.join(path, 'model.int8.onnx')
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        os.makedirs(path, exist_ok=True)
+        sample = tokenizer(["a short example", "a somewhat longer example sentence for export"], padding=True, return_tensors='pt')
+        torch.onnx.export(model, (sample['input_ids'], sample['attention_mask']), fp32_path, dynamo=False, opset_version=OPSET,
+                          input_names=['input_ids', 'attention_mask'], output_names=['logits'],
+                          dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'}, 'attention_mask': {0: 'batch', 1: 'sequence'}, 'logits': {0: 'batch'}})
+        tokenizer.save_pretrained(path)
+        with open(os.path.join(path, 'labels.json'), 'w', encoding='utf-8') as f:
+            json.dump({'model': model_name, 'id2label': {str(i): label for i, label in model.config.id2label.items()}}, f, indent=2)
+    if quantize and not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return path
+
+def open_session(path, quantized=True, threads=None):
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(os.path.join(path, 'model.int8.onnx' if quantized else 'model.onnx'), options, providers=['CPUExecutionProvider'])
+
+def _int8_fingerprint(path):
+    stat = os.stat(os.path.join(path, 'model.int8.onnx'))
+    return [stat.st_size, stat.st_mtime_ns]
+
+def _load_parity(path):
+    parity_path = os.path.join(path, PARITY_FILE)
+    if not os.path.exists(parity_path):
+        return {}
+    with open(parity_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_parity(model_name, task, agreement, texts, min_agreement=MIN_AGREEMENT, out_dir=ONNX_MODEL_DIR):
+    """
+    Records the int8 export's top-label agreement with PyTorch on `texts` texts for `task` (measured by
+    benchmark_onnx_backend.py), tied to the int8 file that was checked. Returns whether it passed.
+    """
+    from atomic_io import write_json_atomic
+    path = model_dir(model_name, out_dir)
+    records = _load_parity(path)
+    records[task] = {'agreement': agreement, 'texts': texts, 'min_agreement': min_agreement,
+                     'passed': agreement >= min_agreement, 'int8': _int8_fingerprint(path)}
+    write_json_atomic(records, os.path.join(path, PARITY_FILE))
+    return records[task]['passed']
+
+def parity_passed(model_name, task, out_dir=ONNX_MODEL_DIR):
+    """True if the current int8 export of `model_name` has a passing parity record for `task`."""
+    path = model_dir(model_name, out_dir)
+    record = _load_parity(path).get(task)
+    if not record or not record['passed'] or not os.path.exists(os.path.join(path, 'model.int8.onnx')):
+        return False
+    return record['int8'] == _int8_fingerprint(path)
+
+def softmax(logits):
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+class OnnxSequenceClassifier:
+    """Wraps an exported model; `logits(texts, pairs)` tokenizes and runs one forward pass over the whole batch."""
+    def __init__(self, model_name, out_dir=ONNX_MODEL_DIR, quantized=True, threads=None):
+        from transformers import AutoTokenizer
+        path = export_model(model_name, out_dir, quantize=quantized)
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.session = open_session(path, quantized, threads)
+        with open(os.path.join(path, 'labels.json'), encoding='utf-8') as f:
+            self.id2label = {int(i): label for i, label in json.load(f)['id2label'].items()}
+
+    def logits(self, texts, pairs=None, max_length=512):
+        encoded = self.tokenizer(texts, pairs, padding=True, truncation='only_first' if pairs else True, max_length=max_length, return_tensors='np')
+        feeds = {'input_ids': encoded['input_ids'].astype(np.int64), 'attention_mask': encoded['attention_mask'].astype(np.int64)}
+        return self.session.run(['logits'], feeds)[0]
+
+class OnnxSentimentPipeline(OnnxSequenceClassifier):
+    """Callable like pipeline("sentiment-analysis"): a list of {'label', 'score'}, one per text."""
+    def __call__(self, texts, batch_size=None, truncation=True, max_length=512):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        results, step = [], batch_size or len(texts) or 1
+        for i in range(0, len(texts), step):
+            probs = softmax(self.logits(texts[i:i + step], max_length=max_length))
+            results.extend({'label': self.id2label[int(p.argmax())], 'score': float(p.max())} for p in probs)
+        return results
+
+class OnnxZeroShotPipeline(OnnxSequenceClassifier):
+    """
+    Callable like pipeline("zero-shot-classification"): each text is paired with `hypothesis_template` for every
+    candidate label and scored by the NLI model's entailment logit, exactly as the transformers pipeline does.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        entailment = [i for i, label in self.id2label.items() if label.lower().startswith('entail')]
+        contradiction = [i for i, label in self.id2label.items() if label.lower().startswith('contra')]
+        self.entailment_id = entailment[0] if entailment else -1
+        self.contradiction_id = contradiction[0] if contradiction else 0
+
+    def __call__(self, texts, candidate_labels, multi_label=False, truncation=True, batch_size=None, hypothesis_template=ZERO_SHOT_TEMPLATE, max_length=512):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        premises = [t for t in texts for _ in candidate_labels]
+        hypotheses = [hypothesis_template.format(label) for _ in texts for label in candidate_labels]
+        step = batch_size or len(premises) or 1
+        logits = np.vstack([self.logits(premises[i:i + step], hypotheses[i:i + step], max_length) for i in range(0, len(premises), step)])
+        logits = logits.reshape(len(texts), len(candidate_labels), -1)
+        if multi_label:
+            scores = softmax(logits[..., [self.contradiction_id, self.entailment_id]])[..., 1]
+        else:
+            scores = softmax(logits[..., self.entailment_id])
+        results = []
+        for text, row in zip(texts, scores):
+            order = np.argsort(-row)
+            results.append({'sequence': text, 'labels': [candidate_labels[j] for j in order], 'scores': [float(row[j]) for j in order]})
+        return results[0] if single else results
+
+if __name__ == "__main__":
+    from enrich_data import SENTIMENT_MODEL, TOPIC_MODEL
+    parser = argparse.ArgumentParser(description="Export the enrichment models to ONNX and quantize them to int8.")
+    parser.add_argument("models", nargs='*', default=[SENTIMENT_MODEL, TOPIC_MODEL], help="Model ids or local paths (default: both enrichment models).")
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action='store_true', help="Only export the fp32 graph.")
+    args = parser.parse_args()
+    for name in args.models:
+        path = export_model(name, args.out, quantize=not args.no_quantize)
+        sizes = {f: os.path.getsize(os.path.join(path, f)) / 1e6 for f in ('model.onnx', 'model.int8.onnx') if os.path.exists(os.path.join(path, f))}
+        print(f"{name} -> {path} (" + ", ".join(f"{f}: {mb:.0f} MB" for f, mb in sizes.items()) + ")")
@@ -1,39 +1,204 @@
-
-# partition_by_month.py
 import json
 import os
-from datetime import datetime
+import argparse
+import hashlib
+from datetime import datetime, timezone
 
-def partition_json_by_month(input_file_path='fb_comments_data.json', date_key='date', output_folder='monthly_data'):
-    print("--- [Pre-Step] Partitioning Master Data by Month ---")
+STREAM_CHUNK_SIZE = 1 << 20  # characters read from the export per refill
+MANIFEST_FILE = 'partition_manifest.json'
+
+def parse_comment_date(item, date_key='date'):
+    """Returns the comment's timestamp as a datetime, or None if it is missing or unparseable."""
+    date_str = item.get(date_key)
+    if not date_str: return None
     try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            all_data = json.load(f)
+        dt_object = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    # Naive timestamps are taken as UTC so they can be compared against the 'Z' ones.
+    return dt_object if dt_object.tzinfo else dt_object.replace(tzinfo=timezone.utc)
+
+def get_month_key(item, date_key='date'):
+    """Returns the 'YYYY-MM' bucket for a comment, or None if its date is missing or unparseable."""
+    dt_object = parse_comment_date(item, date_key)
+    return dt_object.strftime('%Y-%m') if dt_object else None
+
+def load_manifest(output_folder='monthly_data'):
+    """Loads the partition manifest (per-month hash, row count and max date), or an empty one."""
+    try:
+        with open(os.path.join(output_folder, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
     except FileNotFoundError:
-        print(f"--> ERROR: Input file '{input_file_path}' not found.")
-        return
+        manifest = {"months": {}, "changed_months": []}
+    # Manifests written before 'pending_months' existed: their last changed months are still owed a run.
+    manifest.setdefault("pending_months", list(manifest.get("changed_months", [])))
+    return manifest
+
+def save_manifest(manifest, output_folder='monthly_data'):
+    path = os.path.join(output_folder, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def mark_months_processed(months, output_folder='monthly_data'):
+    """Drops months from the manifest's pending set once every downstream stage has succeeded for them."""
+    manifest = load_manifest(output_folder)
+    manifest["pending_months"] = [m for m in manifest["pending_months"] if m not in set(months)]
+    save_manifest(manifest, output_folder)
+
+def iter_json_array(f, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields the elements of a top-level JSON array one at a time, reading the file in chunks.
+    Only the current chunk and the element being decoded are ever held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+
+    def refill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk: eof = True
+        buf, pos = buf[pos:] + chunk, 0
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars: pos += 1
+            if pos < len(buf) or eof: return
+            refill()
+
+    skip(' \t\r\n')
+    if pos >= len(buf) or buf[pos] != '[':
+        raise ValueError("Expected a top-level JSON array.")
+    pos += 1
+
+    while True:
+        skip(' \t\r\n,')
+        if pos >= len(buf): raise ValueError("Unterminated JSON array.")
+        if buf[pos] == ']': return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof: raise
+            refill(); continue
+        # A value that ends exactly at the buffer edge may be a truncated number or literal.
+        if end == len(buf) and not eof:
+            refill(); continue
+        pos = end
+        yield item
+
+def _partition_in_memory(input_file_path, date_key, output_folder):
+    with open(input_file_path, 'r', encoding='utf-8') as f:
+        all_data = json.load(f)
 
     os.makedirs(output_folder, exist_ok=True)
     monthly_data = {}
-    
+
     for item in all_data:
-        date_str = item.get(date_key)
-        if not date_str: continue
-        try:
-            dt_object = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            month_year_key = dt_object.strftime('%Y-%m')
-            if month_year_key not in monthly_data:
-                monthly_data[month_year_key] = []
-            monthly_data[month_year_key].append(item)
-        except (ValueError, TypeError): continue
+        month_year_key = get_month_key(item, date_key)
+        if month_year_key is None: continue
+        if month_year_key not in monthly_data:
+            monthly_data[month_year_key] = []
+        monthly_data[month_year_key].append(item)
 
     for month_key, data_list in monthly_data.items():
         output_file_path = os.path.join(output_folder, f"{month_key}.json")
         with open(output_file_path, 'w', encoding='utf-8') as f:
             json.dump(data_list, f, indent=4, ensure_ascii=False)
         print(f"Saved {len(data_list)} items to '{output_file_path}'")
+
+def _partition_streaming(input_file_path, date_key, output_folder, incremental=False):
+    """
+    Streams the master export and appends each comment to its month's file as it is parsed.
+    Output is byte-identical to the in-memory path: each month is still a JSON array with indent=4.
+    Files are written under a '.tmp' name and only renamed into place once the whole export parsed.
+
+    Every month's content hash, row count and max comment date are recorded in the manifest.
+    With incremental=True, a month whose hash matches the manifest is left untouched on disk.
+    Rewritten months join the manifest's 'pending_months', which only mark_months_processed() empties, so a
+    month whose downstream stages fail is retried on the next incremental run. Months no longer in the export
+    are dropped from the manifest. Returns the sorted list of months that were (re)written.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    open_files, stats = {}, {}
+    try:
+        with open(input_file_path, 'r', encoding='utf-8') as f:
+            for item in iter_json_array(f):
+                dt_object = parse_comment_date(item, date_key)
+                if dt_object is None: continue
+                month_year_key = dt_object.strftime('%Y-%m')
+                out = open_files.get(month_year_key)
+                if out is None:
+                    tmp_path = os.path.join(output_folder, f"{month_year_key}.json.tmp")
+                    out = open_files[month_year_key] = open(tmp_path, 'w', encoding='utf-8')
+                    stats[month_year_key] = {"hash": hashlib.sha256(), "rows": 0, "max_date": dt_object}
+                    text = '[\n'
+                else:
+                    text = ',\n'
+                # Re-indent the element one level so the file matches json.dump(list, indent=4).
+                text += '    ' + json.dumps(item, indent=4, ensure_ascii=False).replace('\n', '\n    ')
+                out.write(text)
+                month_stats = stats[month_year_key]
+                month_stats["hash"].update(text.encode('utf-8'))
+                month_stats["rows"] += 1
+                if dt_object > month_stats["max_date"]: month_stats["max_date"] = dt_object
+    except BaseException:
+        for out in open_files.values():
+            out.close()
+            os.remove(out.name)
+        raise
+
+    manifest = load_manifest(output_folder)
+    changed_months = []
+    for month_key, out in sorted(open_files.items()):
+        out.write('\n]')
+        out.close()
+        month_stats = stats[month_key]
+        month_stats["hash"].update(b'\n]')
+        entry = {"sha256": month_stats["hash"].hexdigest(), "rows": month_stats["rows"], "max_date": month_stats["max_date"].isoformat()}
+        output_file_path = os.path.join(output_folder, f"{month_key}.json")
+
+        previous = manifest["months"].get(month_key)
+        if incremental and previous and previous["sha256"] == entry["sha256"] and os.path.exists(output_file_path):
+            os.remove(out.name)
+            print(f"Unchanged: '{output_file_path}' ({entry['rows']} items, latest comment {entry['max_date']})")
+            continue
+
+        os.replace(out.name, output_file_path)
+        manifest["months"][month_key] = entry
+        changed_months.append(month_key)
+        print(f"Saved {entry['rows']} items to '{output_file_path}'")
+
+    removed_months = sorted(set(manifest["months"]) - set(open_files))
+    for month_key in removed_months:
+        del manifest["months"][month_key]
+        print(f"No longer in the export: {month_key} (dropped from the manifest)")
+    manifest["changed_months"] = changed_months
+    manifest["pending_months"] = sorted((set(manifest["pending_months"]) | set(changed_months)) - set(removed_months))
+    manifest["updated_at"] = datetime.now().isoformat(timespec='seconds')
+    save_manifest(manifest, output_folder)
+    return changed_months
+
+def partition_json_by_month(input_file_path='fb_comments_data.json', date_key='date', output_folder='monthly_data', stream=False, incremental=False):
+    print("--- [Pre-Step] Partitioning Master Data by Month ---")
+    if incremental: print("Mode: incremental (only months whose content changed are rewritten)")
+    elif stream: print("Mode: streaming (bounded memory)")
+    try:
+        if stream or incremental:
+            changed_months = _partition_streaming(input_file_path, date_key, output_folder, incremental=incremental)
+            print(f"\nChanged months: {changed_months}")
+        else:
+            _partition_in_memory(input_file_path, date_key, output_folder)
+    except FileNotFoundError:
+        print(f"--> ERROR: Input file '{input_file_path}' not found.")
+        return
     print("\nPartitioning complete.")
 
 if __name__ == "__main__":
-    partition_json_by_month()
-
+    parser = argparse.ArgumentParser(description="Partition the master comments export into monthly files.")
+    parser.add_argument("--input", default='fb_comments_data.json', help="Path to the master comments JSON export.")
+    parser.add_argument("--output-folder", default='monthly_data', help="Folder to write YYYY-MM.json files to.")
+    parser.add_argument("--stream", action='store_true', help="Parse the export incrementally instead of loading it all at once.")
+    parser.add_argument("--incremental", action='store_true', help="Stream, and only rewrite months whose content hash changed since the last run.")
+    args = parser.parse_args()
+    partition_json_by_month(args.input, output_folder=args.output_folder, stream=args.stream, incremental=args.incremental)
@@ -0,0 +1,239 @@
+# File: post_stats.py
+# Mergeable per-post sufficient statistics. A state holds, per post: the first caption/type/likes/shares seen,
+# comment and scored-comment counts, the sum of sentiment, the negative count, the most positive and most negative
+# comment so far; the scored comments' sentiment in row order ('scores', for the variance); and per (post, topic, sentiment bucket) the comment count and the sum
+# and sum of squares of sentiment, and the same per (post, UTC day, topic, sentiment bucket) for the comments with a
+# timestamp ('daily'). A batch of comments folds into a state without touching the comments already in it, and
+# states of different months merge, so every metric of the post summary is derived exactly from the state rather
+# than averaged across batches or months.
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+STATE_DIR = "processed_data/post_stats"
+FIRST_COLUMNS = ['post_caption', 'content_type', 'total_likes', 'num_shares']
+COUNT_COLUMNS = ['comment_count', 'scored_count', 'sentiment_sum', 'negative_count']
+EXTREMES = {'max': 'positive', 'min': 'negative'}
+SENTIMENT_BUCKETS = ['negative', 'neutral', 'positive', 'unscored']
+BUCKET_THRESHOLD = 0.2
+STATE_VERSION = 4  # saved states of other versions are rebuilt
+ENGAGEMENT_FOLLOWERS = 88000
+
+def weighted_engagement_rate(total_likes, comment_count, num_shares):
+    """Engagement score per follower: likes + comments + 2 x shares."""
+    return (total_likes + comment_count + 2 * num_shares) / ENGAGEMENT_FOLLOWERS
+
+def comment_days(dates):
+    """
+    UTC calendar day (midnight, tz-naive) of each ISO-8601 comment timestamp; NaT where missing or unparseable.
+    The export's UTC stamps ('...Z') are bucketed by their date part, parsed once per distinct day; only stamps with
+    another offset go through the (far slower) full parse.
+    """
+    dates = pd.Series(dates).astype('str')
+    days = pd.Series(pd.NaT, index=dates.index, dtype='datetime64[us]')
+    is_utc = dates.str.endswith('Z').fillna(False).astype(bool)
+    codes, uniques = pd.factorize(dates[is_utc].str.slice(0, 10))
+    days[is_utc] = pd.to_datetime(pd.Series(uniques, dtype=object), format='%Y-%m-%d', errors='coerce').to_numpy()[codes]
+    other = dates.notna() & ~is_utc
+    if other.any():
+        days[other] = pd.to_datetime(dates[other], utc=True, errors='coerce', format='ISO8601').dt.tz_localize(None).dt.floor('D')
+    return days
+
+def sentiment_bucket_codes(scores):
+    """Position in SENTIMENT_BUCKETS of each score: below -0.2 negative, above 0.2 positive, else neutral; NaN unscored."""
+    values = np.asarray(scores, dtype=float)
+    return np.select([values < -BUCKET_THRESHOLD, values > BUCKET_THRESHOLD, ~np.isnan(values)], [0, 2, 1], 3)
+
+def sentiment_bucket(scores):
+    """SENTIMENT_BUCKETS label of each score."""
+    scores = pd.Series(scores, dtype=float)
+    return pd.Series(np.array(SENTIMENT_BUCKETS, dtype=object)[sentiment_bucket_codes(scores)], index=scores.index, name='sentiment_bucket')
+
+def first_row_per_group(group_codes, keys, positions):
+    """Per group, the position of its row with the lowest key (the earliest such row on ties): (group codes, positions)."""
+    order = np.lexsort((positions, keys, group_codes))
+    group_codes, positions = group_codes[order], positions[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = group_codes[1:] != group_codes[:-1]
+    return group_codes[first], positions[first]
+
+def comments_to_state(df):
+    """
+    State of one batch of enriched comments. Rows are numbered in file order ('seq'), so the extreme comment of a
+    post is the first row holding its max/min score, as idxmax/idxmin pick it.
+    """
+    groups = df.groupby('post_id')
+    posts = groups.agg(**{c: (c, 'first') for c in FIRST_COLUMNS}, comment_count=('original_comment_for_context', 'size'),
+                       scored_count=('sentiment_score', 'count'))
+    scores = df['sentiment_score'].astype(float)
+    posts['sentiment_sum'] = scores.groupby(df['post_id']).sum()
+    posts['negative_count'] = (scores < 0).groupby(df['post_id']).sum()
+
+    # Group number of each row (NaN where post_id is missing); ngroup numbers groups in the same sorted order as agg.
+    codes = groups.ngroup().to_numpy(dtype=float)
+    values = scores.to_numpy()
+    scored = np.flatnonzero(~np.isnan(values) & ~np.isnan(codes))
+    texts, contexts = df['text_for_analysis'].to_numpy(dtype=object), df['original_comment_for_context'].to_numpy(dtype=object)
+    for side, keys in (('max', -values[scored]), ('min', values[scored])):
+        rows = np.full(len(posts), -1, dtype=np.int64)
+        group_codes, positions = first_row_per_group(codes[scored].astype(np.int64), keys, scored)
+        rows[group_codes] = positions
+        found = rows >= 0
+        posts[f'{side}_score'] = np.where(found, values[rows], np.nan)
+        posts[f'{side}_seq'] = rows
+        posts[f'{side}_text'] = np.where(found, texts[rows], None)
+        posts[f'{side}_context'] = np.where(found, contexts[rows], None)
+    sums = pd.DataFrame({'n': 1, 'sentiment_sum': scores.fillna(0), 'sentiment_sumsq': (scores * scores).fillna(0)}, index=df.index)
+    # Grouped on bucket codes, which are labelled afterwards on the far smaller result.
+    buckets = pd.Series(sentiment_bucket_codes(scores), index=df.index, name='sentiment_bucket')
+    topics = sums.groupby([df['post_id'], df['topic'], buckets]).sum()
+    topics = topics.rename(index=dict(enumerate(SENTIMENT_BUCKETS)), level='sentiment_bucket')
+    # Every dated comment counts towards its day, so comments without a topic are kept under 'N/A'.
+    days = comment_days(df['comment_date'] if 'comment_date' in df.columns else pd.Series(None, index=df.index)).rename('day')
+    daily = sums.groupby([df['post_id'], days.set_axis(df.index), df['topic'].fillna('N/A'), buckets]).sum()
+    daily = daily.rename(index=dict(enumerate(SENTIMENT_BUCKETS)), level='sentiment_bucket')
+    # pandas' grouped variance is a running (Welford) update in row order, which no sums reproduce to the last bit.
+    has_score = scores.notna() & df['post_id'].notna()
+    scored_values = pd.Series(scores[has_score].to_numpy(), index=pd.Index(df.loc[has_score, 'post_id'], name='post_id'), name='sentiment_score')
+    return {'posts': posts, 'topics': topics, 'daily': daily, 'scores': scored_values, 'rows': len(df), 'version': STATE_VERSION}
+
+def _merge_posts(a, b):
+    """Row-wise merge of the posts present in both states (same index, `b` later and already offset)."""
+    merged = pd.DataFrame(index=a.index)
+    for column in FIRST_COLUMNS:
+        merged[column] = a[column].where(a[column].notna(), b[column])
+    for column in COUNT_COLUMNS:
+        merged[column] = a[column] + b[column]
+    for side in EXTREMES:
+        a_score, b_score = a[f'{side}_score'], b[f'{side}_score']
+        better = (b_score > a_score) if side == 'max' else (b_score < a_score)
+        take_b = better | (a_score.isna() & b_score.notna()) | ((b_score == a_score) & (b[f'{side}_seq'] < a[f'{side}_seq']))
+        for field in ('score', 'seq', 'text', 'context'):
+            merged[f'{side}_{field}'] = b[f'{side}_{field}'].where(take_b, a[f'{side}_{field}'])
+    return merged
+
+def merge_states(earlier, later):
+    """
+    The state of `earlier`'s comments followed by `later`'s. Costs time in the number of posts and topics of the two
+    states, not in the number of comments behind them (apart from appending their scored values).
+    """
+    if earlier['rows'] == 0:
+        return later
+    if later['rows'] == 0:
+        return earlier
+    a, b = earlier['posts'], later['posts'].copy()
+    for side in EXTREMES:
+        b[f'{side}_seq'] = b[f'{side}_seq'].where(b[f'{side}_seq'] < 0, b[f'{side}_seq'] + earlier['rows'])
+    both = a.index.intersection(b.index)
+    posts = pd.concat([a.loc[a.index.difference(both)], _merge_posts(a.loc[both], b.loc[both]), b.loc[b.index.difference(both)]]).sort_index()
+    topics = pd.concat([earlier['topics'], later['topics']]).groupby(level=[0, 1, 2]).sum()
+    daily = pd.concat([earlier['daily'], later['daily']]).groupby(level=[0, 1, 2, 3]).sum()
+    scores = pd.concat([earlier['scores'], later['scores']])
+    return {'posts': posts, 'topics': topics, 'daily': daily, 'scores': scores, 'rows': earlier['rows'] + later['rows'], 'version': STATE_VERSION}
+
+def fold_comments(state, df):
+    """Adds a batch of new comments (rows after those already in `state`) to the state."""
+    return merge_states(state, comments_to_state(df))
+
+def select_posts(state, post_ids):
+    """The part of a state for the given posts. Row numbering is kept, so merging selections stays exact."""
+    posts = state['posts'][state['posts'].index.isin(post_ids)]
+    topics = state['topics'][state['topics'].index.get_level_values(0).isin(post_ids)]
+    daily = state['daily'][state['daily'].index.get_level_values(0).isin(post_ids)]
+    scores = state['scores'][state['scores'].index.isin(post_ids)]
+    return {'posts': posts, 'topics': topics, 'daily': daily, 'scores': scores, 'rows': state['rows'], 'version': STATE_VERSION}
+
+def summarize_state(state):
+    """
+    The per-post summary columns of aggregate_data.py, derived from the state. The mean comes from the exact sums of
+    the integer sentiment scores; the variance is pandas' grouped variance over the scored values in row order, so
+    both match a groupby over the comments to the last bit.
+    """
+    posts = state['posts']
+    n = posts['scored_count']
+    summary = posts[FIRST_COLUMNS + ['comment_count']].copy()
+    summary['avg_sentiment_score'] = (posts['sentiment_sum'] / n).where(n > 0)
+    summary['sentiment_variance'] = state['scores'].groupby(level=0).var().reindex(posts.index)
+    # Posts without a scored comment get 0 (an integer column if no post has one, as the per-group lambda gave).
+    summary['negative_comment_ratio'] = (posts['negative_count'] / n).where(n > 0, 0) if (n > 0).any() else 0
+    # Most frequent topic; ties go to the first in sort order, as Series.mode picks.
+    counts = state['topics']['n'].groupby(level=[0, 1]).sum().reset_index()
+    main_topic = counts.sort_values(['post_id', 'n'], ascending=[True, False], kind='stable').drop_duplicates('post_id')
+    summary['main_topic'] = main_topic.set_index('post_id')['topic'].reindex(summary.index).fillna('N/A')
+    summary = summary.reset_index()
+
+    has_positive = (posts['max_seq'] >= 0).to_numpy()
+    # When the same comment is both the most positive and the most negative one, there is no distinct negative comment.
+    distinct = ((posts['min_seq'] >= 0) & (posts['min_seq'] != posts['max_seq'])).to_numpy()
+    summary['most_positive_comment'] = np.where(has_positive, posts['max_text'].to_numpy(dtype=object), "No analyzable text comments")
+    summary['original_positive_context'] = np.where(has_positive, posts['max_context'].to_numpy(dtype=object), "N/A")
+    summary['most_negative_comment'] = np.where(distinct, posts['min_text'].to_numpy(dtype=object), "No distinct negative comment")
+    summary['original_negative_context'] = np.where(distinct, posts['min_context'].to_numpy(dtype=object), "N/A")
+    return summary
+
+def _paths(month_str, state_dir=STATE_DIR):
+    base = os.path.join(state_dir, f"post_stats_{month_str}")
+    return base + ".pkl", base + ".meta.json"
+
+def _prefix_sha256(path, length):
+    digest, remaining = hashlib.sha256(), length
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+def save_state(state, month_str, input_path, state_dir=STATE_DIR):
+    """Saves the state with the byte length and hash of the input it covers, so later runs can fold only what was appended."""
+    state_path, meta_path = _paths(month_str, state_dir)
+    os.makedirs(state_dir, exist_ok=True)
+    pd.to_pickle(state, state_path + '.tmp')
+    os.replace(state_path + '.tmp', state_path)
+    size = os.path.getsize(input_path)
+    meta = {'input_bytes': size, 'input_sha256': _prefix_sha256(input_path, size), 'rows': state['rows'], 'pandas': pd.__version__}
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=4)
+    os.replace(meta_path + '.tmp', meta_path)
+
+def load_state(month_str, state_dir=STATE_DIR):
+    """The saved state of a month, or None (also when it was saved by an older version)."""
+    state_path, _ = _paths(month_str, state_dir)
+    state = pd.read_pickle(state_path) if os.path.exists(state_path) else None
+    return state if state is not None and state.get('version') == STATE_VERSION else None
+
+def load_or_update_state(month_str, input_path, state_dir=STATE_DIR):
+    """
+    (state, comments folded this call) for an enriched month file. If the saved state covers an unchanged prefix of
+    the file that ends at a line break, only the rows appended after it are read and folded in; otherwise the state
+    is rebuilt from the whole file. Checking the prefix hashes it, but none of the old rows are parsed again.
+    """
+    state_path, meta_path = _paths(month_str, state_dir)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        state = pd.read_pickle(state_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        meta, state = None, None
+    size = os.path.getsize(input_path)
+    if meta is not None and meta.get('pandas') == pd.__version__ and state.get('version') == STATE_VERSION and 0 < meta['input_bytes'] <= size:
+        with open(input_path, 'rb') as f:
+            f.seek(meta['input_bytes'] - 1)
+            at_line_break = f.read(1) == b'\n'
+        if at_line_break and _prefix_sha256(input_path, meta['input_bytes']) == meta['input_sha256']:
+            if size == meta['input_bytes']:
+                return state, 0
+            header = pd.read_csv(input_path, nrows=0).columns
+            with open(input_path, 'r', encoding='utf-8', newline='') as f:
+                f.seek(meta['input_bytes'])
+                new_rows = pd.read_csv(f, header=None, names=header)
+            state = fold_comments(state, new_rows)
+            save_state(state, month_str, input_path, state_dir)
+            return state, len(new_rows)
+    state = comments_to_state(pd.read_csv(input_path))
+    save_state(state, month_str, input_path, state_dir)
+    return state, state['rows']
@@ -0,0 +1,116 @@
+# File: post_store.py
+# Persistent cross-month post store. `post_months` holds each post's summary row for every month it has comments
+# in, keyed by (post_id, month); `posts` holds one whole-lifetime row per post_id, derived from the merged
+# per-month post states (see post_stats.py), so its metrics cover all of the post's comments exactly.
+# aggregate_data.py upserts both as each month is aggregated; consumers fetch a post's history with one keyed lookup.
+import argparse
+import os
+import sqlite3
+import time
+import pandas as pd
+
+POST_STORE_DB = "processed_data/post_store.sqlite"
+SQLITE_MAX_PARAMS = 500
+SUMMARY_COLUMNS = {
+    'post_caption': 'TEXT', 'content_type': 'TEXT', 'total_likes': 'NUMERIC', 'num_shares': 'NUMERIC',
+    'comment_count': 'INTEGER', 'avg_sentiment_score': 'REAL', 'sentiment_variance': 'REAL', 'negative_comment_ratio': 'REAL',
+    'main_topic': 'TEXT', 'most_positive_comment': 'TEXT', 'original_positive_context': 'TEXT',
+    'most_negative_comment': 'TEXT', 'original_negative_context': 'TEXT', 'weighted_engagement_rate': 'REAL',
+}
+
+def post_key(post_id):
+    """post_id as stored: the digits of integral ids (which pandas may have read as floats), else the string."""
+    if isinstance(post_id, float) and post_id.is_integer():
+        return str(int(post_id))
+    return str(post_id).strip()
+
+def open_post_store(db_path=POST_STORE_DB):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    columns = ",\n".join(f"            {name} {kind}" for name, kind in SUMMARY_COLUMNS.items())
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS post_months (
+            post_id TEXT NOT NULL,
+            month TEXT NOT NULL,
+{columns},
+            PRIMARY KEY (post_id, month)
+        )""")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS posts (
+            post_id TEXT PRIMARY KEY,
+            first_month TEXT NOT NULL,
+            last_month TEXT NOT NULL,
+            month_count INTEGER NOT NULL,
+{columns},
+            updated_at REAL NOT NULL
+        )""")
+    return conn
+
+def _rows(summary, *leading):
+    values = summary[list(SUMMARY_COLUMNS)].astype(object).where(summary[list(SUMMARY_COLUMNS)].notna(), None)
+    return [tuple(lead[i] for lead in leading) + tuple(row) for i, row in enumerate(values.itertuples(index=False))]
+
+def replace_month(conn, month_str, summary):
+    """Replaces the month's slice with `summary`. Returns the keys of every post in the old or new slice (uncommitted)."""
+    old = {post_id for (post_id,) in conn.execute("SELECT post_id FROM post_months WHERE month = ?", (month_str,))}
+    keys = [post_key(p) for p in summary['post_id']]
+    conn.execute("DELETE FROM post_months WHERE month = ?", (month_str,))
+    conn.executemany(f"INSERT INTO post_months (post_id, month, {', '.join(SUMMARY_COLUMNS)}) VALUES ({', '.join('?' * (len(SUMMARY_COLUMNS) + 2))})",
+                     _rows(summary, keys, [month_str] * len(keys)))
+    return old | set(keys)
+
+def months_for_posts(conn, keys):
+    """{post key: sorted months with a slice for it}."""
+    keys, found = list(keys), {}
+    for i in range(0, len(keys), SQLITE_MAX_PARAMS):
+        chunk = keys[i:i + SQLITE_MAX_PARAMS]
+        for post_id, month in conn.execute(f"SELECT post_id, month FROM post_months WHERE post_id IN ({','.join('?' * len(chunk))}) ORDER BY month", chunk):
+            found.setdefault(post_id, []).append(month)
+    return found
+
+def upsert_lifetime(conn, summary, months_by_post, removed=()):
+    """Writes lifetime rows for the posts in `summary`, deletes those in `removed` (no slices left), and commits."""
+    keys = [post_key(p) for p in summary['post_id']]
+    months = [months_by_post[k] for k in keys]
+    now = time.time()
+    conn.executemany(f"INSERT OR REPLACE INTO posts (post_id, first_month, last_month, month_count, {', '.join(SUMMARY_COLUMNS)}, updated_at) "
+                     f"VALUES ({', '.join('?' * (len(SUMMARY_COLUMNS) + 5))})",
+                     [row + (now,) for row in _rows(summary, keys, [m[0] for m in months], [m[-1] for m in months], [len(m) for m in months])])
+    conn.executemany("DELETE FROM posts WHERE post_id = ?", [(k,) for k in removed])
+    conn.commit()
+
+def get_post_history(conn, post_id):
+    """(lifetime row as a dict or None, the post's monthly slices as a DataFrame ordered by month)."""
+    key = post_key(post_id)
+    cursor = conn.execute("SELECT * FROM posts WHERE post_id = ?", (key,))
+    row = cursor.fetchone()
+    lifetime = dict(zip([d[0] for d in cursor.description], row)) if row else None
+    months = pd.read_sql_query("SELECT * FROM post_months WHERE post_id = ? ORDER BY month", conn, params=(key,))
+    return lifetime, months
+
+def load_lifetime_posts(conn):
+    return pd.read_sql_query("SELECT * FROM posts ORDER BY post_id", conn)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the cross-month post store (filled by aggregate_data.py).")
+    parser.add_argument("--db", default=POST_STORE_DB, help="Path to the store database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show post and slice counts.")
+    post_parser = subparsers.add_parser("post", help="Show one post's lifetime row and monthly slices.")
+    post_parser.add_argument("post_id")
+    args = parser.parse_args()
+
+    conn = open_post_store(args.db)
+    if args.command == "stats":
+        posts, multi = conn.execute("SELECT COUNT(*), COALESCE(SUM(month_count > 1), 0) FROM posts").fetchone()
+        print(f"Posts: {posts} ({multi} with comments in more than one month)")
+        for month, count in conn.execute("SELECT month, COUNT(*) FROM post_months GROUP BY month ORDER BY month"):
+            print(f"  - {month}: {count} posts")
+    elif args.command == "post":
+        lifetime, months = get_post_history(conn, args.post_id)
+        if lifetime is None:
+            print(f"Post {args.post_id} is not in the store."); exit(1)
+        print(f"Post {lifetime['post_id']}: {lifetime['comment_count']} comments over {lifetime['month_count']} month(s), "
+              f"{lifetime['first_month']} to {lifetime['last_month']}; avg sentiment {lifetime['avg_sentiment_score']}, "
+              f"negative ratio {lifetime['negative_comment_ratio']}, main topic {lifetime['main_topic']}")
+        print(months[['month', 'comment_count', 'avg_sentiment_score', 'negative_comment_ratio', 'main_topic']].to_string(index=False))
@@ -3,43 +3,67 @@ import pandas as pd
 import json
 import os
 import argparse
+from build_post_table import POSTS_JSON_FILE, load_post_table
+
+OUTPUT_COLUMNS = ['post_id', 'post_caption', 'content_type', 'total_likes', 'num_shares', 'comment_text', 'comment_likes', 'comment_date']
+
+def join_comments_to_posts(comments_data, post_table):
+    """
+    Joins raw comments to the post table as one columnar hash merge.
+    Returns (matched, unmatched): matched has OUTPUT_COLUMNS in source order; unmatched holds
+    the comments whose facebookId is not in the post table (comments without an id are dropped).
+    """
+    comments = pd.DataFrame({
+        'post_id': [c.get('facebookId') for c in comments_data],
+        'comment_text': [c.get('text', '') for c in comments_data],
+        # Kept as objects until the unmatched rows are gone, so their values cannot change the matched rows' dtype.
+        'comment_likes': pd.Series([c.get('likesCount', 0) for c in comments_data], dtype=object),
+        # The raw ISO-8601 UTC timestamp, kept so later stages can bucket comments finer than the month.
+        'comment_date': [c.get('date') for c in comments_data],
+    })
+    comments = comments[comments['post_id'].astype(bool)]
+    comments = comments.assign(post_id=comments['post_id'].astype(str).str.strip())
+
+    joined = comments.merge(post_table, left_on='post_id', right_index=True, how='left', indicator=True)
+    is_match = joined['_merge'] == 'both'
+    matched = joined.loc[is_match, OUTPUT_COLUMNS].astype(post_table.dtypes.to_dict()).reset_index(drop=True)
+    matched['comment_likes'] = matched['comment_likes'].infer_objects()
+    unmatched = joined.loc[~is_match, ['post_id', 'comment_text']].reset_index(drop=True)
+    return matched, unmatched
 
 def process_data_for_month(month_str):
-    POSTS_JSON_FILE = "fb_posts_data.json"
     COMMENTS_JSON_FILE = f"monthly_data/{month_str}.json"
     OUTPUT_DIR = "processed_data"
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     OUTPUT_CSV = os.path.join(OUTPUT_DIR, f"processed_comments_{month_str}.csv")
+    UNMATCHED_CSV = os.path.join(OUTPUT_DIR, f"unmatched_comments_{month_str}.csv")
 
     print(f"--- [Step 1] Processing Raw Data for {month_str} ---")
-    posts_map = {}
     try:
-        with open(POSTS_JSON_FILE, 'r', encoding='utf-8') as f:
-            posts_data = json.load(f)
-            for post in posts_data:
-                if post_id := post.get('postId'):
-                    posts_map[str(post_id).strip()] = {"post_caption": post.get('text', ''), "total_likes": post.get('likes', 0), "num_shares": post.get('shares', 0), "content_type": post.get('type', 'Unknown')}
-        print(f"Successfully loaded {len(posts_map)} posts into the map.")
+        post_table = load_post_table()
+        print(f"Successfully loaded {len(post_table)} posts into the post table.")
     except FileNotFoundError:
         print(f"--> ERROR: '{POSTS_JSON_FILE}' not found."); exit(1)
 
-    all_comments_data = []
     try:
         with open(COMMENTS_JSON_FILE, 'r', encoding='utf-8') as f:
             comments_data = json.load(f)
     except FileNotFoundError:
         print(f"--> ERROR: '{COMMENTS_JSON_FILE}' not found."); exit(1)
 
-    for comment in comments_data:
-        if post_id_from_comment := comment.get('facebookId'):
-            key_to_lookup = str(post_id_from_comment).strip()
-            if post_info := posts_map.get(key_to_lookup):
-                all_comments_data.append({"post_id": key_to_lookup, "post_caption": post_info['post_caption'], "content_type": post_info['content_type'], "total_likes": post_info['total_likes'], "num_shares": post_info['num_shares'], "comment_text": comment.get('text', ''), "comment_likes": comment.get('likesCount', 0)})
-
-    df = pd.DataFrame(all_comments_data)
+    df, unmatched = join_comments_to_posts(comments_data, post_table)
     df.to_csv(OUTPUT_CSV, index=False)
     print(f"Successfully created: '{OUTPUT_CSV}' with {len(df)} rows.")
 
+    if not unmatched.empty:
+        unmatched.to_csv(UNMATCHED_CSV, index=False)
+        top_missing = unmatched['post_id'].value_counts().head(5)
+        print(f"Note: {len(unmatched)} comments reference posts missing from the post table (saved to '{UNMATCHED_CSV}').")
+        for post_id, count in top_missing.items():
+            print(f"  - Post ID: {post_id} ({count} comments)")
+    elif os.path.exists(UNMATCHED_CSV):
+        os.remove(UNMATCHED_CSV)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process Facebook data for a specific month.")
     parser.add_argument("month", type=str, help="The month to process in YYYY-MM format.")
@@ -3,6 +3,9 @@ import os
 import re
 import subprocess
 import argparse
+import time
+from partition_by_month import load_manifest, mark_months_processed
+from enrichment_server import EnrichmentClient, DEFAULT_SERVER_URL
 
 def run_command(command):
     command_str = ' '.join(command)
@@ -18,15 +21,48 @@ def run_command(command):
         print(f"\n--- STDERR from failed script: ---\n{e.stderr}")
         raise
 
-def main(generate_reports_flag):
+def start_enrichment_server(timeout=600):
+    """Starts enrichment_server.py unless one is already up. Returns the process if this call started it, else None."""
+    client = EnrichmentClient(DEFAULT_SERVER_URL)
+    if client.health() is not None:
+        print(f"Enrichment server already running at {DEFAULT_SERVER_URL}; reusing it."); return None
+    print(f"\n>>> STARTING: enrichment server at {DEFAULT_SERVER_URL}")
+    process = subprocess.Popen(['python', 'enrichment_server.py'])
+    deadline = time.time() + timeout
+    while time.time() < deadline and process.poll() is None:
+        if client.health() is not None:
+            print(">>> SUCCESS: enrichment server is up; months will be scored without reloading the models."); return process
+        time.sleep(1)
+    print("--> WARNING: Enrichment server did not come up; months will load the models themselves.")
+    process.kill()
+    return None
+
+def stop_enrichment_server(process, timeout=60):
+    """Asks a server started by start_enrichment_server to shut down; kills it if it does not exit within `timeout`."""
+    if process is None: return
+    try:
+        EnrichmentClient(DEFAULT_SERVER_URL).shutdown()
+        process.wait(timeout=timeout)
+    except Exception:
+        print("--> WARNING: Enrichment server did not shut down cleanly; killing it.")
+        process.kill()
+        process.wait()
+
+def main(generate_reports_flag, incremental_flag=False, enrichment_server_flag=False):
     print("--- Starting Astra Intelligence [Automated Trust & Verify] Pipeline ---")
     
     try:
         print("\n" + "="*20 + " PRE-STEP: PARTITIONING DATA " + "="*20)
-        run_command(['python', 'partition_by_month.py'])
+        run_command(['python', 'partition_by_month.py', '--incremental' if incremental_flag else '--stream'])
     except Exception:
         print("\n---!!! FATAL ERROR: Partitioning failed. !!!---"); return
 
+    try:
+        print("\n" + "="*20 + " PRE-STEP: BUILDING POST TABLE " + "="*20)
+        run_command(['python', 'build_post_table.py'])
+    except Exception:
+        print("\n---!!! FATAL ERROR: Building the post table failed. !!!---"); return
+
     MONTHLY_DATA_FOLDER = 'monthly_data'
     try:
         files = os.listdir(MONTHLY_DATA_FOLDER)
@@ -37,33 +73,47 @@ def main(generate_reports_flag):
         print(f"\nFound {len(months_to_process)} months to process: {months_to_process}")
     except FileNotFoundError:
         print(f"--> FATAL ERROR: Directory '{MONTHLY_DATA_FOLDER}' not found."); return
+
+    if incremental_flag:
+        # Only months the partitioner rewrote, or that have not yet made it through every stage, need re-running.
+        pending_months = set(load_manifest(MONTHLY_DATA_FOLDER)['pending_months'])
+        months_to_process = [m for m in months_to_process if m in pending_months]
+        if not months_to_process:
+            print("Incremental run: no months changed or pending since the last partitioning. Nothing to do."); return
+        print(f"Incremental run: processing only changed or pending months: {months_to_process}")
     
+    server_process = start_enrichment_server() if enrichment_server_flag else None
+
     successful_months, failed_months = [], []
-    for month in months_to_process:
-        print(f"\n{'='*20} PROCESSING MONTH: {month} {'='*20}")
-        try:
-            # --- The New Streamlined Workflow ---
-            run_command(['python', 'process_facebook_data.py', month])
-            run_command(['python', 'verify_processing.py', month])
+    try:
+        for month in months_to_process:
+            print(f"\n{'='*20} PROCESSING MONTH: {month} {'='*20}")
+            try:
+                # --- The New Streamlined Workflow ---
+                run_command(['python', 'process_facebook_data.py', month])
+                run_command(['python', 'verify_processing.py', month])
             
-            run_command(['python', 'translate_and_prepare.py', month])
-            run_command(['python', 'verify_translation.py', month])
+                run_command(['python', 'translate_and_prepare.py', month])
+                run_command(['python', 'verify_translation.py', month])
             
-            run_command(['python', 'enrich_data.py', month])
+                run_command(['python', 'enrich_data.py', month])
             
-            # The new aggregate script does it all: aggregates, sanitizes, and self-verifies.
-            run_command(['python', 'aggregate_data.py', month])
+                # The new aggregate script does it all: aggregates, sanitizes, and self-verifies.
+                run_command(['python', 'aggregate_data.py', month])
             
-            if generate_reports_flag:
-                run_command(['python', 'generate_final_report_gemini.py', month])
+                if generate_reports_flag:
+                    run_command(['python', 'generate_final_report_gemini.py', month])
             
-            successful_months.append(month)
-            print(f"\n[SUCCESS] Pipeline for month {month} completed successfully!")
-        except Exception:
-            print(f"\n---!!! PIPELINE HALTED for month {month}. !!!---")
-            print("--- Continuing to the next available month... ---")
-            failed_months.append(month)
-            continue
+                successful_months.append(month)
+                mark_months_processed([month], MONTHLY_DATA_FOLDER)
+                print(f"\n[SUCCESS] Pipeline for month {month} completed successfully!")
+            except Exception:
+                print(f"\n---!!! PIPELINE HALTED for month {month}. !!!---")
+                print("--- Continuing to the next available month... ---")
+                failed_months.append(month)
+                continue
+    finally:
+        stop_enrichment_server(server_process)
     
     print("\n" + "="*60 + "\n--- Astra Intelligence Pipeline Finished ---\n" + "="*60)
     print(f"[SUCCESS] Successfully processed {len(successful_months)} months: {successful_months}")
@@ -75,5 +125,8 @@ def main(generate_reports_flag):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the Astra Intelligence data pipeline.")
     parser.add_argument('--generate-reports', action='store_true', help="If set, also generate AI reports.")
+    parser.add_argument('--incremental', action='store_true', help="Only re-process months whose raw comments changed since the last run.")
+    parser.add_argument('--enrichment-server', action='store_true',
+                        help="Load the enrichment models once in a local server shared by all months (reuses one that is already running).")
     args = parser.parse_args()
-    main(args.generate_reports)
\ No newline at end of file
+    main(args.generate_reports, args.incremental, args.enrichment_server)
\ No newline at end of file
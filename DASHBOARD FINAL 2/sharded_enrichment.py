@@ -0,0 +1,74 @@
+# File: sharded_enrichment.py
+# Multi-process enrichment: a month's texts are cut into shards of similar token length and scored by a pool of
+# worker processes. Each worker loads its models once, with a fixed number of intra-op threads, so N workers
+# share the cores instead of N x cpu_count threads fighting over them. Results come back aligned with the input.
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from enrichment_batching import token_lengths, TOKEN_BUDGET
+from enrich_data import load_pipeline, task_backend, score_sentiment, score_topics, CANDIDATE_TOPICS
+
+SHARD_TEXTS = 256  # texts per work unit: small enough to balance the pool and cache progress often
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS']
+
+_worker_pipelines = {}
+
+def default_threads(workers):
+    return max(1, (os.cpu_count() or 1) // workers)
+
+def _init_worker(models, backend, threads):
+    # Spawned workers have not imported torch yet, so the environment still decides the OpenMP pool size.
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    if any(task_backend(task, backend, model_name) == 'pytorch' for task, model_name in models.items()):
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    for task, model_name in models.items():
+        _worker_pipelines[task] = load_pipeline(task, model_name, backend, device=-1, threads=threads)
+
+def _score_shard(task, texts, token_budget, candidate_labels):
+    pipe = _worker_pipelines[task]
+    if task == "sentiment-analysis":
+        return score_sentiment(pipe, texts, token_budget)
+    return score_topics(pipe, texts, candidate_labels, token_budget)
+
+def plan_shards(texts, shard_texts=SHARD_TEXTS):
+    """Index lists of at most `shard_texts` texts, longest texts first, so each shard pads like one bucket."""
+    lengths = token_lengths(texts)
+    order = sorted(range(len(texts)), key=lambda i: -lengths[i])
+    return [order[i:i + shard_texts] for i in range(0, len(order), shard_texts)]
+
+def open_pool(models, workers, backend='pytorch', threads_per_worker=None):
+    """A spawn-context pool whose workers each load `models` ({task: model name}) once."""
+    threads = threads_per_worker or default_threads(workers)
+    print(f"Starting {workers} enrichment workers ({threads} threads each, {backend} backend)...")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_worker, initargs=(models, backend, threads))
+
+def score_sharded(pool, task, texts, token_budget=TOKEN_BUDGET, candidate_labels=CANDIDATE_TOPICS, shard_texts=SHARD_TEXTS, on_batch_done=None):
+    """
+    Scores `texts` with the pool's `task` pipeline and returns results aligned with `texts` (None where a batch failed).
+    `on_batch_done(number, total, texts, results, error)` is called in this process as shards finish, in
+    completion order; texts of failed batches inside a shard are reported separately with an error.
+    """
+    results = [None] * len(texts)
+    shards = plan_shards(texts, shard_texts)
+    futures = {pool.submit(_score_shard, task, [texts[i] for i in shard], token_budget, candidate_labels): shard for shard in shards}
+    for number, future in enumerate(as_completed(futures), 1):
+        shard = futures[future]
+        try:
+            shard_results, error = future.result(), None
+        except Exception as e:
+            shard_results, error = [None] * len(shard), e
+        for i, result in zip(shard, shard_results):
+            results[i] = result
+        if on_batch_done is None:
+            continue
+        done = [i for i, r in zip(shard, shard_results) if r is not None]
+        failed = [i for i, r in zip(shard, shard_results) if r is None]
+        if done:
+            on_batch_done(number, len(shards), [texts[i] for i in done], [results[i] for i in done], None)
+        if failed:
+            on_batch_done(number, len(shards), [texts[i] for i in failed], None, error or RuntimeError("model call failed in worker"))
+    return results
@@ -0,0 +1,89 @@
+# File: text_normalization.py
+# Comment-text normalization shared by the translation, verification and language-detection stages.
+# The *_series functions run each transform once over a whole column instead of once per row.
+import os
+import re
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+URL_PATTERN = re.compile(r'http\S+|www\S+|https\S+', flags=re.MULTILINE)
+BRACKET_PATTERN = re.compile(r'\[.*?\]')
+MENTION_PATTERN = re.compile(r'@\w+')
+EMOJI_PATTERN = re.compile(
+    "["
+    u"\U0001F600-\U0001F64F" u"\U0001F300-\U0001F5FF" u"\U0001F680-\U0001F6FF"
+    u"\U0001F1E0-\U0001F1FF" u"\U00002702-\U000027B0" u"\U000024C2-\U0001F251"
+    "]+",
+    flags=re.UNICODE,
+)
+# verify_translation has always used this raw (not f-) string, so the class is the literal characters of
+# "{re.escape(string.punctuation)}" plus whitespace and digits. Kept verbatim so verification results do not change.
+NON_LATIN_IGNORED_PATTERN = re.compile(r'[{re.escape(string.punctuation)}\s\d]')
+
+# None of the patterns above can match across "\n", and none of them can match "\x00", so texts joined with
+# this separator are transformed exactly as they would be one at a time.
+BLOB_SEPARATOR = "\n\x00\n"
+PARALLEL_MIN_ROWS = 200_000
+CHUNK_ROWS = 50_000
+
+def clean_text(text):
+    """Strips URLs, [bracketed] text, @mentions, '#' and emoji, and collapses whitespace."""
+    if not isinstance(text, str) or not text.strip(): return ""
+    text = URL_PATTERN.sub('', text)
+    text = BRACKET_PATTERN.sub('', text)
+    text = MENTION_PATTERN.sub('', text)
+    text = text.replace('#', '')
+    text = EMOJI_PATTERN.sub('', text)
+    text = ' '.join(text.split())
+    return text.strip()
+
+def _clean_texts(texts):
+    """clean_text over a list of strings, with each regex pass run once over all of them joined together."""
+    if any('\x00' in t for t in texts):
+        return [clean_text(t) for t in texts]
+    blob = BLOB_SEPARATOR.join(texts)
+    blob = URL_PATTERN.sub('', blob)
+    blob = BRACKET_PATTERN.sub('', blob)
+    blob = MENTION_PATTERN.sub('', blob)
+    blob = blob.replace('#', '')
+    blob = EMOJI_PATTERN.sub('', blob)
+    # Whitespace is collapsed per text: str.split() is much faster than a \s+ pass over the joined blob.
+    return [' '.join(t.split()) for t in blob.split(BLOB_SEPARATOR)]
+
+def _map_chunks(fn, texts, workers):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(texts) < PARALLEL_MIN_ROWS:
+        return fn(texts)
+    chunks = [texts[i:i + CHUNK_ROWS] for i in range(0, len(texts), CHUNK_ROWS)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [value for chunk in pool.map(fn, chunks) for value in chunk]
+
+def clean_text_series(series, workers=None):
+    """Column-wise clean_text: same output as series.apply(clean_text), index preserved.
+    Frames with at least PARALLEL_MIN_ROWS rows are split across `workers` processes (default: one per CPU)."""
+    texts = [t if isinstance(t, str) else "" for t in series]
+    return pd.Series(_map_chunks(_clean_texts, texts, workers), index=series.index)
+
+def is_mostly_non_latin(text, threshold=0.5):
+    """Checks if a string contains a high percentage of non-Latin characters."""
+    if not text or not isinstance(text, str):
+        return False
+    cleaned_text = NON_LATIN_IGNORED_PATTERN.sub('', text)
+    if not cleaned_text:
+        return False
+    non_latin_chars = len(cleaned_text) - len(cleaned_text.encode('ascii', 'ignore'))
+    return (non_latin_chars / len(cleaned_text)) > threshold
+
+def _non_latin_ratios(texts):
+    if any('\x00' in t for t in texts):
+        cleaned = [NON_LATIN_IGNORED_PATTERN.sub('', t) for t in texts]
+    else:
+        cleaned = NON_LATIN_IGNORED_PATTERN.sub('', '\x00'.join(texts)).split('\x00')
+    return [(len(t) - len(t.encode('ascii', 'ignore'))) / len(t) if t else 0.0 for t in cleaned]
+
+def is_mostly_non_latin_series(series, threshold=0.5, workers=None):
+    """Column-wise is_mostly_non_latin: a boolean Series aligned with `series`."""
+    texts = [t if isinstance(t, str) else "" for t in series]
+    ratios = _map_chunks(_non_latin_ratios, texts, workers)
+    return pd.Series([r > threshold for r in ratios], index=series.index)
@@ -0,0 +1,148 @@
+# File: topic_embeddings.py
+# Embedding-similarity topic engine: each comment is encoded once and compared against one prototype vector
+# per topic, instead of one NLI forward pass per (comment, topic) pair. Comments whose best topic does not
+# beat the runner-up by `margin` are left for the zero-shot NLI model.
+import argparse
+import glob
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from cascade_classifier import model_labelled
+from enrichment_batching import token_lengths, run_bucketed, TOKEN_BUDGET, MAX_SEQUENCE_LENGTH
+
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+PROTOTYPES_FILE = "processed_data/topic_prototypes.npz"
+LABELLED_GLOB = "enriched_data/enriched_data_*.csv"
+LABEL_TEMPLATE = "This comment is about {}."
+MIN_EXAMPLES = 5            # topics with fewer labelled comments fall back to the embedded label description
+MAX_EXAMPLES_PER_TOPIC = 500
+SCORE_TEMPERATURE = 0.05    # softmax temperature turning cosine similarities into a score distribution
+
+def load_encoder(model_name=EMBEDDING_MODEL, device=-1):
+    """(tokenizer, model) for mean-pooled sentence embeddings."""
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    if device >= 0 and torch.cuda.is_available():
+        model = model.to(f"cuda:{device}")
+    return tokenizer, model
+
+def encode_texts(encoder, texts, token_budget=TOKEN_BUDGET, on_batch_done=None):
+    """L2-normalized mean-pooled embeddings, one row per text (zeros where a batch failed), batched by token length."""
+    import torch
+    tokenizer, model = encoder
+    def run(batch):
+        inputs = tokenizer(batch, padding=True, truncation=True, max_length=MAX_SEQUENCE_LENGTH, return_tensors='pt').to(model.device)
+        with torch.inference_mode():
+            hidden = model(**inputs).last_hidden_state
+        mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+        return list(torch.nn.functional.normalize(pooled, dim=-1).float().cpu().numpy())
+    rows = run_bucketed(run, texts, token_lengths(texts, tokenizer), token_budget, on_batch_done=on_batch_done)
+    dim = model.config.hidden_size
+    return np.vstack([r if r is not None else np.zeros(dim, dtype=np.float32) for r in rows]) if rows else np.zeros((0, dim), dtype=np.float32)
+
+def load_labelled_examples(labels, pattern=LABELLED_GLOB, max_per_topic=MAX_EXAMPLES_PER_TOPIC, seed=0):
+    """
+    {topic: [distinct texts]} from previously enriched months, for the topics in `labels`. Only topics the zero-shot
+    model gave are used (topic_tier 'transformer', or no tier in files from before it was recorded): rows labelled by
+    this engine or a cheaper tier would train the prototypes on their own output.
+    """
+    frames = [pd.read_csv(path, usecols=lambda c: c in ('text_for_analysis', 'topic', 'topic_tier')) for path in sorted(glob.glob(pattern))]
+    if not frames:
+        return {}
+    df = model_labelled(pd.concat(frames), ['topic_tier'])
+    df = df[['text_for_analysis', 'topic']].dropna().drop_duplicates('text_for_analysis')
+    df = df[df['topic'].isin(labels)]
+    return {topic: group.sample(min(len(group), max_per_topic), random_state=seed)['text_for_analysis'].astype(str).tolist()
+            for topic, group in df.groupby('topic')}
+
+def build_prototypes(encoder, labels, examples=None, token_budget=TOKEN_BUDGET):
+    """
+    One unit vector per label: the mean embedding of its labelled examples when it has at least MIN_EXAMPLES,
+    otherwise the embedding of LABEL_TEMPLATE filled with the label. Returns (matrix, {label: source}).
+    """
+    examples = examples or {}
+    description = encode_texts(encoder, [LABEL_TEMPLATE.format(label) for label in labels], token_budget)
+    vectors, sources = [], {}
+    for i, label in enumerate(labels):
+        texts = examples.get(label, [])
+        if len(texts) >= MIN_EXAMPLES:
+            vector, sources[label] = encode_texts(encoder, texts, token_budget).mean(axis=0), f"{len(texts)} examples"
+        else:
+            vector, sources[label] = description[i], "label description"
+        vectors.append(vector / max(np.linalg.norm(vector), 1e-9))
+    return np.vstack(vectors).astype(np.float32), sources
+
+def prototypes_id(model_name, labels, matrix):
+    """
+    Identifies a prototype set in the inference cache, so rebuilt prototypes, or texts encoded under another
+    truncation length, never reuse old similarity results.
+    """
+    digest = hashlib.sha256(json.dumps([model_name, list(labels), MAX_SEQUENCE_LENGTH]).encode('utf-8') + matrix.tobytes()).hexdigest()[:12]
+    return f"{model_name}#prototypes-{digest}"
+
+def save_prototypes(matrix, labels, model_name, sources, path=PROTOTYPES_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez(path, matrix=matrix, labels=np.array(labels), model=np.array(model_name), sources=np.array(json.dumps(sources)))
+
+def load_prototypes(labels, model_name=EMBEDDING_MODEL, path=PROTOTYPES_FILE):
+    """The saved prototype matrix if it was built for the same model and labels (in order), else None."""
+    if not os.path.exists(path):
+        return None
+    saved = np.load(path)
+    if str(saved['model']) != model_name or saved['labels'].tolist() != list(labels):
+        return None
+    return saved['matrix']
+
+def load_or_build_prototypes(encoder, labels, model_name=EMBEDDING_MODEL, path=PROTOTYPES_FILE, pattern=LABELLED_GLOB):
+    matrix = load_prototypes(labels, model_name, path)
+    if matrix is None:
+        print(f"Building topic prototypes from '{pattern}'...")
+        matrix, sources = build_prototypes(encoder, labels, load_labelled_examples(labels, pattern))
+        save_prototypes(matrix, labels, model_name, sources, path)
+        print("  " + ", ".join(f"{label}: {source}" for label, source in sources.items()))
+    return matrix
+
+def classify_embeddings(embeddings, prototypes, labels, temperature=SCORE_TEMPERATURE):
+    """
+    Zero-shot shaped results ({'labels', 'scores'} sorted by score) plus 'margin', the cosine gap between the
+    best and second-best topic. Rows that are all zeros (failed batches) give None.
+    """
+    sims = embeddings @ prototypes.T
+    logits = (sims - sims.max(axis=1, keepdims=True)) / temperature
+    probs = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+    order = np.argsort(-sims, axis=1)
+    results = []
+    for row, ranking in enumerate(order):
+        if not embeddings[row].any():
+            results.append(None); continue
+        margin = float(sims[row, ranking[0]] - sims[row, ranking[1]]) if len(labels) > 1 else 1.0
+        results.append({'labels': [labels[j] for j in ranking], 'scores': [float(probs[row, j]) for j in ranking], 'margin': margin})
+    return results
+
+def score_topics_by_similarity(encoder, prototypes, texts, labels, token_budget=TOKEN_BUDGET, on_batch_done=None):
+    """Similarity results aligned with `texts` (None where encoding failed). Callers route low-margin ones to NLI."""
+    return classify_embeddings(encode_texts(encoder, texts, token_budget, on_batch_done), prototypes, labels)
+
+def is_confident(result, margin):
+    """`margin` is the cosine gap between the best and second-best topic below which NLI decides."""
+    return result is not None and result['margin'] >= margin
+
+if __name__ == "__main__":
+    from enrich_data import CANDIDATE_TOPICS
+    parser = argparse.ArgumentParser(description="Build the topic prototypes used by enrich_data.py --topic-engine embedding.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="Sentence embedding model.")
+    parser.add_argument("--labelled", default=LABELLED_GLOB, help="Glob of enriched files whose 'topic' column seeds the prototypes.")
+    parser.add_argument("--out", default=PROTOTYPES_FILE)
+    args = parser.parse_args()
+
+    encoder = load_encoder(args.model)
+    matrix, sources = build_prototypes(encoder, CANDIDATE_TOPICS, load_labelled_examples(CANDIDATE_TOPICS, args.labelled))
+    save_prototypes(matrix, CANDIDATE_TOPICS, args.model, sources, args.out)
+    print(f"Saved {len(CANDIDATE_TOPICS)} topic prototypes to {args.out} ({prototypes_id(args.model, CANDIDATE_TOPICS, matrix)})")
+    for label, source in sources.items():
+        print(f"  - {label}: {source}")
@@ -5,76 +5,146 @@ import pandas as pd
 from google.cloud import translate_v2 as translate
 import os
 import argparse
-import re
-
-def clean_text(text):
-    if not isinstance(text, str) or not text.strip(): return ""
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\[.*?\]', '', text)
-    text = re.sub(r'@\w+', '', text)
-    text = text.replace('#', '')
-    emoji_pattern = re.compile(
-        "["
-        u"\U0001F600-\U0001F64F" u"\U0001F300-\U0001F5FF" u"\U0001F680-\U0001F6FF"
-        u"\U0001F1E0-\U0001F1FF" u"\U00002702-\U000027B0" u"\U000024C2-\U0001F251"
-        "]+",
-        flags=re.UNICODE,
-    )
-    text = emoji_pattern.sub(r'', text)
-    text = ' '.join(text.split())
-    return text.strip()
-
-def translate_for_month(month_str):
+import json
+from atomic_io import write_csv_atomic
+from translation_cache import open_translation_cache, lookup_translations, store_translations
+from translation_engine import translate_texts_adaptive, MAX_BATCH_CHARS, MAX_BATCH_SEGMENTS
+from language_detect import is_confident_english, load_ngram_model
+from text_normalization import clean_text_series
+
+MAX_IN_FLIGHT = 4
+REQUESTS_PER_SECOND = 10.0
+MAX_RETRIES = 4
+
+def make_translate_client():
+    """Builds a Translate client. TRANSLATE_API_ENDPOINT redirects it, e.g. to fake_translate_server.py."""
+    endpoint = os.getenv('TRANSLATE_API_ENDPOINT')
+    if not endpoint:
+        return translate.Client()
+    from google.auth.credentials import AnonymousCredentials
+    return translate.Client(credentials=AnonymousCredentials(), client_options={"api_endpoint": endpoint})
+
+def load_translation_checkpoint(checkpoint_path):
+    """Returns ({text: result}, completed batch count) from a previous, interrupted run of this month."""
+    results, batches = {}, 0
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line torn by a crash mid-write; that batch is simply redone
+                results.update(zip(entry['texts'], entry['results']))
+                batches += 1
+    except FileNotFoundError:
+        pass
+    return results, batches
+
+def append_translation_checkpoint(checkpoint_path, batch_index, texts, results):
+    with open(checkpoint_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'batch': batch_index, 'texts': texts, 'results': results}, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+def translate_for_month(month_str, max_in_flight=MAX_IN_FLIGHT, requests_per_second=REQUESTS_PER_SECOND, max_retries=MAX_RETRIES, local_detection=True,
+                        max_batch_chars=MAX_BATCH_CHARS, max_batch_segments=MAX_BATCH_SEGMENTS):
     INPUT_CSV = f"processed_data/processed_comments_{month_str}.csv"
     OUTPUT_CSV = f"processed_data/analysis_ready_{month_str}.csv"
-    BATCH_SIZE = 100
+    CHECKPOINT_FILE = f"processed_data/translate_checkpoint_{month_str}.jsonl"
 
     print(f"\n--- [Step 2] Translating & Cleaning Comments for {month_str} via Google Translate ---")
 
     if not os.path.exists(INPUT_CSV) or os.path.getsize(INPUT_CSV) == 0:
         print(f"Input file '{INPUT_CSV}' is empty or not found. Skipping.")
-        empty_df = pd.DataFrame(columns=['post_id', 'post_caption', 'content_type', 'total_likes', 'num_shares', 'comment_likes', 'original_comment_for_context', 'original_language', 'text_for_analysis'])
-        os.makedirs("processed_data", exist_ok=True)
-        empty_df.to_csv(OUTPUT_CSV, index=False)
+        empty_df = pd.DataFrame(columns=['post_id', 'post_caption', 'content_type', 'total_likes', 'num_shares', 'comment_likes', 'comment_date', 'original_comment_for_context', 'original_language', 'text_for_analysis'])
+        write_csv_atomic(empty_df, OUTPUT_CSV)
         return
 
-    try:
-        translate_client = translate.Client()
-        print("Google Translate client initialized successfully.")
-    except Exception as e:
-        print(f"--> ERROR: Could not initialize Google Translate client: {e}"); exit(1)
-
     df = pd.read_csv(INPUT_CSV, dtype={'comment_text': str}).fillna({'comment_text': ''})
     df['original_comment_for_context'] = df['comment_text']
-    df['cleaned_comment'] = df['comment_text'].apply(clean_text)
+    df['cleaned_comment'] = clean_text_series(df['comment_text'])
     df['translated_text'] = None
     df['original_language'] = 'en'
     
     rows_to_translate = df[df['cleaned_comment'] != ''].copy()
+    translation_complete = True
     
     if not rows_to_translate.empty:
         texts_to_translate = rows_to_translate['cleaned_comment'].tolist()
-        all_translated_results = []
+        # Collapse exact duplicates: each distinct cleaned string is looked up/translated once,
+        # and the result is scattered back to every row that carries it.
+        unique_texts = list(dict.fromkeys(texts_to_translate))
+        dedup_ratio = 1 - len(unique_texts) / len(texts_to_translate)
+        print(f"Dedup: {len(texts_to_translate)} comments -> {len(unique_texts)} unique texts ({dedup_ratio:.1%} duplicates collapsed).")
+
+        # Text that is confidently English needs no API call: it is analysed as-is with original_language 'en'.
+        local_results = {}
+        if local_detection:
+            ngram_model = load_ngram_model()
+            local_results = {t: {'input': t, 'translatedText': t, 'detectedSourceLanguage': 'en'} for t in unique_texts if is_confident_english(t, ngram_model)}
+            print(f"Local language detection: {len(local_results)}/{len(unique_texts)} unique texts are confidently English and skip the API.")
+        remote_texts = [t for t in unique_texts if t not in local_results]
+
+        # Batches finished by an interrupted run of this month are restored before anything else.
+        known_results, resumed_batches = load_translation_checkpoint(CHECKPOINT_FILE)
+        if resumed_batches:
+            print(f"Resuming from checkpoint '{CHECKPOINT_FILE}': {resumed_batches} completed batches ({len(known_results)} texts) restored.")
+        remote_texts = [t for t in remote_texts if t not in known_results]
+
+        cache_conn = open_translation_cache()
+        known_results.update(lookup_translations(cache_conn, remote_texts, 'en'))
+        texts_to_send = [t for t in remote_texts if t not in known_results]
+        hit_rate = (len(remote_texts) - len(texts_to_send)) / len(remote_texts) * 100 if remote_texts else 0.0
+        print(f"Translation cache: {len(remote_texts) - len(texts_to_send)}/{len(remote_texts)} hits ({hit_rate:.1f}%), {len(texts_to_send)} texts to send to the API "
+              f"({len(texts_to_translate) - len(texts_to_send)} API segments saved).")
+        known_results.update(local_results)
+        failed_texts = set()
         try:
-            total_batches = (len(texts_to_translate) - 1) // BATCH_SIZE + 1
-            for i in range(0, len(texts_to_translate), BATCH_SIZE):
-                batch_texts = texts_to_translate[i:i + BATCH_SIZE]
-                current_batch_num = (i // BATCH_SIZE) + 1
-                print(f"  -> Translating batch {current_batch_num}/{total_batches}...")
-                results = translate_client.translate(batch_texts, target_language='en')
-                all_translated_results.extend(results)
-            rows_to_translate['translated_text'] = [res['translatedText'] for res in all_translated_results]
-            rows_to_translate['original_language'] = [res.get('detectedSourceLanguage', 'en') for res in all_translated_results]
+            if texts_to_send:
+                try:
+                    make_translate_client()
+                    print("Google Translate client initialized successfully.")
+                except Exception as e:
+                    print(f"--> ERROR: Could not initialize Google Translate client: {e}"); exit(1)
+
+                total_chars = sum(len(t) for t in texts_to_send)
+                print(f"  -> Translating {len(texts_to_send)} texts ({total_chars} characters) in batches of <= {max_batch_chars} characters / "
+                      f"{max_batch_segments} texts ({max_in_flight} in flight, <= {requests_per_second:g} requests/s)...")
+
+                def on_batch_done(batch_index, batch_texts, results, error):
+                    if error is not None:
+                        print(f"  -> Batch {batch_index + 1} FAILED after {max_retries} retries: {error}")
+                        failed_texts.update(batch_texts)
+                        return
+                    print(f"  -> Batch {batch_index + 1} done ({len(batch_texts)} texts).")
+                    if not batch_texts: return  # only pieces of a long text so far; it is recorded with its last piece
+                    append_translation_checkpoint(CHECKPOINT_FILE, batch_index, batch_texts, results)
+                    store_translations(cache_conn, batch_texts, results, 'en')
+                    known_results.update(zip(batch_texts, results))
+
+                translate_texts_adaptive(make_translate_client, texts_to_send, target_language='en', max_chars=max_batch_chars,
+                                         max_segments=max_batch_segments, max_in_flight=max_in_flight, requests_per_second=requests_per_second,
+                                         max_retries=max_retries, on_batch_done=on_batch_done)
+                if failed_texts:
+                    translation_complete = False
+                    print(f"--> WARNING: {len(failed_texts)} texts could not be translated; only their rows are marked 'error'.")
+
+            # A failed batch only affects its own rows: they keep the cleaned text and are flagged 'error'.
+            rows_to_translate['translated_text'] = [known_results[t]['translatedText'] if t in known_results else None for t in texts_to_translate]
+            rows_to_translate['original_language'] = [known_results[t].get('detectedSourceLanguage', 'en') if t in known_results else 'error' for t in texts_to_translate]
             df.update(rows_to_translate)
         except Exception as e:
             print(f"--> ERROR during batch translation: {e}")
             df['original_language'] = 'error'
+            translation_complete = False
+        finally:
+            cache_conn.close()
 
     df['text_for_analysis'] = df['translated_text'].fillna(df['cleaned_comment'])
     
     final_columns = [
         'post_id', 'post_caption', 'content_type', 'total_likes', 'num_shares', 
-        'comment_likes', 'original_comment_for_context', 'original_language',
+        'comment_likes', 'comment_date', 'original_comment_for_context', 'original_language',
         'text_for_analysis'
     ]
     for col in final_columns:
@@ -92,12 +162,21 @@ def translate_for_month(month_str):
     print(f"Data Cleaning: Removed {initial_rows - final_rows} empty/ghost comments.")
     # --- END OF FIX ---
 
-    os.makedirs("processed_data", exist_ok=True)
-    df_final.to_csv(OUTPUT_CSV, index=False)
+    write_csv_atomic(df_final, OUTPUT_CSV)
     print(f"Translation and cleaning complete! Saved {final_rows} valid comments to '{OUTPUT_CSV}'")
+    # Keep the checkpoint while some batches are still outstanding, so the next run only redoes those.
+    if translation_complete and os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Translate and clean comments using Google Cloud Translate API.")
     parser.add_argument("month", type=str, help="The month to process in YYYY-MM format.")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT, help="Maximum concurrent Translate requests.")
+    parser.add_argument("--requests-per-second", type=float, default=REQUESTS_PER_SECOND, help="Rate limit for Translate requests, retries included.")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES, help="Retries per batch, with exponential backoff.")
+    parser.add_argument("--no-local-detection", action='store_true', help="Send every text to the API, including confidently English ones.")
+    parser.add_argument("--max-batch-chars", type=int, default=MAX_BATCH_CHARS, help="Character budget per request; longer texts are split.")
+    parser.add_argument("--max-batch-segments", type=int, default=MAX_BATCH_SEGMENTS, help="Maximum number of texts per request.")
     args = parser.parse_args()
-    translate_for_month(args.month)
\ No newline at end of file
+    translate_for_month(args.month, args.max_in_flight, args.requests_per_second, args.max_retries, not args.no_local_detection,
+                        args.max_batch_chars, args.max_batch_segments)
\ No newline at end of file
@@ -0,0 +1,109 @@
+# File: translation_cache.py
+# Persistent, content-addressed cache for Google Translate results, shared across months and runs.
+import sqlite3
+import os
+import hashlib
+import time
+import argparse
+
+CACHE_DB = "processed_data/translation_cache.sqlite"
+SQLITE_MAX_PARAMS = 500
+
+def cache_key(text, target_language):
+    return hashlib.sha256(f"{target_language}\x00{text}".encode('utf-8')).hexdigest()
+
+def open_translation_cache(db_path=CACHE_DB):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS translations (
+            key TEXT PRIMARY KEY,
+            target_language TEXT NOT NULL,
+            source_text TEXT NOT NULL,
+            translated_text TEXT NOT NULL,
+            detected_language TEXT,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        )""")
+    return conn
+
+def lookup_translations(conn, texts, target_language='en'):
+    """Returns {text: result} for every text already in the cache, shaped like a Translate API result."""
+    keys = {cache_key(t, target_language): t for t in set(texts)}
+    key_list, found, now = list(keys), {}, time.time()
+    for i in range(0, len(key_list), SQLITE_MAX_PARAMS):
+        chunk = key_list[i:i + SQLITE_MAX_PARAMS]
+        placeholders = ','.join('?' * len(chunk))
+        rows = conn.execute(f"SELECT key, translated_text, detected_language FROM translations WHERE key IN ({placeholders})", chunk).fetchall()
+        for key, translated_text, detected_language in rows:
+            result = {'input': keys[key], 'translatedText': translated_text}
+            if detected_language is not None: result['detectedSourceLanguage'] = detected_language
+            found[keys[key]] = result
+        conn.executemany("UPDATE translations SET hits = hits + 1, last_used_at = ? WHERE key = ?", [(now, row[0]) for row in rows])
+    conn.commit()
+    return found
+
+def store_translations(conn, texts, results, target_language='en'):
+    """Stores one API batch. Called per batch so completed work survives a later failure."""
+    now = time.time()
+    conn.executemany(
+        "INSERT OR REPLACE INTO translations (key, target_language, source_text, translated_text, detected_language, created_at, last_used_at, hits) VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+        [(cache_key(t, target_language), target_language, t, r['translatedText'], r.get('detectedSourceLanguage'), now, now) for t, r in zip(texts, results)])
+    conn.commit()
+
+def print_stats(conn):
+    total, hits = conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM translations").fetchone()
+    print(f"Cached translations: {total} (served {hits} cache hits in total)")
+    for lang, count in conn.execute("SELECT COALESCE(detected_language, '?'), COUNT(*) FROM translations GROUP BY 1 ORDER BY 2 DESC LIMIT 15"):
+        print(f"  - {lang}: {count}")
+
+def show_entries(conn, limit=20, language=None):
+    query, params = "SELECT detected_language, hits, source_text, translated_text FROM translations", []
+    if language:
+        query += " WHERE detected_language = ?"; params.append(language)
+    query += " ORDER BY last_used_at DESC LIMIT ?"; params.append(limit)
+    for lang, hits, source_text, translated_text in conn.execute(query, params):
+        print(f"[{lang}] hits={hits}: {source_text[:70]!r} -> {translated_text[:70]!r}")
+
+def prune_cache(conn, older_than_days=None, language=None, clear_all=False):
+    """
+    Deletes entries not used for `older_than_days` days and/or with the given detected language.
+    Cached translations are paid API results, so clearing everything takes an explicit `clear_all`.
+    """
+    if clear_all == (older_than_days is not None or bool(language)):
+        raise ValueError("Pass either a filter (older_than_days / language) or clear_all=True, not both or neither.")
+    clauses, params = [], []
+    if older_than_days is not None:
+        clauses.append("last_used_at < ?"); params.append(time.time() - older_than_days * 86400)
+    if language:
+        clauses.append("detected_language = ?"); params.append(language)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    deleted = conn.execute(f"DELETE FROM translations{where}", params).rowcount
+    conn.commit()
+    conn.execute("VACUUM")
+    return deleted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and prune the translation cache.")
+    parser.add_argument("--db", default=CACHE_DB, help="Path to the cache database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Show entry counts per detected language.")
+    show_parser = subparsers.add_parser("show", help="Show the most recently used entries.")
+    show_parser.add_argument("--limit", type=int, default=20)
+    show_parser.add_argument("--language", help="Only show entries with this detected source language.")
+    prune_parser = subparsers.add_parser("prune", help="Delete entries matching the filters, or every entry with --all.")
+    prune_parser.add_argument("--older-than-days", type=float, help="Delete entries not used for this many days.")
+    prune_parser.add_argument("--language", help="Delete entries with this detected source language.")
+    prune_parser.add_argument("--all", action='store_true', help="Delete every cached translation (they cost API calls to rebuild).")
+    args = parser.parse_args()
+    if args.command == "prune" and args.all == (args.older_than_days is not None or bool(args.language)):
+        prune_parser.error("give --older-than-days and/or --language, or --all on its own to clear the whole cache")
+
+    conn = open_translation_cache(args.db)
+    if args.command == "stats":
+        print_stats(conn)
+    elif args.command == "show":
+        show_entries(conn, args.limit, args.language)
+    elif args.command == "prune":
+        print(f"Deleted {prune_cache(conn, args.older_than_days, args.language, args.all)} cached translations.")
@@ -0,0 +1,204 @@
+# File: translation_engine.py
+# Concurrent, rate-limited translation of pre-built batches with per-batch retries and failure isolation.
+# translate_texts_adaptive() additionally packs batches by size and adapts the batch size to the API's behaviour.
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+MAX_BATCH_CHARS = 5000      # recommended upper bound for one Translate v2 request
+MAX_BATCH_SEGMENTS = 128    # hard Translate v2 limit on strings per request
+MIN_BATCH_CHARS = 500
+TARGET_LATENCY = 2.0        # seconds; slower requests shrink the batch budget
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def translate_batches(client_factory, batches, target_language='en', max_in_flight=4, requests_per_second=10.0,
+                      max_retries=4, backoff_base=1.0, on_batch_done=None):
+    """
+    Translates `batches` (a list of lists of strings) with at most `max_in_flight` requests outstanding
+    and at most `requests_per_second` requests started per second (retries included).
+
+    Each batch is retried with exponential backoff and jitter; a batch that still fails is isolated:
+    its slot in the returned list is None and the other batches are unaffected.
+    `client_factory()` is called once per worker thread, so clients are never shared between threads.
+    `on_batch_done(index, texts, results_or_None, error_or_None)` runs in the calling thread as batches finish.
+    """
+    bucket = TokenBucket(requests_per_second)
+    local = threading.local()
+
+    def run_batch(texts):
+        if not hasattr(local, 'client'):
+            local.client = client_factory()
+        for attempt in range(max_retries + 1):
+            bucket.acquire()
+            try:
+                return local.client.translate(texts, target_language=target_language)
+            except Exception:
+                if attempt == max_retries: raise
+                time.sleep(backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    results = [None] * len(batches)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        futures = {pool.submit(run_batch, texts): i for i, texts in enumerate(batches)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+                error = None
+            except Exception as e:
+                error = e
+            if on_batch_done is not None:
+                on_batch_done(i, batches[i], results[i], error)
+    return results
+
+def split_long_text(text, max_chars):
+    """Splits `text` into pieces of at most `max_chars`, cutting at the last space before the limit where possible."""
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(' ', 0, max_chars + 1)
+        if cut <= 0: cut = max_chars
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip(' ')
+    pieces.append(text)
+    return pieces
+
+def is_request_too_large(error):
+    """True for HTTP 413 responses (google.api_core exceptions and FakeServerClient errors carry `.code`)."""
+    try:
+        return int(getattr(error, 'code', 0)) == 413
+    except (TypeError, ValueError):
+        return False
+
+class AdaptiveBatchBudget:
+    """
+    AIMD character budget per request: grows by a tenth of `max_chars` after every fast, clean request
+    and halves after a request that was slower than `target_latency`, needed retries, or failed.
+    A request rejected as too large also lowers the ceiling the budget can grow back to, below `min_chars` if
+    need be, so a rejected batch is never formed again.
+    """
+
+    def __init__(self, max_chars=MAX_BATCH_CHARS, min_chars=MIN_BATCH_CHARS, target_latency=TARGET_LATENCY):
+        self.max_chars = max_chars
+        self.min_chars = min(min_chars, max_chars)
+        self.target_latency = target_latency
+        self.chars = max(self.min_chars, max_chars // 2)
+        self.step = max(1, max_chars // 10)
+
+    def record(self, latency=None, error=False):
+        if error or latency > self.target_latency:
+            self.chars = max(self.min_chars, self.chars // 2)
+        else:
+            self.chars = min(self.max_chars, self.chars + self.step)
+
+    def shrink_below(self, chars):
+        """After a 413 for a `chars`-sized request: never grow back to that size, and halve it for now."""
+        self.max_chars = max(1, min(self.max_chars, chars - 1))
+        self.min_chars = min(self.min_chars, self.max_chars)
+        self.chars = max(1, min(self.chars, chars // 2))
+
+def take_batch(queue, char_budget, max_segments):
+    """Pops pieces off the front of `queue` until the next one would exceed either budget (always at least one)."""
+    batch = [queue.popleft()]
+    chars = len(batch[0][2])
+    while queue and len(batch) < max_segments and chars + len(queue[0][2]) <= char_budget:
+        batch.append(queue.popleft())
+        chars += len(batch[-1][2])
+    return batch
+
+def translate_texts_adaptive(client_factory, texts, target_language='en', max_chars=MAX_BATCH_CHARS, max_segments=MAX_BATCH_SEGMENTS,
+                             max_in_flight=4, requests_per_second=10.0, max_retries=4, backoff_base=1.0,
+                             target_latency=TARGET_LATENCY, on_batch_done=None):
+    """
+    Translates `texts` (distinct strings) in batches packed up to a character and segment budget.
+
+    Texts longer than `max_chars` are split at spaces and their translated pieces re-joined with a space.
+    The character budget adapts as requests complete (see AdaptiveBatchBudget); a 413 response shrinks it
+    and re-queues the batch instead of consuming retries. Other errors are retried with backoff, and a batch
+    that still fails only fails its own texts.
+
+    Returns a list aligned with `texts`: a Translate API result dict, or None for texts that failed.
+    `on_batch_done(index, texts, results_or_None, error_or_None)` runs in the calling thread; `texts` are
+    the whole input texts completed (or failed) by that request, so it may be empty while a long text is in flight.
+    """
+    bucket = TokenBucket(requests_per_second)
+    budget = AdaptiveBatchBudget(max_chars, target_latency=target_latency)
+    local = threading.local()
+
+    def run_batch(pieces):
+        if not hasattr(local, 'client'):
+            local.client = client_factory()
+        for attempt in range(max_retries + 1):
+            bucket.acquire()
+            start = time.monotonic()
+            try:
+                return local.client.translate(pieces, target_language=target_language), time.monotonic() - start, attempt
+            except Exception as e:
+                if attempt == max_retries or is_request_too_large(e): raise
+                time.sleep(backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    queue, piece_results = deque(), []
+    for i, text in enumerate(texts):
+        pieces = split_long_text(text, max_chars)
+        piece_results.append([None] * len(pieces))
+        queue.extend((i, j, piece) for j, piece in enumerate(pieces))
+    pieces_left = [len(p) for p in piece_results]
+    results, failed = [None] * len(texts), set()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        in_flight, batch_count = {}, 0
+        while queue or in_flight:
+            while queue and len(in_flight) < max_in_flight:
+                batch = take_batch(queue, budget.chars, max_segments)
+                in_flight[pool.submit(run_batch, [piece for _, _, piece in batch])] = (batch_count, batch)
+                batch_count += 1
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, batch = in_flight.pop(future)
+                try:
+                    batch_results, latency, retries = future.result()
+                except Exception as e:
+                    if is_request_too_large(e) and len(batch) > 1:
+                        budget.shrink_below(sum(len(piece) for _, _, piece in batch))
+                        queue.extendleft(reversed(batch))
+                        continue
+                    budget.record(error=True)
+                    newly_failed = list(dict.fromkeys(i for i, _, _ in batch if i not in failed))
+                    failed.update(newly_failed)
+                    if on_batch_done is not None:
+                        on_batch_done(index, [texts[i] for i in newly_failed], None, e)
+                    continue
+
+                budget.record(latency, error=retries > 0)
+                completed = []
+                for (i, j, _), result in zip(batch, batch_results):
+                    piece_results[i][j] = result
+                    pieces_left[i] -= 1
+                    if pieces_left[i] == 0 and i not in failed:
+                        parts = piece_results[i]
+                        results[i] = dict(parts[0], input=texts[i], translatedText=' '.join(p['translatedText'] for p in parts))
+                        completed.append(i)
+                if on_batch_done is not None:
+                    on_batch_done(index, [texts[i] for i in completed], [results[i] for i in completed], None)
+    return results
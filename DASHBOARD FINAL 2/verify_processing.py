@@ -3,12 +3,12 @@ import pandas as pd
 import json
 import argparse
 from collections import Counter
+from build_post_table import load_post_table
 
 def run_reconciliation_report(month_str):
     print(f"\n--- [VERIFY] Data Reconciliation & Schema Report for {month_str} ---")
     
     processed_file = f"processed_data/processed_comments_{month_str}.csv"
-    posts_file = "fb_posts_data.json"
     comments_file = f"monthly_data/{month_str}.json"
     
     # --- Schema Check ---
@@ -30,12 +30,11 @@ def run_reconciliation_report(month_str):
     # --- Data Loss Check ---
     print("\n2. Verifying data loss...")
     try:
-        with open(posts_file, 'r', encoding='utf-8') as f: posts_data = json.load(f)
+        valid_post_ids = set(load_post_table().index)
         with open(comments_file, 'r', encoding='utf-8') as f: comments_data = json.load(f)
     except FileNotFoundError as e:
         print(f"[FAILED] Could not find a required source file for data loss check. {e}"); exit(1)
 
-    valid_post_ids = {str(p.get('postId')).strip() for p in posts_data if p.get('postId')}
     total_source_comments = len(comments_data)
     unmapped_post_ids = [str(c.get('facebookId')).strip() for c in comments_data if c.get('facebookId') and str(c.get('facebookId')).strip() not in valid_post_ids]
     
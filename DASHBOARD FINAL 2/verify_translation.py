@@ -1,31 +1,15 @@
 # File: verify_translation.py (Definitive Final Version)
 import pandas as pd
 import argparse
-import re
-import string
 import sys
 import codecs
+from text_normalization import is_mostly_non_latin_series
 
 # --- Configure system to handle Unicode for printing ---
 sys.stdout = codecs.getwriter("utf-8")(sys.stdout.detach())
 
 FAILURE_THRESHOLD_PERCENT = 2.0
 
-def is_mostly_non_latin(text, threshold=0.5):
-    """Checks if a string contains a high percentage of non-Latin characters."""
-    if not text or not isinstance(text, str):
-        return False
-    # Use a raw string r'...' to avoid SyntaxWarning
-    cleaned_text = re.sub(r'[{re.escape(string.punctuation)}\s\d]', '', text)
-    if not cleaned_text:
-        return False
-    
-    non_latin_chars = len(re.findall(r'[^\x00-\x7F]', cleaned_text)) # More robust check for non-ASCII
-    if len(cleaned_text) == 0:
-        return False
-        
-    return (non_latin_chars / len(cleaned_text)) > threshold
-
 def verify_translation_step(month_str):
     """Verifies the output of the translation step for schema and quality."""
     INPUT_CSV = f"processed_data/analysis_ready_{month_str}.csv"
@@ -55,7 +39,7 @@ def verify_translation_step(month_str):
         (df['original_language'] != 'en') & 
         (df['original_language'] != '') & 
         (df['original_language'] != 'error') & # Also check for our explicit error flag
-        (df['text_for_analysis'].apply(is_mostly_non_latin))
+        is_mostly_non_latin_series(df['text_for_analysis'])
     ]
     failed_translations = len(failed_translations_df)
     failure_rate = (failed_translations / total_rows) * 100 if total_rows > 0 else 0